@@ -16,15 +16,17 @@ import maya.api.OpenMayaAnim as omanim
 import maya.cmds as cmds
 from maya.app.general.mayaMixin import MayaQWidgetDockableMixin
 
-from qtm.packet import QRTComponentType
-from qqtmrt import QQtmRt
+from qtm.align import TimestampAligner
+from qtm.streamrate import frames_option
+from qtmsession import QtmSession
+from applyscheduler import ApplyScheduler
 from mayautil import MayaUtil
 from mayaui import QtmConnectShelf
-from markerstreamer import MarkerStreamer
-from skeletonstreamer import SkeletonStreamer
-from rigidbodystreamer import RigidBodyStreamer
 import importlib
 
+# Items of streamRateBox.
+STREAM_ALL_FRAMES, STREAM_FREQUENCY, STREAM_FREQUENCY_DIVISOR, STREAM_ADAPTIVE = range(4)
+
 MAYA = False
 
 try:
@@ -69,12 +71,12 @@ def start():
 
     if not hasattr(parent, '_qtmConnect'):
         cmds.warning('Not connected to QTM.')
+    elif parent._qtmConnect._qtm.connected:
+        parent._qtmConnect.stream()
     else:
-        if not parent._qtmConnect._qtm.connected:
-            parent._qtmConnect.connect_qtm()
-
-        if parent._qtmConnect._qtm.connected:
-            parent._qtmConnect.stream()
+        # Streaming starts once connected and the scene has been set up.
+        parent._qtmConnect._stream_when_connected = True
+        parent._qtmConnect.connect_qtm()
     
 def stop():
     parent = _get_maya_main_window()
@@ -84,12 +86,27 @@ def stop():
     else:
         parent._qtmConnect.stop_stream()
 
-        QtCore.QTimer.singleShot(750, set_start_button)
+def record(path):
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        cmds.warning('Not connected to QTM.')
+    else:
+        parent._qtmConnect.start_recording(path)
 
-def set_start_button():
+def stop_recording():
     parent = _get_maya_main_window()
 
-    parent._qtmConnect._shelf.toggle_stream_button('start')
+    if hasattr(parent, '_qtmConnect'):
+        parent._qtmConnect.stop_recording()
+
+def latency():
+    parent = _get_maya_main_window()
+
+    if not hasattr(parent, '_qtmConnect'):
+        return {}
+
+    return parent._qtmConnect.latency()
 
 def _get_maya_main_window():
     ptr = OpenMayaUI.MQtUtil.mainWindow()
@@ -145,26 +162,41 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
 
         if hasattr(parent, '_qtmConnect'):
             parent._qtmConnect.stop_stream()
-            parent._qtmConnect._qtm.disconnect()
+            parent._qtmConnect.disconnect_qtm()
 
-        self._qtm                 = QQtmRt()
-        self._skeleton_streamer   = SkeletonStreamer(self._qtm, self.widget.skeletonList)
-        self._marker_streamer     = MarkerStreamer(self._qtm, self.widget.markerList, self.widget.groupNameField)
-        self._rigid_body_streamer = RigidBodyStreamer(self._qtm, self.widget.rigidBodyList)
+        self._session             = QtmSession('', self.widget.markerList, self.widget.groupNameField, self.widget.skeletonList, self.widget.rigidBodyList)
+        self._qtm                 = self._session.qtm
+        self._skeleton_streamer   = self._session.skeleton_streamer
+        self._marker_streamer     = self._session.marker_streamer
+        self._rigid_body_streamer = self._session.rigid_body_streamer
         self._shelf               = QtmConnectShelf()
+        self._apply_scheduler     = ApplyScheduler(self._apply_frames, parent=self, skip=self._skip_frames)
+        # Frames of all servers are applied together, captured at the same time.
+        self._aligner             = TimestampAligner()
+        self._sessions            = [self._session]
+
+        self._configure_qtm(self._qtm)
+
+        if cmds.optionVar(exists='qtmApplyInterval') == 1:
+            self._apply_scheduler.interval = cmds.optionVar(q='qtmApplyInterval')
 
         self._shelf.toggle_stream_button('start')
 
+        self._latency_timer = QtCore.QTimer(self)
+        self._latency_timer.timeout.connect(self._update_latency)
+
         # Expose this dialog instance to following script runs.
         # The advantage of setting it on the parent is that we can reload the
         # module and still access it as opposed to a variable local to the module.
         parent._qtmConnect = self
 
         self._qtm.connectedChanged.connect(self._connected_changed)
+        self._qtm.connectFinished.connect(self._connect_finished)
         self._qtm.streamingChanged.connect(self._streaming_changed)
         self._qtm.packetReceived.connect(self._packet_received)
         self._qtm.eventReceived.connect(self._event_received)
         self._qtm.noDataReceived.connect(self._no_data_received)
+        self._qtm.reconnectingChanged.connect(self._reconnecting_changed)
 
         self.widget.verticalLayout.setAlignment(QtCore.Qt.AlignTop)
         self.widget.connectButton.clicked.connect(self.connect_qtm)
@@ -183,7 +215,18 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.widget.rigidBodyComponentButton.toggled.connect(self.component_changed)
         self.widget.tPoseButton.clicked.connect(self.toggle_t_pose)
 
-        self.widget.connectionContainer.setFixedHeight(110)
+        if cmds.optionVar(exists='qtmStreamRate') == 1:
+            self.widget.streamRateBox.setCurrentIndex(cmds.optionVar(q='qtmStreamRate'))
+
+        if cmds.optionVar(exists='qtmStreamFrequency') == 1:
+            self.widget.streamFrequencyBox.setValue(cmds.optionVar(q='qtmStreamFrequency'))
+
+        self.widget.streamRateBox.currentIndexChanged.connect(self._stream_rate_changed)
+        self.widget.streamFrequencyBox.valueChanged.connect(self._stream_frequency_changed)
+        self._stream_rate_changed(self.widget.streamRateBox.currentIndex())
+        self._qtm.framesChanged.connect(self._frames_changed)
+
+        self.widget.connectionContainer.setFixedHeight(160)
         
         if cmds.optionVar(exists='qtmHost') == 1:
             hostname = 'localhost' if cmds.optionVar(q='qtmHost') == '' else cmds.optionVar(q='qtmHost')
@@ -196,29 +239,115 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         #self._password = "password"
         self._password = ""
         self.is_streaming = False
+        self._stream_options = None
+        self._stream_when_connected = False
 
         self._connected_changed(self._qtm.connected)
         self.component_changed()
 
         self._last_event = None
 
+        # Further servers driving the same scene, as namespace=host.
+        if cmds.optionVar(exists='qtmAdditionalServers') == 1:
+            for server in cmds.optionVar(q='qtmAdditionalServers'):
+                namespace, _, host = server.partition('=')
+                self.add_session(host, namespace)
+
+    def _configure_qtm(self, qtm):
+        if cmds.optionVar(exists='qtmCoalesceFrames') == 1:
+            qtm.coalesce = cmds.optionVar(q='qtmCoalesceFrames') == 1
+
+        if cmds.optionVar(exists='qtmThreadedStream') == 1:
+            qtm.threaded = cmds.optionVar(q='qtmThreadedStream') == 1
+
+        if cmds.optionVar(exists='qtmUdpStream') == 1:
+            qtm.udp = cmds.optionVar(q='qtmUdpStream') == 1
+
+        qtm.auto_reconnect = (
+            cmds.optionVar(exists='qtmAutoReconnect') == 0
+            or cmds.optionVar(q='qtmAutoReconnect') == 1
+        )
+
+    def add_session(self, host, namespace):
+        """Drive the scene from another QTM server too, its nodes in namespace.
+
+        It connects, streams and stops along with the server in the host field.
+        Its markers, bodies and skeletons are not listed in the widget.
+        """
+        if not namespace or any(s.namespace == namespace for s in self._sessions):
+            raise ValueError('Each additional server needs its own namespace.')
+
+        session = QtmSession(namespace, host=host)
+        self._configure_qtm(session.qtm)
+        self._sessions.append(session)
+
+        session.qtm.connectedChanged.connect(lambda connected: self._session_connected(session, connected))
+        session.qtm.packetReceived.connect(lambda packet: self._frame_received(session, packet))
+        session.qtm.streamingChanged.connect(lambda streaming: self._session_streaming_changed(session, streaming))
+
+        if self._qtm.connected:
+            session.qtm.connect_to_qtm_async(host, 4000)
+
+        return session
+
+    def remove_session(self, namespace):
+        for session in self._sessions[1:]:
+            if session.namespace == namespace:
+                session.qtm.disconnect()
+                session.qtm.stop_recording()
+                self._sessions.remove(session)
+                self._aligner.remove(session)
+
+    def _additional_sessions(self):
+        return self._sessions[1:]
+
+    def _session_connected(self, session, connected):
+        if connected:
+            session.qtm.get_latest_event_async(callback=lambda _: self._session_ready(session))
+        else:
+            self._aligner.remove(session)
+
+    def _session_streaming_changed(self, session, streaming):
+        if not streaming:
+            self._aligner.remove(session)
+
+    def _session_ready(self, session):
+        session.create(**self._checked_components())
+
+        if self.is_streaming and self._qtm.streaming:
+            self._stream_session(session)
+
+    def _checked_components(self):
+        return {
+            'skeletons': self.widget.skeletonComponentButton.isChecked(),
+            'markers': self.widget.markerComponentButton.isChecked(),
+            'rigid_bodies': self.widget.rigidBodyComponentButton.isChecked(),
+        }
+
     def component_changed(self):
         self.widget.skeletonComponentContainer.setVisible(self.widget.skeletonComponentButton.isChecked())
         self.widget.markerComponentContainer.setVisible(self.widget.markerComponentButton.isChecked())
         self.widget.rigidBodyComponentContainer.setVisible(self.widget.rigidBodyComponentButton.isChecked())
 
         if self.is_streaming:
-            self._qtm.stop_stream()
-            self._shelf.toggle_stream_button('start')
+            for session in self._sessions:
+                session.qtm.stop_stream()
 
-        if self.widget.skeletonComponentButton.isChecked():
-            self._skeleton_streamer.create()
+        for session in self._sessions:
+            session.create(**self._checked_components())
 
-        if self.widget.markerComponentButton.isChecked():
-            self._marker_streamer.create()
-        
-        if self.widget.rigidBodyComponentButton.isChecked():
-            self._rigid_body_streamer.create()
+    def _stream_rate_changed(self, index):
+        self.widget.streamFrequencyBox.setEnabled(index != STREAM_ALL_FRAMES)
+        self.widget.streamFrequencyBox.setSuffix(
+            '' if index == STREAM_FREQUENCY_DIVISOR else ' Hz'
+        )
+        cmds.optionVar(iv=('qtmStreamRate', index))
+
+    def _stream_frequency_changed(self, value):
+        cmds.optionVar(iv=('qtmStreamFrequency', value))
+
+    def _frames_changed(self, frames):
+        self._output('Streaming {}'.format(frames))
 
     def _host_changed(self, text):
         self._host = text
@@ -230,15 +359,25 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self._qtm.disconnect()
 
     def _packet_received(self, packet):
-        if not isinstance(packet, str):
-            if QRTComponentType.Component3d in packet.components:
-                self._marker_streamer._packet_received(packet)
+        self._frame_received(self._session, packet)
 
-            if QRTComponentType.ComponentSkeleton in packet.components:
-                self._skeleton_streamer._packet_received(packet)
+    def _frame_received(self, session, packet):
+        if isinstance(packet, str):
+            return
 
-            if QRTComponentType.Component6d in packet.components:
-                self._rigid_body_streamer._packet_received(packet)
+        now = time.perf_counter()
+        self._aligner.add(session, packet.timestamp, now, packet)
+        self._apply_scheduler.frame_received(self._aligner.frames(now))
+
+    def _apply_frames(self, frames):
+        for session, packet in frames.items():
+            session.apply(packet)
+
+    def _skip_frames(self, frames, newer_frames):
+        for session, packet in frames.items():
+            # A server that sent nothing newer still has this frame to apply.
+            if newer_frames.get(session) is not packet:
+                session.skip(packet)
 
     def _event_received(self, event):
         self._last_event = event
@@ -257,18 +396,29 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self._shelf.toggle_connect_button(connected)
 
         if connected:
-            event = self._qtm.get_latest_event()
+            self._qtm.get_latest_event_async(callback=self._latest_event_received)
+        else:
+            self._stream_when_connected = False
 
-            if self.widget.skeletonComponentButton.isChecked():
-                self._skeleton_streamer.create()
+    def _reconnecting_changed(self, reconnecting):
+        self.widget.connectButton.setText(
+            'Cancel reconnect' if reconnecting else
+            'Disconnect' if self._qtm.connected else 'Connect'
+        )
+
+        if reconnecting:
+            cmds.warning('Connection to QTM lost, reconnecting.')
+        else:
+            self._output(str(self._qtm.reconnect_stats))
 
-            if self.widget.markerComponentButton.isChecked():
-                self._marker_streamer.create()
+    def _latest_event_received(self, event):
+        self._session.create(**self._checked_components())
 
-            if self.widget.rigidBodyComponentButton.isChecked():
-                self._rigid_body_streamer.create()
+        self._output('Latest event: {}'.format(event))
 
-            self._output('Latest event: {}'.format(event))
+        if self._stream_when_connected:
+            self._stream_when_connected = False
+            self.stream()
 
     def group_name_changed(self):
         if self.widget.groupNameField.text() != '' and len(self.widget.markerList.selectedItems()) > 0:
@@ -320,6 +470,16 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.widget.startButton.setEnabled(not streaming)
         self.widget.stopButton.setEnabled(streaming)
         self.widget.tPoseButton.setEnabled(not streaming)
+        self._shelf.toggle_stream_button('stop' if streaming else 'start')
+
+        if streaming:
+            self._latency_timer.start(1000)
+        else:
+            self._latency_timer.stop()
+            self._apply_scheduler.clear()
+            # Stopping stops every server, none may carry frames or clock
+            # offsets into the next stream.
+            self._aligner.reset()
     
     def stream(self):
 
@@ -334,32 +494,104 @@ class QtmConnectWidget(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         if self.widget.rigidBodyComponentButton.isChecked():
             components.append('6d')
 
-        self._qtm.stream(' '.join(components))
+        rate = self.widget.streamRateBox.currentIndex()
+        value = self.widget.streamFrequencyBox.value()
+
+        if rate == STREAM_FREQUENCY_DIVISOR:
+            frames = frames_option(frequency_divisor=value)
+        elif rate in (STREAM_FREQUENCY, STREAM_ADAPTIVE):
+            frames = frames_option(frequency=value)
+        else:
+            frames = frames_option()
+
+        self._stream_options = (
+            ' '.join(components), frames, rate == STREAM_ADAPTIVE
+        )
+        self._qtm.stream(
+            ' '.join(components), frames=frames, adaptive=rate == STREAM_ADAPTIVE
+        )
+
+        for session in self._additional_sessions():
+            if session.qtm.connected:
+                self._stream_session(session)
+
         self._reset_skeleton_names()
-        self._shelf.toggle_stream_button('stop')
 
         self.is_streaming = True
 
+    def _stream_session(self, session):
+        components, frames, adaptive = self._stream_options
+        session.qtm.stream(components, frames=frames, adaptive=adaptive)
+
     def stop_stream(self):
-        self._qtm.stop_stream()
+        for session in self._sessions:
+            session.qtm.stop_stream()
+
         self.is_streaming = False
 
-        self._shelf.toggle_stream_button('start')
+    def start_recording(self, path):
+        """Records the frames streamed from now on to a take file at path.
+
+        Each additional server is recorded next to it, to a file named after
+        its namespace.
+        """
+        root, ext = os.path.splitext(path)
+
+        for session in self._sessions:
+            session_path = path if not session.namespace else root + '_' + session.namespace + ext
+            session.qtm.start_recording(session_path)
+
+    def stop_recording(self):
+        for session in self._sessions:
+            writer = session.qtm.stop_recording()
+
+            if writer is not None:
+                self._output('Recorded {} frames to {}'.format(writer.frame_count, writer.path))
+
+    def latency(self):
+        """qtm.latency.LatencyMonitor of each server, by namespace."""
+        return {session.namespace: session.qtm.latency for session in self._sessions}
+
+    def _update_latency(self):
+        latency = self._qtm.latency
+        stats = latency.stats().get('capture')
+
+        if stats is None:
+            self.widget.latencyLabel.setText('')
+            return
+
+        self.widget.latencyLabel.setText(
+            'Latency p50 {:.1f} p95 {:.1f} p99 {:.1f} ms, {} dropped, {} skipped'.format(
+                stats.p50 * 1000, stats.p95 * 1000, stats.p99 * 1000,
+                latency.dropped_frames, latency.skipped_frames
+            )
+        )
 
     def get_settings_3d(self):
-        self._output(str(self._qtm.get_settings('3d')))
+        labels = self._qtm.get_settings('3d').labels or []
+        self._output(str([label.name for label in labels]))
 
     def connect_qtm(self):
-        if self._qtm.connected:
-            self._qtm.disconnect()
+        if self._qtm.connected or self._qtm.reconnecting:
+            self.disconnect_qtm()
             self._shelf.toggle_stream_button('start')
         else:
             self.widget.connectButton.setEnabled(False)
-            self._qtm.connect_to_qtm(self._host, 4000)
-            self.widget.connectButton.setEnabled(True)
+            self._qtm.connect_to_qtm_async(self._host, 4000)
+
+            for session in self._additional_sessions():
+                session.qtm.connect_to_qtm_async(session.host, 4000)
+
+    def disconnect_qtm(self):
+        for session in self._sessions:
+            session.qtm.disconnect()
+
+    def _connect_finished(self, connected):
+        self.widget.connectButton.setEnabled(True)
 
-            if not self._qtm.connected:
-                cmds.warning('Could not connect to host \'' + self._host + '\'.')
+        if not connected:
+            self._stream_when_connected = False
+            cmds.warning('Could not connect to host \'' + self._host + '\'.')
 
 def main():
     if not MAYA:
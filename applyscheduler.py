@@ -0,0 +1,85 @@
+import time
+
+from Qt import QtCore
+
+
+class ApplyScheduler(QtCore.QObject):
+    """Applies the newest received frame to the scene at most once per tick.
+
+    Frames are handed to frame_received as they arrive and only the newest is
+    kept. apply is called with it when the tick is due, so the scene is updated
+    at the tick rate however fast frames arrive, and frames replaced before
+    being applied are counted in skipped_frames.
+
+    An interval of 0 applies as soon as the event loop is idle, which coalesces
+    everything that arrived while the previous frame was being applied.
+
+    skip, if given, is called with each frame replaced before being applied and
+    the frame replacing it.
+    """
+
+    def __init__(self, apply, interval=0, parent=None, skip=None):
+        super(ApplyScheduler, self).__init__(parent)
+
+        self._apply = apply
+        self._skip = skip
+        self._interval = interval
+        self._packet = None
+        self._last_apply = None
+
+        self.applied_frames = 0
+        self.skipped_frames = 0
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    def _get_interval(self):
+        return self._interval
+
+    def _set_interval(self, interval):
+        self._interval = max(0, interval)
+
+    # Milliseconds between scene updates.
+    interval = QtCore.Property(int, _get_interval, _set_interval)
+
+    def frame_received(self, packet):
+        skipped, self._packet = self._packet, packet
+
+        if skipped is not None:
+            self.skipped_frames += 1
+
+            if self._skip is not None:
+                self._skip(skipped, packet)
+
+        if not self._timer.isActive():
+            self._timer.start(self._time_to_tick())
+
+    def _time_to_tick(self):
+        if self._last_apply is None:
+            return 0
+
+        elapsed = (time.perf_counter() - self._last_apply) * 1000
+        return max(0, int(self._interval - elapsed))
+
+    def _tick(self):
+        packet, self._packet = self._packet, None
+
+        if packet is None:
+            return
+
+        self._last_apply = time.perf_counter()
+        self.applied_frames += 1
+        self._apply(packet)
+
+    def flush(self):
+        """ Applies the pending frame, if any, right away """
+        self._timer.stop()
+        self._tick()
+
+    def clear(self):
+        """ Drops the pending frame, e.g. when streaming stops """
+        self._timer.stop()
+        self._packet = None
+        self._last_apply = None
@@ -0,0 +1,133 @@
+""" Compare bytes copied and time per frame of the old and current qtm.Receiver.
+
+Usage: python benchmarks/receiver_copies.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(
+    os.path.dirname(os.path.realpath(__file__)) + '/../modules/qualisys_python_sdk'
+)
+
+from qtm.packet import QRTPacketType, QRTPacket
+from qtm.packet import RTheader, RTDataQRTPacket, RTComponentData
+from qtm.receiver import Receiver
+
+
+class CountingReceiver(Receiver):
+    """ Current receiver, counting the bytes copied joining split packets """
+
+    def __init__(self, handlers):
+        super(CountingReceiver, self).__init__(handlers)
+        self.copied = 0
+
+    def _complete_partial(self, data, packets):
+        position = super(CountingReceiver, self)._complete_partial(data, packets)
+        if position is not None:
+            self.copied += len(packets[-1][0])
+        return position
+
+
+class LegacyReceiver(object):
+    """ The receiver before the memoryview rewrite, counting the bytes it copies """
+
+    def __init__(self, handlers):
+        self._handlers = handlers
+        self._received_data = b""
+        self.copied = 0
+
+    def data_received(self, data):
+        self._received_data += data
+        self.copied += len(self._received_data)
+        h_size = RTheader.size
+
+        data = self._received_data
+        size, type_ = RTheader.unpack_from(data, 0)
+
+        while len(data) >= size:
+            self._parse_received(data[h_size:size], type_)
+            self.copied += size - h_size
+            data = data[size:]
+            self.copied += len(data)
+
+            if len(data) < h_size:
+                break
+
+            size, type_ = RTheader.unpack_from(data, 0)
+
+        self._received_data = data
+
+    def _parse_received(self, data, type_):
+        type_ = QRTPacketType(type_)
+
+        if (
+            type_ == QRTPacketType.PacketError
+            or type_ == QRTPacketType.PacketCommand
+            or type_ == QRTPacketType.PacketXML
+        ):
+            data = data[:-1]
+        elif type_ == QRTPacketType.PacketData:
+            data = QRTPacket(data)
+
+        self._handlers[type_](data)
+
+
+def make_stream(frame_count, payload_size):
+    frames = []
+    body = bytes(payload_size)
+    for framenumber in range(frame_count):
+        payload = RTDataQRTPacket.pack(0, framenumber, 1)
+        payload += RTComponentData.pack(RTComponentData.size + len(body), 14) + body
+        frames.append(RTheader.pack(RTheader.size + len(payload), 3) + payload)
+    return b"".join(frames)
+
+
+def run(receiver_class, stream, chunk_size, frame_count):
+    received = []
+    receiver = receiver_class({QRTPacketType.PacketData: received.append})
+    chunks = [stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        receiver.data_received(chunk)
+    elapsed = time.perf_counter() - start
+
+    assert len(received) == frame_count
+    return receiver.copied, elapsed
+
+
+def main():
+    frame_count = 200
+    print(
+        "%-10s %-10s %-8s %18s %14s"
+        % ("payload", "chunk", "receiver", "copies per frame", "us per frame")
+    )
+    for payload_size, chunk_size in [
+        (2000, 65536),
+        (2000, 1460),
+        (300000, 65536),
+        (1000000, 65536),
+    ]:
+        stream = make_stream(frame_count, payload_size)
+        frame_size = len(stream) / frame_count
+        for name, receiver_class in [
+            ("legacy", LegacyReceiver),
+            ("current", CountingReceiver),
+        ]:
+            copied, elapsed = run(receiver_class, stream, chunk_size, frame_count)
+            print(
+                "%-10d %-10d %-8s %18.2f %14.1f"
+                % (
+                    payload_size,
+                    chunk_size,
+                    name,
+                    copied / frame_size / frame_count,
+                    elapsed / frame_count * 1e6,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
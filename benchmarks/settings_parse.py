@@ -0,0 +1,182 @@
+""" Compare the old XML to JSON to dict settings conversion with qtmsettings.
+
+Reports time to parse and read the settings and peak memory while doing so.
+
+Usage: python benchmarks/settings_parse.py
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.realpath(__file__)) + "/.."
+sys.path.append(ROOT)
+sys.path.append(ROOT + "/modules")
+
+import xml2json
+from qtmsettings import parse_settings
+
+
+def make_segment(segment_id, depth, fan_out, ids):
+    children = ""
+    if depth > 0:
+        for _ in range(fan_out):
+            ids[0] += 1
+            children += make_segment(ids[0], depth - 1, fan_out, ids)
+    return (
+        '<Segment Name="Segment%d" ID="%d">'
+        "<Solver>Global Optimization</Solver>"
+        '<Transform><Position X="1.5" Y="2.5" Z="3.5"/>'
+        '<Rotation X="0" Y="0" Z="0" W="1"/></Transform>'
+        '<DefaultTransform><Position X="1.5" Y="2.5" Z="3.5"/>'
+        '<Rotation X="0" Y="0" Z="0" W="1"/></DefaultTransform>'
+        "<DegreesOfFreedom/>"
+        '<Endpoint X="0" Y="0" Z="0"/>'
+        "%s</Segment>" % (segment_id, segment_id, children)
+    )
+
+
+def make_parameters(label_count=300, body_count=50, skeleton_count=10, camera_count=40):
+    """ A getparameters all reply the size of a large capture setup """
+    xml = "<QTM_Parameters_Ver_1.24>"
+    xml += "<General><Frequency>300</Frequency>"
+    for camera in range(camera_count):
+        xml += (
+            "<Camera><ID>%d</ID><Model>Miqus M5</Model><Mode>Marker</Mode>"
+            "<Marker_Exposure><Current>400</Current></Marker_Exposure>"
+            '<Position X="1000.5" Y="2000.5" Z="3000.5"/></Camera>' % camera
+        )
+    xml += "</General>"
+
+    xml += "<The_3D><AxisUpwards>+Z</AxisUpwards><Labels>%d</Labels>" % label_count
+    for label in range(label_count):
+        xml += (
+            "<Label><Name>Marker%d</Name><RGBColor>%d</RGBColor>"
+            "<Trajectory_Type>Measured</Trajectory_Type></Label>" % (label, label * 997)
+        )
+    xml += "</The_3D>"
+
+    xml += "<The_6D><Bodies>%d</Bodies>" % body_count
+    for body in range(body_count):
+        xml += "<Body><Name>Body%d</Name><Enabled>true</Enabled><Points>" % body
+        for point in range(8):
+            xml += '<Point X="%d.5" Y="-1.25" Z="3" Virtual="0" PhysicalId="0" Name="B%dP%d"/>' % (
+                point,
+                body,
+                point,
+            )
+        xml += "</Points></Body>"
+    xml += "</The_6D>"
+
+    xml += "<Skeletons>"
+    for skeleton in range(skeleton_count):
+        xml += '<Skeleton Name="Skeleton%d"><Segments>' % skeleton
+        xml += make_segment(1, 3, 4, [1])
+        xml += "</Segments></Skeleton>"
+    xml += "</Skeletons>"
+
+    return xml + "</QTM_Parameters_Ver_1.24>"
+
+
+def as_list(value):
+    return value if type(value) == type([]) else [value]
+
+
+def legacy_segments(segment):
+    yield segment
+    for child in as_list(segment.get("Segment", [])):
+        for s in legacy_segments(child):
+            yield s
+
+
+def legacy(xml_text):
+    """ Convert and read the settings the way the streamers used to """
+    options = lambda: None
+    options.pretty = False
+    settings = json.loads(xml2json.xml2json(xml_text, options))
+    settings = settings.pop("QTM_Parameters_Ver_1.24")
+
+    values = 0
+    for label in settings["The_3D"]["Label"]:
+        values += int(label["RGBColor"]) >> 16
+    for body in as_list(settings["The_6D"].get("Body", [])):
+        for point in body["Points"]["Point"]:
+            values += float(point["@X"]) + float(point["@Y"]) + float(point["@Z"])
+    for skeleton in as_list(settings["Skeletons"].get("Skeleton", [])):
+        for segment in legacy_segments(skeleton["Segments"]["Segment"]):
+            transform = segment["DefaultTransform"]
+            values += int(segment["@ID"]) + sum(
+                float(transform["Rotation"][axis]) for axis in ("@X", "@Y", "@Z", "@W")
+            )
+    return values
+
+
+def typed(xml_text):
+    """ Read the same values from qtmsettings, parsing the whole reply at once """
+    settings = parse_settings(xml_text)
+    return read_typed(settings.labels, settings.bodies, settings.skeletons)
+
+
+def read_typed(labels, bodies, skeletons):
+    values = 0
+    for label in labels:
+        values += label.rgb[0]
+    for body in bodies:
+        for point in body.points:
+            values += point.x + point.y + point.z
+    for skeleton in skeletons:
+        for segment in skeleton.iter_segments():
+            values += segment.id + sum(segment.rotation)
+    return values
+
+
+def run(function, xml_text, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        values = function(xml_text)
+    return values, (time.perf_counter() - start) / iterations
+
+
+def peak_memory(function, xml_text):
+    tracemalloc.start()
+    function(xml_text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    iterations = 10
+
+    print(
+        "%-9s %-22s %12s %14s"
+        % ("reply", "parser", "ms per reply", "peak memory MB")
+    )
+    for camera_count in [40, 2000]:
+        xml_text = make_parameters(camera_count=camera_count)
+        expected = None
+
+        for name, function in [
+            ("xml2json + json.loads", legacy),
+            ("parse_settings", typed),
+        ]:
+            values, elapsed = run(function, xml_text, iterations)
+            if expected is None:
+                expected = values
+            assert abs(values - expected) < 1e-6
+
+            print(
+                "%-9s %-22s %12.2f %14.2f"
+                % (
+                    "%d kB" % (len(xml_text) // 1024),
+                    name,
+                    elapsed * 1e3,
+                    peak_memory(function, xml_text) / 1e6,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,24 @@ import maya.api.OpenMaya as om
 
 from mayaui import load_icon
 from mayautil import MayaUtil
+from qtmsettings import diff_labels
 
 
 class MarkerStreamer:
-    def __init__(self, qtmrt, listWidget, textWidget):
+    def __init__(self, qtmrt, listWidget=None, textWidget=None, namespace=""):
         self._qtm = qtmrt
+        # Maya namespace of the created nodes, to tell servers apart.
+        self._namespace = namespace
         self._listWidget = listWidget
         self._textWidget = textWidget
         self._markers = None
         self._marker_groups = None
+        self._transformFns = None
+        self._qtm_settings = None
+        self._created_labels = None
+        self._locators = {}
+        self._locator_groups = {}
+        self._group_nodes = {}
         self._unit_conversion = 0.1
 
         self._qtm.connectedChanged.connect(self._connected_changed)
@@ -26,45 +35,45 @@ class MarkerStreamer:
         self._up_axis = cmds.upAxis(q=True, axis=True)
 
         if connected:
-            self._init()
-            self._update_ui()
+            self._qtm.get_settings_async("3d", callback=self._settings_received)
         else:
             self._markers = None
             self._marker_groups = None
-            self._listWidget.clear()
+            self._transformFns = None
+            if self._listWidget is not None:
+                self._listWidget.clear()
 
     def _packet_received(self, packet):
         _, markers = packet.get_3d_markers()
 
-        if self._up_axis == "y":
-            cmds.setAttr("mocapMarkers.rotateX", 90)
-            cmds.setAttr("mocapMarkers.rotateZ", 180)
-
         for i, marker in enumerate(markers):
-            transformFn = self._markers[i]["transformFn"]
+            transformFn = self._transformFns[i]
             translation = om.MVector(
                     marker.x * self._unit_conversion,
                     marker.y * self._unit_conversion,
                     marker.z * self._unit_conversion)
             transformFn.setTranslation(translation, om.MSpace.kTransform)
 
-    def _init(self):
-        self._qtm_settings = self._qtm.get_settings("3d")
+    def _settings_received(self, settings):
+        self._qtm_settings = settings
+        self._init()
+        self._update_ui()
 
+    def _init(self):
         if self._qtm_settings == None:
             return
 
         if self._marker_groups is None:
-            self._markers = []
-            self._marker_groups = {"mocapMarkers": []}
+            labels = self._qtm_settings.labels or []
 
-            for i, label in enumerate(self._qtm_settings["The_3D"]["Label"]):
-                label["Index"] = i
-
-                self._markers.append(label)
-                self._marker_groups["mocapMarkers"].append(label)
+            self._markers = list(labels)
+            self._marker_groups = {"mocapMarkers": list(labels)}
+            self._transformFns = [None] * len(labels)
 
     def _update_ui(self):
+        if self._listWidget is None:
+            return
+
         self._listWidget.clear()
 
         if self._marker_groups == None:
@@ -80,46 +89,101 @@ class MarkerStreamer:
             self._listWidget.addItem(group_item)
 
             for label in marker_group:
-                red = int(label["RGBColor"]) >> 16
-                green = (int(label["RGBColor"]) >> 8) & 0x00FF
-                blue = int(label["RGBColor"]) & 0x0000FF
+                red, green, blue = label.rgb
                 marker_color = QtGui.QColor(red, green, blue)
                 icon = load_icon(
                     os.path.dirname(os.path.abspath(__file__))
                     + "/assets/marker_64x32.png",
                     marker_color,
                 )
-                item = QtWidgets.QListWidgetItem(icon, label["Name"])
+                item = QtWidgets.QListWidgetItem(icon, label.name)
 
                 self._listWidget.addItem(item)
 
     def create(self):
+        """Create locators for the markers, touching only what changed.
+
+        Locators from earlier calls are reused, renamed when their label was
+        renamed and only reparented when their group changed.
+        """
+        if self._marker_groups is None:
+            return
+
+        MayaUtil.ensure_namespace(self._namespace)
         modifier = om.MDagModifier()
+        diff = diff_labels(self._created_labels, self._markers)
 
-        if self._marker_groups is not None:
-            for group_name, marker_group in self._marker_groups.items():
-                parent = MayaUtil.get_node_by_name(group_name)
+        for old, new in diff.renamed:
+            locator = self._locators.pop(old.name, None)
+            group_name = self._locator_groups.pop(old.name, None)
 
-                if parent is None:
-                    parent = modifier.createNode("transform")
+            if locator is not None and locator.isValid():
+                modifier.renameNode(
+                    locator.object(), MayaUtil.namespaced(self._namespace, new.name)
+                )
+                self._locators[new.name] = locator
+                self._locator_groups[new.name] = group_name
 
-                    modifier.renameNode(parent, group_name)
-                    modifier.doIt()
+        for old in diff.removed:
+            self._locators.pop(old.name, None)
+            self._locator_groups.pop(old.name, None)
 
-                for i, marker in enumerate(marker_group):
-                    locator = MayaUtil.get_node_by_name(marker["Name"])
+        modifier.doIt()
 
-                    if locator is None:
-                        locator = modifier.createNode("locator")
+        for group_name, marker_group in self._marker_groups.items():
+            parent = None
+
+            for marker in marker_group:
+                locator = self._locators.get(marker.name)
+
+                if locator is None or not locator.isValid():
+                    node_name = MayaUtil.namespaced(self._namespace, marker.name)
+                    node = MayaUtil.get_node_by_name(node_name)
+
+                    if node is None:
+                        node = modifier.createNode("locator")
 
-                        modifier.renameNode(locator, marker["Name"])
+                        modifier.renameNode(node, node_name)
+                        modifier.doIt()
 
-                    modifier.reparentNode(locator, parent)
+                    locator = om.MObjectHandle(node)
+                    self._locators[marker.name] = locator
+                    self._locator_groups.pop(marker.name, None)
+
+                if self._locator_groups.get(marker.name) != group_name:
+                    if parent is None:
+                        parent = self._get_group_node(group_name, modifier)
+
+                    modifier.reparentNode(locator.object(), parent)
                     modifier.doIt()
+                    self._locator_groups[marker.name] = group_name
+
+                self._transformFns[marker.index] = om.MFnTransform(locator.object())
+
+            if marker_group:
+                MayaUtil.orient_to_up_axis(
+                    self._get_group_node(group_name, modifier), self._up_axis
+                )
+
+        self._created_labels = list(self._markers)
+
+    def _get_group_node(self, group_name, modifier):
+        group = self._group_nodes.get(group_name)
+
+        if group is None or not group.isValid():
+            node_name = MayaUtil.namespaced(self._namespace, group_name)
+            node = MayaUtil.get_node_by_name(node_name)
+
+            if node is None:
+                node = modifier.createNode("transform")
+
+                modifier.renameNode(node, node_name)
+                modifier.doIt()
+
+            group = om.MObjectHandle(node)
+            self._group_nodes[group_name] = group
 
-                    transformFn = om.MFnTransform(locator)
-                    self._markers[marker["Index"]]["locator"] = locator
-                    self._markers[marker["Index"]]["transformFn"] = transformFn
+        return group.object()
 
     def group_markers(self):
         new_group = []
@@ -130,10 +194,10 @@ class MarkerStreamer:
             for group_name, marker_group in self._marker_groups.items():
                 # Remove marker from existing groups.
                 for i, marker in enumerate(marker_group):
-                    if item.text() == marker["Name"]:
+                    if item.text() == marker.name:
                         new_group.append(marker_group[i])
 
-                        self._markers[marker["Index"]] = marker
+                        self._markers[marker.index] = marker
 
                         del marker_group[i]
 
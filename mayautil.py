@@ -1,18 +1,46 @@
+import math
+
 import maya.api.OpenMaya as om
+import maya.cmds as cmds
 
 class MayaUtil:
     @staticmethod
     def get_node_by_name(name):
-        dagIterator = om.MItDag()
-        dagNodeFn = om.MFnDagNode()
+        # Maya looks the name up in its own index of the scene, where walking
+        # the DAG took time in proportion to every node in the scene.
+        selection = om.MSelectionList()
+
+        try:
+            selection.add(name)
+        except RuntimeError:
+            return None
+
+        # A name that is not unique matches every node with it.
+        for i in range(selection.length()):
+            node = selection.getDependNode(i)
+
+            if node.hasFn(om.MFn.kDagNode):
+                return node
 
-        while (not dagIterator.isDone()):
-            dagObject = dagIterator.currentItem()
-            dagNodeFn.setObject(dagObject)
+        return None
 
-            if dagNodeFn.name() == name:
-                return dagObject
+    @staticmethod
+    def orient_to_up_axis(node, up_axis):
+        # QTM data is Z-up, rotating the group it is streamed into once makes it
+        # upright in a Y-up scene without touching every frame.
+        if up_axis == "y":
+            om.MFnTransform(node).setRotation(
+                om.MEulerRotation(math.pi / 2, 0, math.pi), om.MSpace.kTransform
+            )
+
+    @staticmethod
+    def namespaced(namespace, name):
+        if not namespace:
+            return name
 
-            dagIterator.next()
+        return namespace + ":" + name
 
-        return None
\ No newline at end of file
+    @staticmethod
+    def ensure_namespace(namespace):
+        if namespace and not cmds.namespace(exists=":" + namespace):
+            cmds.namespace(add=namespace, parent=":")
\ No newline at end of file
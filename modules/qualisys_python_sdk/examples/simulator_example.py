@@ -0,0 +1,38 @@
+"""
+    Serves synthetic frames on the RT port, for clients to connect to instead of QTM
+    Usage: simulator_example.py [frequency] [markers] [bodies] [skeletons]
+"""
+
+import asyncio
+import sys
+
+from qtm.simulator import Simulator, SyntheticSource
+
+
+async def report(simulator):
+    """Prints how many frames have been sent every second"""
+    while True:
+        await asyncio.sleep(1)
+        print(
+            "Clients: {} Frames sent: {} dropped: {}".format(
+                simulator.clients, simulator.frames_sent, simulator.frames_dropped
+            )
+        )
+
+
+async def setup(frequency, markers, bodies, skeletons):
+    """Main function"""
+    source = SyntheticSource(
+        markers=markers, bodies=bodies, skeletons=skeletons, frequency=frequency
+    )
+    simulator = Simulator(source)
+    await simulator.start()
+    print("Serving {} Hz on port {}".format(frequency, simulator.port))
+
+    asyncio.ensure_future(report(simulator))
+
+
+if __name__ == "__main__":
+    ARGS = [int(arg) for arg in sys.argv[1:]]
+    asyncio.ensure_future(setup(*(ARGS + [1000, 50, 5, 1][len(ARGS) :])))
+    asyncio.get_event_loop().run_forever()
@@ -14,7 +14,7 @@ if PYTHON3:
     from .control import TakeControl
 
 from .packet import QRTPacket, QRTEvent
-from .receiver import Receiver
+from .receiver import Receiver, UdpReceiver, LossStats
 
 # pylint: disable=C0330
 
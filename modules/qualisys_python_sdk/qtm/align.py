@@ -0,0 +1,120 @@
+""" Aligning frames streamed from several QTM servers by timestamp """
+
+import collections
+
+# pylint: disable=C0330
+
+
+class _Source(object):
+    __slots__ = ("frames", "offsets", "last_timestamp", "last_received")
+
+    def __init__(self):
+        # (aligned time, frame), oldest first.
+        self.frames = collections.deque()
+        # (received, offset) with increasing offsets, for a sliding minimum.
+        self.offsets = collections.deque()
+        self.last_timestamp = None
+        self.last_received = None
+
+
+class TimestampAligner(object):
+    """Pairs up frames from several QTM servers that were captured at the same time.
+
+    Each server timestamps frames with its own clock. The offset of a server's
+    clock to the local one is estimated as the smallest difference between
+    when a frame was received and its timestamp over the last window seconds,
+    i.e. from the frames that were least delayed on the way. Timestamps are
+    then comparable between servers, and :func:`frames` picks the frame of each
+    server closest to a common time.
+
+    :param window: Seconds over which the smallest offset is taken, short
+        enough to follow the clocks drifting apart.
+    :param history: Seconds of frames kept per server to pick from.
+    :param timeout: Seconds without frames after which a server is left out,
+        so that one stopping does not hold the others back.
+    """
+
+    def __init__(self, window=10.0, history=0.5, timeout=0.5):
+        self.window = window
+        self.history = history
+        self.timeout = timeout
+        self._sources = {}
+
+    def add(self, source, timestamp, now, frame):
+        """Add a frame.
+
+        :param source: Key of the server, e.g. its name.
+        :param timestamp: Timestamp of the frame in microseconds.
+        :param now: Local time the frame was received, in seconds.
+        """
+        state = self._sources.get(source)
+        if state is None or (
+            state.last_timestamp is not None and timestamp < state.last_timestamp
+        ):
+            # New server, or a new measurement restarted its timestamps.
+            state = self._sources[source] = _Source()
+
+        state.last_timestamp = timestamp
+        state.last_received = now
+
+        capture_time = timestamp / 1e6
+        offset = now - capture_time
+        offsets = state.offsets
+        while offsets and offsets[-1][1] >= offset:
+            offsets.pop()
+        offsets.append((now, offset))
+        while offsets[0][0] < now - self.window:
+            offsets.popleft()
+
+        state.frames.append((capture_time + offsets[0][1], frame))
+        while state.frames[0][0] < now - self.history and len(state.frames) > 1:
+            state.frames.popleft()
+
+    def remove(self, source):
+        self._sources.pop(source, None)
+
+    def reset(self):
+        """Forget all servers, e.g. when streaming stops"""
+        self._sources.clear()
+
+    def offset(self, source):
+        """Estimated local time minus server time in seconds, None if unknown"""
+        state = self._sources.get(source)
+        if state is None or not state.offsets:
+            return None
+        return state.offsets[0][1]
+
+    def frames(self, now):
+        """Frames of all active servers captured closest to the same time.
+
+        The common time is the newest that every active server has a frame for.
+        Frames older than those returned are discarded.
+
+        :param now: Local time in seconds.
+        :rtype: dict of source to frame.
+        """
+        active = [
+            (source, state)
+            for source, state in self._sources.items()
+            if state.frames and now - state.last_received <= self.timeout
+        ]
+        if not active:
+            return {}
+
+        target = min(state.frames[-1][0] for _, state in active)
+
+        result = {}
+        for source, state in active:
+            frames = state.frames
+            # Newest frame at or before the target, or the oldest kept if none is.
+            while len(frames) > 1 and frames[1][0] <= target:
+                frames.popleft()
+            if (
+                len(frames) > 1
+                and frames[0][0] < target
+                and frames[1][0] - target < target - frames[0][0]
+            ):
+                frames.popleft()
+            result[source] = frames[0][1]
+
+        return result
@@ -0,0 +1,172 @@
+""" Measuring how long frames take from QTM to being applied """
+
+import collections
+import math
+
+# pylint: disable=C0330
+
+LatencyStats = collections.namedtuple("LatencyStats", "count p50 p95 p99 max")
+LatencyStats.__doc__ = """Latencies of the frames in the window, in seconds."""
+
+
+def _percentile(ordered, fraction):
+    # Nearest rank.
+    return ordered[max(0, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def latency_stats(samples):
+    """:class:`LatencyStats` of the samples, None if there are none"""
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+    return LatencyStats(
+        len(ordered),
+        _percentile(ordered, 0.50),
+        _percentile(ordered, 0.95),
+        _percentile(ordered, 0.99),
+        ordered[-1],
+    )
+
+
+class _Frame(object):
+    __slots__ = ("timestamp", "received", "applied")
+
+    def __init__(self, timestamp, received):
+        self.timestamp = timestamp
+        self.received = received
+        self.applied = False
+
+
+class LatencyMonitor(object):
+    """Collects the latency of each frame through the stages of applying it.
+
+    Call :func:`received` as each data packet has been parsed, and
+    :func:`applied` as each stage, e.g. a streamer, has finished with it. All
+    times are local, in seconds from the same clock such as
+    ``time.perf_counter``. The latencies of the last window frames are kept per
+    stage:
+
+    * ``parse``: from the data being read from the socket to the packet being
+      parsed and handed to the thread applying it, including any wait for it.
+    * each stage passed to :func:`applied`: from the data being read to the
+      stage finishing.
+    * ``capture``: from the frame being captured to the last stage finishing.
+      QTM timestamps frames with its own clock, so the capture time is
+      estimated from the least delayed frame in the window, and this is the
+      latency on top of that frame's.
+
+    Frames missing from the frame numbers received are counted in
+    ``dropped_frames``, given frame_step, and frames received but passed over
+    for a newer one in ``skipped_frames``.
+
+    :param window: Number of frames the percentiles are taken over.
+    :param frame_step: Frame numbers between consecutive streamed frames, see
+        :func:`qtm.streamrate.frame_step`. None if unknown, drops are not
+        counted then.
+    """
+
+    def __init__(self, window=1000, frame_step=1):
+        self.window = window
+        self.frame_step = frame_step
+        self.reset()
+
+    def reset(self):
+        """Forget all frames and counts, e.g. when a new stream starts"""
+        self.received_frames = 0
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+
+        self._frames = collections.OrderedDict()
+        self._samples = {}
+        self._offsets = collections.deque()
+        self._last_framenumber = None
+
+    def _samples_of(self, stage):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = collections.deque(maxlen=self.window)
+        return samples
+
+    def received(self, packet, received, parsed):
+        """A data packet has been parsed.
+
+        :param packet: The :class:`qtm.QRTPacket`.
+        :param received: When its data was read from the socket.
+        :param parsed: When it had been parsed.
+        """
+        framenumber = packet.framenumber
+        last = self._last_framenumber
+
+        if last is not None and framenumber <= last:
+            # A new measurement, or a frame that came late over UDP.
+            if last - framenumber < self.window * (self.frame_step or 1):
+                return
+            self._frames.clear()
+            self._offsets.clear()
+        elif last is not None and self.frame_step:
+            gap = int(round((framenumber - last) / float(self.frame_step))) - 1
+            self.dropped_frames += max(0, gap)
+
+        self._last_framenumber = framenumber
+        self.received_frames += 1
+
+        frames = self._frames
+        frames[framenumber] = _Frame(packet.timestamp, received)
+        if len(frames) > self.window:
+            _, frame = frames.popitem(last=False)
+            if not frame.applied:
+                self.skipped_frames += 1
+
+        # Sliding minimum of the offset to QTM's clock, see TimestampAligner.
+        offset = received - packet.timestamp / 1e6
+        offsets = self._offsets
+        while offsets and offsets[-1][1] >= offset:
+            offsets.pop()
+        offsets.append((framenumber, offset))
+        while framenumber - offsets[0][0] >= self.window * (self.frame_step or 1):
+            offsets.popleft()
+
+        self._samples_of("parse").append(parsed - received)
+
+    def applied(self, packet, stage, finished):
+        """A stage has finished applying a packet.
+
+        :param stage: Name of the stage, e.g. 'markers'.
+        :param finished: When it finished.
+        """
+        frames = self._frames
+        frame = frames.get(packet.framenumber)
+        if frame is None:
+            return
+
+        # Older frames are never applied once a newer one has been.
+        while True:
+            framenumber, older = next(iter(frames.items()))
+            if older is frame:
+                break
+            del frames[framenumber]
+            if not older.applied:
+                self.skipped_frames += 1
+
+        self._samples_of(stage).append(finished - frame.received)
+
+        captured = frame.timestamp / 1e6 + self._offsets[0][1]
+        samples = self._samples_of("capture")
+        if frame.applied:
+            # Only the last stage to finish counts.
+            samples[-1] = max(samples[-1], finished - captured)
+        else:
+            samples.append(finished - captured)
+            frame.applied = True
+
+    def stats(self):
+        """:class:`LatencyStats` per stage.
+
+        :rtype: dict of stage name to :class:`LatencyStats`.
+        """
+        return {
+            stage: latency_stats(samples)
+            for stage, samples in self._samples.items()
+            if samples
+        }
@@ -6,6 +6,11 @@ import struct
 
 from enum import Enum
 
+try:
+    import numpy as np
+except ImportError:  # Only the *_array getters need numpy.
+    np = None
+
 # pylint: disable=C0103, C0330, E1101, W0212
 
 # Used in protocol
@@ -46,6 +51,18 @@ RT3DMarkerPositionNoLabelResidual = namedtuple(
 )
 RT3DMarkerPositionNoLabelResidual.format = struct.Struct("<3fif")
 
+if np is not None:
+    RT3DMarkerPosition.dtype = np.dtype([("position", "<f4", (3,))])
+    RT3DMarkerPositionResidual.dtype = np.dtype(
+        [("position", "<f4", (3,)), ("residual", "<f4")]
+    )
+    RT3DMarkerPositionNoLabel.dtype = np.dtype(
+        [("position", "<f4", (3,)), ("id", "<i4")]
+    )
+    RT3DMarkerPositionNoLabelResidual.dtype = np.dtype(
+        [("position", "<f4", (3,)), ("id", "<i4"), ("residual", "<f4")]
+    )
+
 # 6D
 RT6DComponent = namedtuple("RT6DComponent", "body_count drop_rate out_of_sync_rate")
 RT6DComponent.format = struct.Struct("<ihh")
@@ -121,6 +138,13 @@ RTSegmentPosition.format = struct.Struct("<3f")
 RTSegmentRotation = namedtuple("RTSegmentRotation", "x y z w")
 RTSegmentRotation.format = struct.Struct("<4f")
 
+RTSegment = namedtuple("RTSegment", "id position rotation")
+
+if np is not None:
+    RTSegment.dtype = np.dtype(
+        [("id", "<i4"), ("position", "<f4", (3,)), ("rotation", "<f4", (4,))]
+    )
+
 RTImage = namedtuple(
     "RTImage",
     "id format width height left_crop top_crop right_crop bottom_crop image_size",
@@ -250,6 +274,9 @@ class QRTPacket(object):
 
     """
 
+    # Analog formats keyed by (channel count, sample count), shared by all packets.
+    _analog_formats = {}
+
     def __init__(self, data):
         self.data = data
 
@@ -278,6 +305,15 @@ class QRTPacket(object):
         position += component_type.format.size
         return position, value
 
+    @staticmethod
+    def _get_array(dtype, data, position, count):
+        if np is None:
+            raise ImportError("numpy is required for the QRTPacket array getters")
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+        # Packets joined from several reads are backed by a writable bytearray.
+        array.flags.writeable = False
+        return array
+
     @staticmethod
     def _get_2d_markers(data, component_info, component_position, index=None):
         components = []
@@ -314,6 +350,68 @@ class QRTPacket(object):
 
         return components
 
+    @staticmethod
+    def _get_3d_markers_array(type_, component_info, data, component_position):
+        return QRTPacket._get_array(
+            type_.dtype, data, component_position, component_info.marker_count
+        )
+
+    @staticmethod
+    def _get_skeletons_array(component_info, data, component_position):
+        components = []
+        append_components = components.append
+        for _ in range(component_info.skeleton_count):
+            component_position, info = QRTPacket._get_exact(
+                RTSegmentCount, data, component_position
+            )
+            segments = QRTPacket._get_array(
+                RTSegment.dtype, data, component_position, info.segment_count
+            )
+            component_position += segments.nbytes
+            append_components(segments)
+
+        return components
+
+    @staticmethod
+    def _get_6d_array(
+        component_info, data, component_position, rotation_size, residual=False
+    ):
+        body_count = component_info.body_count
+        float_count = 3 + rotation_size + (1 if residual else 0)
+        bodies = QRTPacket._get_array(
+            "<f4", data, component_position, body_count * float_count
+        ).reshape(body_count, float_count)
+
+        rotations = bodies[:, 3 : 3 + rotation_size]
+        if rotation_size == 9:
+            # QTM sends each rotation matrix column by column.
+            rotations = rotations.reshape(body_count, 3, 3).transpose(0, 2, 1)
+
+        arrays = [
+            np.ascontiguousarray(bodies[:, 0:3]),
+            np.ascontiguousarray(rotations),
+        ]
+        if residual:
+            arrays.append(bodies[:, -1].copy())
+
+        # Copies, but read-only like the views of the other array getters.
+        for array in arrays:
+            array.flags.writeable = False
+        return tuple(arrays)
+
+    @staticmethod
+    def _get_analog_format(channel_count, sample_count):
+        """Cached struct for all samples of all channels of a device"""
+        key = (channel_count, sample_count)
+        try:
+            return QRTPacket._analog_formats[key]
+        except KeyError:
+            analog_format = struct.Struct(
+                RTAnalogChannel.format_str % (channel_count * sample_count)
+            )
+            QRTPacket._analog_formats[key] = analog_format
+            return analog_format
+
     @ComponentGetter(QRTComponentType.ComponentAnalog, RTAnalogComponent)
     def get_analog(self, component_info=None, data=None, component_position=None):
         """Get analog data."""
@@ -328,14 +426,53 @@ class QRTPacket(object):
                     RTSampleNumber, data, component_position
                 )
 
-                RTAnalogChannel.format = struct.Struct(
-                    RTAnalogChannel.format_str % device.sample_count
+                analog_format = QRTPacket._get_analog_format(
+                    device.channel_count, device.sample_count
                 )
-                for _ in range(device.channel_count):
-                    component_position, channel = QRTPacket._get_tuple(
-                        RTAnalogChannel, data, component_position
+                samples = analog_format.unpack_from(data, component_position)
+                component_position += analog_format.size
+
+                sample_count = device.sample_count
+                for channel in range(device.channel_count):
+                    start = channel * sample_count
+                    append_components(
+                        (
+                            device,
+                            sample_number,
+                            RTAnalogChannel(samples[start : start + sample_count]),
+                        )
                     )
-                    append_components((device, sample_number, channel))
+
+        return components
+
+    @ComponentGetter(QRTComponentType.ComponentAnalog, RTAnalogComponent)
+    def get_analog_array(self, component_info=None, data=None, component_position=None):
+        """Get analog data as arrays.
+
+        Returns a list with a tuple ``(device, sample_number, samples)`` per device,
+        where ``samples`` is a read-only (channels, samples) float32 view into the
+        packet data. Devices without samples are left out, as in ``get_analog``.
+        """
+        components = []
+        append_components = components.append
+        for _ in range(component_info.device_count):
+            component_position, device = QRTPacket._get_exact(
+                RTAnalogDevice, data, component_position
+            )
+            if device.sample_count > 0:
+                component_position, sample_number = QRTPacket._get_exact(
+                    RTSampleNumber, data, component_position
+                )
+
+                samples = QRTPacket._get_array(
+                    "<f4",
+                    data,
+                    component_position,
+                    device.channel_count * device.sample_count,
+                ).reshape(device.channel_count, device.sample_count)
+                component_position += samples.nbytes
+
+                append_components((device, sample_number, samples))
 
         return components
 
@@ -351,15 +488,36 @@ class QRTPacket(object):
                 RTAnalogDeviceSingle, data, component_position
             )
 
-            RTAnalogDeviceSamples.format = struct.Struct(
-                RTAnalogDeviceSamples.format_str % device.channel_count
-            )
-            component_position, sample = QRTPacket._get_tuple(
-                RTAnalogDeviceSamples, data, component_position
+            analog_format = QRTPacket._get_analog_format(device.channel_count, 1)
+            sample = RTAnalogDeviceSamples(
+                analog_format.unpack_from(data, component_position)
             )
+            component_position += analog_format.size
             append_components((device, sample))
         return components
 
+    @ComponentGetter(QRTComponentType.ComponentAnalogSingle, RTAnalogComponent)
+    def get_analog_single_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get a single analog sample per channel as arrays.
+
+        Returns a list with a tuple ``(device, samples)`` per device, where
+        ``samples`` is a read-only (channels,) float32 view into the packet data.
+        """
+        components = []
+        append_components = components.append
+        for _ in range(component_info.device_count):
+            component_position, device = QRTPacket._get_exact(
+                RTAnalogDeviceSingle, data, component_position
+            )
+            samples = QRTPacket._get_array(
+                "<f4", data, component_position, device.channel_count
+            )
+            component_position += samples.nbytes
+            append_components((device, samples))
+        return components
+
     @ComponentGetter(QRTComponentType.ComponentForce, RTForceComponent)
     def get_force(self, component_info=None, data=None, component_position=None):
         """Get force data."""
@@ -378,6 +536,28 @@ class QRTPacket(object):
             append_components((plate, force_list))
         return components
 
+    @ComponentGetter(QRTComponentType.ComponentForce, RTForceComponent)
+    def get_force_array(self, component_info=None, data=None, component_position=None):
+        """Get force data as arrays.
+
+        Returns a list with a tuple ``(plate, forces)`` per plate, where ``forces``
+        is a read-only (force_count, 9) float32 view into the packet data with the
+        columns in ``RTForce`` order.
+        """
+        components = []
+        append_components = components.append
+        field_count = len(RTForce._fields)
+        for _ in range(component_info.plate_count):
+            component_position, plate = QRTPacket._get_exact(
+                RTForcePlate, data, component_position
+            )
+            forces = QRTPacket._get_array(
+                "<f4", data, component_position, plate.force_count * field_count
+            ).reshape(plate.force_count, field_count)
+            component_position += forces.nbytes
+            append_components((plate, forces))
+        return components
+
     @ComponentGetter(QRTComponentType.ComponentForceSingle, RTForceComponent)
     def get_force_single(self, component_info=None, data=None, component_position=None):
         """Get a single force data channel."""
@@ -461,6 +641,55 @@ class QRTPacket(object):
             append_components((position, euler, residual))
         return components
 
+    @ComponentGetter(QRTComponentType.Component6d, RT6DComponent)
+    def get_6d_array(self, component_info=None, data=None, component_position=None):
+        """Get 6D data as arrays.
+
+        Returns a tuple ``(positions, rotations)`` of read-only float32 arrays
+        shaped (N, 3) and (N, 3, 3). ``rotations[i]`` is the rotation matrix of
+        body ``i`` indexed as [row, column]. QTM sends the matrices column-major,
+        so ``rotations[i].T.ravel()`` matches the ``get_6d`` matrix tuple.
+        """
+        return self._get_6d_array(component_info, data, component_position, 9)
+
+    @ComponentGetter(QRTComponentType.Component6dRes, RT6DComponent)
+    def get_6d_residual_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 6D data with residual as arrays.
+
+        Returns a tuple ``(positions, rotations, residuals)`` of read-only float32
+        arrays shaped (N, 3), (N, 3, 3) and (N,). The rotation matrices are laid
+        out as in ``get_6d_array``.
+        """
+        return self._get_6d_array(
+            component_info, data, component_position, 9, residual=True
+        )
+
+    @ComponentGetter(QRTComponentType.Component6dEuler, RT6DComponent)
+    def get_6d_euler_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 6D data with euler rotations as arrays.
+
+        Returns a tuple ``(positions, eulers)`` of read-only float32 arrays shaped
+        (N, 3).
+        """
+        return self._get_6d_array(component_info, data, component_position, 3)
+
+    @ComponentGetter(QRTComponentType.Component6dEulerRes, RT6DComponent)
+    def get_6d_euler_residual_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 6D data with residuals and euler rotations as arrays.
+
+        Returns a tuple ``(positions, eulers, residuals)`` of read-only float32
+        arrays shaped (N, 3), (N, 3) and (N,).
+        """
+        return self._get_6d_array(
+            component_info, data, component_position, 3, residual=True
+        )
+
     @ComponentGetter(QRTComponentType.ComponentImage, RTImageComponent)
     def get_image(self, component_info=None, data=None, component_position=None):
         """Get image."""
@@ -470,7 +699,7 @@ class QRTPacket(object):
             component_position, image_info = QRTPacket._get_exact(
                 RTImage, data, component_position
             )
-            append_components((image_info, data[component_position:-1]))
+            append_components((image_info, bytes(data[component_position:-1])))
         return components
 
     @ComponentGetter(QRTComponentType.Component3d, RT3DComponent)
@@ -507,6 +736,56 @@ class QRTPacket(object):
             RT3DMarkerPositionNoLabelResidual, component_info, data, component_position
         )
 
+    @ComponentGetter(QRTComponentType.Component3d, RT3DComponent)
+    def get_3d_markers_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 3D markers as a read-only (N, 3) float32 array.
+
+        The array is a view into the packet data, no per marker objects are created.
+        """
+        return self._get_3d_markers_array(
+            RT3DMarkerPosition, component_info, data, component_position
+        )["position"]
+
+    @ComponentGetter(QRTComponentType.Component3dRes, RT3DComponent)
+    def get_3d_markers_residual_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 3D markers with residual as a read-only (N, 4) float32 array.
+
+        Columns are x, y, z and residual. The array is a view into the packet data.
+        """
+        markers = self._get_3d_markers_array(
+            RT3DMarkerPositionResidual, component_info, data, component_position
+        )
+        return markers.view("<f4").reshape(len(markers), 4)
+
+    @ComponentGetter(QRTComponentType.Component3dNoLabels, RT3DComponent)
+    def get_3d_markers_no_label_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 3D markers without label as a read-only structured array.
+
+        Fields are ``position`` (float32, 3) and ``id`` (int32), so
+        ``markers["position"]`` is an (N, 3) view into the packet data.
+        """
+        return self._get_3d_markers_array(
+            RT3DMarkerPositionNoLabel, component_info, data, component_position
+        )
+
+    @ComponentGetter(QRTComponentType.Component3dNoLabelsRes, RT3DComponent)
+    def get_3d_markers_no_label_residual_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get 3D markers without label with residual as a read-only structured array.
+
+        Fields are ``position`` (float32, 3), ``id`` (int32) and ``residual`` (float32).
+        """
+        return self._get_3d_markers_array(
+            RT3DMarkerPositionNoLabelResidual, component_info, data, component_position
+        )
+
     @ComponentGetter(QRTComponentType.Component2d, RT2DComponent)
     def get_2d_markers(
         self, component_info=None, data=None, component_position=None, index=None
@@ -562,3 +841,35 @@ class QRTPacket(object):
             append_components(segments)
         return components
 
+    @ComponentGetter(QRTComponentType.ComponentSkeleton, RTSkeletonComponent)
+    def get_skeletons_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get skeletons as a list of read-only structured arrays, one per skeleton.
+
+        Fields are ``id`` (int32), ``position`` (float32, 3) and ``rotation``
+        (float32, 4 as x, y, z, w). Each array is a view into the packet data.
+        """
+        return self._get_skeletons_array(component_info, data, component_position)
+
+    @ComponentGetter(QRTComponentType.ComponentSkeleton, RTSkeletonComponent)
+    def get_skeletons_flat_array(
+        self, component_info=None, data=None, component_position=None
+    ):
+        """Get all skeleton segments as one structured array.
+
+        Returns a tuple ``(segments, offsets)`` where the segments of skeleton
+        ``i`` are ``segments[offsets[i]:offsets[i + 1]]``. Uses the same fields as
+        :func:`get_skeletons_array`, but the segments are copied since skeletons
+        are not contiguous in the packet.
+        """
+        skeletons = self._get_skeletons_array(component_info, data, component_position)
+        offsets = np.zeros(len(skeletons) + 1, dtype=np.intp)
+        np.cumsum([len(segments) for segments in skeletons], out=offsets[1:])
+
+        if skeletons:
+            segments = np.concatenate(skeletons)
+        else:
+            segments = np.empty(0, dtype=RTSegment.dtype)
+
+        return segments, offsets
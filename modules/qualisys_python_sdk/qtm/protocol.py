@@ -10,7 +10,7 @@ import logging
 from qtm.packet import QRTPacketType
 from qtm.packet import QRTPacket, QRTEvent
 from qtm.packet import RTheader, RTEvent, RTCommand
-from qtm.receiver import Receiver
+from qtm.receiver import Receiver, UdpReceiver
 
 # pylint: disable=C0330
 
@@ -125,6 +125,10 @@ class QTMProtocol(asyncio.Protocol):
         """ Received from QTM and route accordingly """
         self._receiver.data_received(data)
 
+    def stream_started(self):
+        """Reply to streamframes when the frames arrive elsewhere, e.g. over UDP"""
+        self._deliver_promise(b"Ok")
+
     def _deliver_promise(self, data):
         try:
             future = self.request_queue.pop()
@@ -177,3 +181,52 @@ class QTMProtocol(asyncio.Protocol):
         LOG.info("Disconnected")
         if self.on_disconnect is not None:
             self.on_disconnect(exc)
+
+
+class QRTUdpProtocol(asyncio.DatagramProtocol):
+    """
+    Receives frames streamed over UDP, see :class:`qtm.receiver.UdpReceiver`
+    Should be constructed by ::QRTConnection.stream_frames
+    """
+
+    def __init__(self, on_packet, frame_step=1, on_started=None):
+        self.on_packet = on_packet
+        self.on_started = on_started
+        self.transport = None
+
+        self.receiver = UdpReceiver(
+            {
+                QRTPacketType.PacketData: self._on_data,
+                QRTPacketType.PacketNoMoreData: lambda _: LOG.debug(
+                    QRTPacketType.PacketNoMoreData
+                ),
+            },
+            frame_step=frame_step,
+        )
+
+    @property
+    def port(self):
+        """Local port the frames are received on"""
+        return self.transport.get_extra_info("sockname")[1]
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.receiver.datagram_received(data, addr)
+
+    def _on_data(self, packet):
+        if self.on_started is not None:
+            on_started, self.on_started = self.on_started, None
+            on_started()
+
+        if self.on_packet is not None:
+            self.on_packet(packet)
+
+    def error_received(self, exc):
+        LOG.debug("UDP error: %s", exc)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
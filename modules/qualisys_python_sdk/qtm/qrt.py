@@ -5,7 +5,8 @@ import logging
 from functools import wraps
 
 from qtm.packet import QRTPacketType, QRTPacket
-from qtm.protocol import QTMProtocol, QRTCommandException
+from qtm.protocol import QTMProtocol, QRTUdpProtocol, QRTCommandException
+from qtm.streamrate import frame_step
 
 # pylint: disable=C0330
 
@@ -44,9 +45,11 @@ class QRTConnection(object):
         super(QRTConnection, self).__init__()
         self._protocol = protocol
         self._timeout = timeout
+        self._udp = None
 
     def disconnect(self):
         """Disconnect from QTM."""
+        self._close_udp()
         self._protocol.transport.close()
 
     def has_transport(self):
@@ -144,7 +147,9 @@ class QRTConnection(object):
             self._protocol.send_command(cmd), timeout=self._timeout
         )
 
-    async def stream_frames(self, frames="allframes", components=None, on_packet=None):
+    async def stream_frames(
+        self, frames="allframes", components=None, on_packet=None, udp_port=None
+    ):
         """Stream measured frames from QTM until :func:`~qtm.QRTConnection.stream_frames_stop`
            is called.
 
@@ -156,6 +161,9 @@ class QRTConnection(object):
                 '3dnolabelsres', 'force', 'forcesingle', '6d', '6dres',
                 '6deuler', '6deulerres', 'gazevector', 'image', 'timecode',
                 'skeleton', 'skeleton:global'
+        :param udp_port: Receive the frames over UDP on this local port, 0 for any
+            free port, instead of over the command connection. Frames arriving
+            out of order are discarded, see :attr:`udp_stats`.
 
         :rtype: The string 'Ok' if successful
         """
@@ -165,6 +173,11 @@ class QRTConnection(object):
         else:
             _validate_components(components)
 
+        if udp_port is not None:
+            return await self._stream_frames_udp(
+                frames, components, on_packet, udp_port
+            )
+
         self._protocol.set_on_packet(on_packet)
 
         cmd = "streamframes %s %s" % (frames, " ".join(components))
@@ -172,10 +185,49 @@ class QRTConnection(object):
             self._protocol.send_command(cmd), timeout=self._timeout
         )
 
+    async def _stream_frames_udp(self, frames, components, on_packet, udp_port):
+        self._close_udp()
+
+        # Receive on the interface the command connection uses.
+        host = self._protocol.transport.get_extra_info("sockname")[0]
+        _, self._udp = await self._protocol.loop.create_datagram_endpoint(
+            lambda: QRTUdpProtocol(
+                on_packet,
+                frame_step=frame_step(frames),
+                on_started=self._protocol.stream_started,
+            ),
+            local_addr=(host, udp_port),
+        )
+
+        cmd = "streamframes %s UDP:%d %s" % (
+            frames,
+            self._udp.port,
+            " ".join(components),
+        )
+        try:
+            return await asyncio.wait_for(
+                self._protocol.send_command(cmd), timeout=self._timeout
+            )
+        except (QRTCommandException, asyncio.TimeoutError):
+            self._close_udp()
+            raise
+
+    def _close_udp(self):
+        if self._udp is not None:
+            self._udp.close()
+
+    @property
+    def udp_stats(self):
+        """:class:`qtm.receiver.LossStats` of the last stream received over UDP,
+        None if none has been.
+        """
+        return None if self._udp is None else self._udp.receiver.stats
+
     async def stream_frames_stop(self):
         """Stop streaming frames."""
 
         self._protocol.set_on_packet(None)
+        self._close_udp()
 
         cmd = "streamframes stop"
         await self._protocol.send_command(cmd, callback=False)
@@ -378,4 +430,3 @@ def _validate_components(components):
             "skeleton:global",
         ]:
             raise QRTCommandException("%s is not a valid component" % component)
-
@@ -2,51 +2,234 @@ import logging
 
 from qtm.packet import QRTPacketType
 from qtm.packet import QRTPacket, QRTEvent
-from qtm.packet import RTheader, RTEvent, RTCommand
+from qtm.packet import RTheader, RTEvent, RTCommand, RTDataQRTPacket
 
 LOG = logging.getLogger("qtm")
 
+# Looked up once, member access on an Enum class is slow for every packet.
+_PACKET_DATA = QRTPacketType.PacketData
+_PACKET_EVENT = QRTPacketType.PacketEvent
+_TEXT_PACKETS = (
+    QRTPacketType.PacketError,
+    QRTPacketType.PacketCommand,
+    QRTPacketType.PacketXML,
+)
+
 
 class Receiver(object):
-    def __init__(self, handlers):
+    """Split the byte stream from QTM into packets and route them to handlers.
+
+    Packets are handed on as memoryviews into the received data, so the data
+    passed to :func:`data_received` must not be modified afterwards. A packet
+    split over several reads is joined from them into bytes once complete, so it
+    is copied once however many reads it spans. Small packets split over short
+    reads take about as long as when all data was copied, the saving is for
+    large packets.
+
+    :param coalesce: Only deliver the newest data packet of each batch of received
+        data. Older data packets are skipped without being parsed and counted in
+        ``dropped_frames``, all other packets are still delivered in order.
+    """
+
+    def __init__(self, handlers, coalesce=False):
         self._handlers = handlers
-        self._received_data = b""
+        self._partial = None
+        self._partial_end = 0
+
+        self.coalesce = coalesce
+        self.dropped_frames = 0
 
     def data_received(self, data):
         """ Received from QTM and route accordingly """
-        self._received_data += data
+        data = memoryview(data)
         h_size = RTheader.size
+        end = len(data)
+        position = 0
+        packets = []
 
-        data = self._received_data
-        size, type_ = RTheader.unpack_from(data, 0)
+        if self._partial is not None:
+            position = self._complete_partial(data, packets)
+            if position is None:
+                return
 
-        while len(data) >= size:
-            self._parse_received(data[h_size:size], type_)
-            data = data[size:]
-
-            if len(data) < h_size:
+        while end - position >= h_size:
+            size, type_ = RTheader.unpack_from(data, position)
+            if end - position < size:
                 break
 
-            size, type_ = RTheader.unpack_from(data, 0)
+            packets.append((data[position + h_size : position + size], type_))
+            position += size
+
+        if position < end:
+            self._partial = [data[position:]]
+            self._partial_end = end - position
+
+        if self.coalesce:
+            self._dispatch_coalesced(packets)
+        else:
+            for packet, type_ in packets:
+                self._parse_received(packet, type_)
+
+    def _dispatch_coalesced(self, packets):
+        latest = None
+        for index, (_, type_) in enumerate(packets):
+            if type_ == QRTPacketType.PacketData.value:
+                latest = index
+
+        for index, (packet, type_) in enumerate(packets):
+            if type_ == QRTPacketType.PacketData.value and index != latest:
+                self.dropped_frames += 1
+            else:
+                self._parse_received(packet, type_)
 
-        self._received_data = data
+    def _complete_partial(self, data, packets):
+        """Add data to the packet started in an earlier read.
+
+        Appends the packet to packets and returns the position in data after it
+        when complete, otherwise returns None. Until then the views of the reads
+        it arrived in are kept, rather than copied into a buffer as they arrive.
+        """
+        h_size = RTheader.size
+        pieces = self._partial
+        received = self._partial_end + len(data)
+
+        if received >= h_size:
+            header = pieces[0]
+            if len(header) < h_size:
+                header = b"".join(pieces + [data[:h_size]])
+            size, type_ = RTheader.unpack_from(header, 0)
+
+            count = size - self._partial_end
+            if len(data) >= count:
+                pieces.append(data[:count])
+                self._partial = None
+                if len(pieces[0]) >= h_size:
+                    pieces[0] = pieces[0][h_size:]
+                    packet = b"".join(pieces)
+                else:
+                    packet = b"".join(pieces)[h_size:]
+                packets.append((packet, type_))
+                return count
+
+        pieces.append(data)
+        self._partial_end = received
+        return None
 
     def _parse_received(self, data, type_):
         type_ = QRTPacketType(type_)
 
-        if (
-            type_ == QRTPacketType.PacketError
-            or type_ == QRTPacketType.PacketCommand
-            or type_ == QRTPacketType.PacketXML
-        ):
-            data = data[:-1]
-        elif type_ == QRTPacketType.PacketData:
+        if type_ is _PACKET_DATA:
             data = QRTPacket(data)
-        elif type_ == QRTPacketType.PacketEvent:
+        elif type_ in _TEXT_PACKETS:
+            data = bytes(data[:-1])
+        elif type_ is _PACKET_EVENT:
             event, = RTEvent.unpack(data)
             data = QRTEvent(ord(event))
+        else:
+            data = bytes(data)
 
         try:
             self._handlers[type_](data)
         except KeyError:
             LOG.error("Non handled packet type! - %s", type_)
+
+
+class LossStats(object):
+    """Counts of the data packets of a UDP stream.
+
+    received counts the frames delivered, out_of_order the frames discarded
+    because a newer frame had already been delivered and lost the frames that
+    were never delivered, late ones included, judged from gaps in the frame
+    numbers.
+    """
+
+    __slots__ = ("received", "out_of_order", "lost")
+
+    def __init__(self):
+        self.received = 0
+        self.out_of_order = 0
+        self.lost = 0
+
+    @property
+    def loss_ratio(self):
+        """Fraction of the frames sent that were never delivered"""
+        total = self.received + self.lost
+        return self.lost / float(total) if total else 0.0
+
+    def __repr__(self):
+        return "LossStats(received=%d, out_of_order=%d, lost=%d)" % (
+            self.received,
+            self.out_of_order,
+            self.lost,
+        )
+
+
+class UdpReceiver(Receiver):
+    """Route the datagrams of a UDP stream from QTM to handlers.
+
+    QTM sends one packet per datagram, pass each to :func:`datagram_received`.
+    Datagrams can be lost or arrive out of order. A data packet that is not newer
+    than the last one delivered is discarded unparsed, so handlers see frame
+    numbers strictly increasing, and both are counted in ``stats``.
+
+    :param frame_step: Frame numbers between consecutive frames of the stream, see
+        :func:`qtm.streamrate.frame_step`. Larger gaps are counted as lost frames.
+        None when the step varies, lost frames are then not counted.
+    :param max_reorder: Frames a datagram can arrive late by. A frame further
+        behind the last one delivered is taken as the start of a new
+        measurement rather than discarded.
+    """
+
+    def __init__(self, handlers, frame_step=1, max_reorder=100):
+        super(UdpReceiver, self).__init__(handlers)
+        self.frame_step = frame_step
+        self.max_reorder = max_reorder
+        self.stats = LossStats()
+        self._last_framenumber = None
+
+    def reset(self):
+        """Start counting from scratch, e.g. when a new stream is started"""
+        self.stats = LossStats()
+        self._last_framenumber = None
+
+    def datagram_received(self, data, address=None):
+        """Received from QTM and route accordingly"""
+        data = memoryview(data)
+        h_size = RTheader.size
+
+        if len(data) < h_size:
+            LOG.debug("Short datagram from %s", address)
+            return
+
+        size, type_ = RTheader.unpack_from(data, 0)
+        if size < h_size or size > len(data):
+            LOG.debug("Truncated datagram from %s", address)
+            return
+
+        packet = data[h_size:size]
+
+        if type_ == QRTPacketType.PacketData.value:
+            if not self._in_order(RTDataQRTPacket.unpack_from(packet, 0)[1]):
+                return
+            self.stats.received += 1
+
+        self._parse_received(packet, type_)
+
+    def _in_order(self, framenumber):
+        last = self._last_framenumber
+        step = self.frame_step or 1
+
+        if last is not None and framenumber <= last:
+            if last - framenumber <= self.max_reorder * step:
+                self.stats.out_of_order += 1
+                return False
+            # Numbering started over, nothing was lost in between.
+            last = None
+
+        if last is not None and self.frame_step:
+            self.stats.lost += max(
+                0, int(round((framenumber - last) / float(step))) - 1
+            )
+
+        self._last_framenumber = framenumber
+        return True
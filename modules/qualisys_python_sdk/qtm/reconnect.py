@@ -0,0 +1,105 @@
+""" Pacing and accounting of reconnects to QTM """
+
+import random
+
+# pylint: disable=C0330
+
+
+class Backoff(object):
+    """Capped exponential backoff between reconnect attempts.
+
+    Each call to :func:`next_delay` returns a delay factor times longer than the
+    one before, up to maximum. The delays are spread randomly by up to jitter of
+    their length, so that clients that lost QTM at the same time do not all
+    retry at once.
+
+    :param initial: Delay before the first attempt in seconds.
+    :param factor: Factor to lengthen the delay by after each attempt.
+    :param maximum: Longest delay in seconds.
+    :param jitter: Fraction of the delay it can be shortened by at random.
+    """
+
+    def __init__(self, initial=0.5, factor=2.0, maximum=10.0, jitter=0.1):
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+        self.attempts = 0
+
+    def reset(self):
+        """Start over from the initial delay, e.g. once reconnected"""
+        self.attempts = 0
+
+    def next_delay(self):
+        """Delay in seconds before the next attempt"""
+        delay = min(self.maximum, self.initial * self.factor**self.attempts)
+        self.attempts += 1
+        return delay * (1.0 - self.jitter * random.random())
+
+
+class ReconnectStats(object):
+    """Reconnect metrics of a connection, times are in seconds.
+
+    disconnects counts connections lost, attempts the connection attempts made
+    to get them back and reconnects the attempts that succeeded. downtime is the
+    total time spent without a connection after losing one, last_downtime the
+    length of the latest outage that has ended.
+    """
+
+    __slots__ = (
+        "disconnects",
+        "attempts",
+        "reconnects",
+        "downtime",
+        "last_downtime",
+        "_down_since",
+    )
+
+    def __init__(self):
+        self.disconnects = 0
+        self.attempts = 0
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.last_downtime = 0.0
+        self._down_since = None
+
+    @property
+    def is_down(self):
+        return self._down_since is not None
+
+    def disconnected(self, now):
+        self.disconnects += 1
+        self._down_since = now
+
+    def attempted(self):
+        self.attempts += 1
+
+    def reconnected(self, now):
+        self.reconnects += 1
+        self.ended(now)
+
+    def ended(self, now):
+        """The outage ended, by reconnecting or by giving up"""
+        if self._down_since is None:
+            return
+
+        self.last_downtime = now - self._down_since
+        self.downtime += self.last_downtime
+        self._down_since = None
+
+    def current_downtime(self, now):
+        """Time since the connection was lost, 0 while connected"""
+        return 0.0 if self._down_since is None else now - self._down_since
+
+    def __repr__(self):
+        return (
+            "ReconnectStats(disconnects=%d, attempts=%d, reconnects=%d, "
+            "downtime=%.3f, last_downtime=%.3f)"
+            % (
+                self.disconnects,
+                self.attempts,
+                self.reconnects,
+                self.downtime,
+                self.last_downtime,
+            )
+        )
@@ -0,0 +1,237 @@
+""" Fixed capacity buffers for analog and force samples streamed from QTM """
+
+import collections
+
+import numpy as np
+
+# pylint: disable=C0330
+
+ANALOG = "analog"
+FORCE = "force"
+
+
+class SampleRingBuffer(object):
+    """Ring buffer with the latest samples of one analog device or force plate.
+
+    Samples are stored in a preallocated (channels, capacity) float32 array at
+    position ``sample_number % capacity``, so reads are addressed by sample number.
+    Skipped sample numbers are stored as NaN and counted in ``gap_count`` and
+    ``missing_samples``.
+
+    :param channel_count: Number of channels per sample.
+    :param capacity: Number of samples to keep.
+    :param frequency: Sample frequency in Hz, needed by :func:`latest_ms`.
+    :param frame_capacity: Number of frames to remember for :func:`read_frame`.
+    """
+
+    def __init__(self, channel_count, capacity, frequency=None, frame_capacity=1000):
+        self.channel_count = channel_count
+        self.capacity = capacity
+        self.frequency = frequency
+        self.gap_count = 0
+        self.missing_samples = 0
+
+        self._samples = np.full((channel_count, capacity), np.nan, dtype=np.float32)
+        self._frames = collections.deque(maxlen=frame_capacity)
+        self._end = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def first_sample_number(self):
+        """Sample number of the oldest sample in the buffer, None if empty"""
+        if self._end is None:
+            return None
+        return self._end - self._size
+
+    @property
+    def end_sample_number(self):
+        """Sample number following the newest sample, None if empty"""
+        return self._end
+
+    def clear(self):
+        """Forget all samples and frames, gap statistics are kept"""
+        self._frames.clear()
+        self._end = None
+        self._size = 0
+
+    def write(self, sample_number, samples, framenumber=None):
+        """Append samples to the buffer.
+
+        :param sample_number: Sample number of the first sample.
+        :param samples: A (channels, n) array, e.g. from
+            :func:`qtm.QRTPacket.get_analog_array`.
+        :param framenumber: Frame the samples arrived with, indexed for
+            :func:`read_frame`.
+        """
+        sample_count = samples.shape[1]
+
+        if self._end is not None and sample_number != self._end:
+            if sample_number < self._end:
+                # Sample numbers restarted, e.g. when RT from file loops.
+                self.clear()
+            else:
+                self._skip(sample_number - self._end)
+
+        if framenumber is not None:
+            self._frames.append((framenumber, sample_number, sample_count))
+
+        if sample_count > self.capacity:
+            samples = samples[:, -self.capacity :]
+            sample_number += sample_count - self.capacity
+            sample_count = self.capacity
+
+        for buffer_slice, samples_slice in self._slices(sample_number, sample_count):
+            self._samples[:, buffer_slice] = samples[:, samples_slice]
+
+        self._end = sample_number + sample_count
+        self._size = min(self._size + sample_count, self.capacity)
+
+    def read(self, sample_number, sample_count):
+        """Copy samples out of the buffer.
+
+        :rtype: A (channels, sample_count) float32 array.
+        :raises ValueError: If the samples are not in the buffer.
+        """
+        first = self.first_sample_number
+        if (
+            first is None
+            or sample_number < first
+            or (sample_number + sample_count > self._end)
+        ):
+            raise ValueError(
+                "Samples %d-%d are not in the buffer"
+                % (sample_number, sample_number + sample_count - 1)
+            )
+
+        samples = np.empty((self.channel_count, sample_count), dtype=np.float32)
+        for buffer_slice, samples_slice in self._slices(sample_number, sample_count):
+            samples[:, samples_slice] = self._samples[:, buffer_slice]
+        return samples
+
+    def latest(self, sample_count=None):
+        """Get the newest samples.
+
+        :param sample_count: Number of samples, all buffered samples if None.
+            Clamped to the number of buffered samples.
+        :rtype: A tuple (first sample number, (channels, n) array).
+        """
+        if sample_count is None or sample_count > self._size:
+            sample_count = self._size
+        if sample_count == 0:
+            return None, np.empty((self.channel_count, 0), dtype=np.float32)
+
+        sample_number = self._end - sample_count
+        return sample_number, self.read(sample_number, sample_count)
+
+    def latest_ms(self, milliseconds):
+        """Get the samples of the last ``milliseconds``, see :func:`latest`."""
+        if self.frequency is None:
+            raise ValueError("Sample frequency is not known")
+        return self.latest(int(round(milliseconds * self.frequency / 1000.0)))
+
+    def read_frame(self, framenumber):
+        """Get the samples that arrived with a frame.
+
+        :rtype: A tuple (first sample number, (channels, n) array) or None if the
+            frame or its samples are no longer in the buffer.
+        """
+        for frame, sample_number, sample_count in reversed(self._frames):
+            if frame == framenumber:
+                try:
+                    return sample_number, self.read(sample_number, sample_count)
+                except ValueError:
+                    return None
+        return None
+
+    def _skip(self, sample_count):
+        self.gap_count += 1
+        self.missing_samples += sample_count
+
+        fill_count = min(sample_count, self.capacity)
+        fill_start = self._end + sample_count - fill_count
+        for buffer_slice, _ in self._slices(fill_start, fill_count):
+            self._samples[:, buffer_slice] = np.nan
+
+        self._end += sample_count
+        self._size = min(self._size + sample_count, self.capacity)
+
+    def _slices(self, sample_number, sample_count):
+        offset = sample_number % self.capacity
+        first_count = min(sample_count, self.capacity - offset)
+        slices = [(slice(offset, offset + first_count), slice(0, first_count))]
+        if first_count < sample_count:
+            slices.append(
+                (slice(0, sample_count - first_count), slice(first_count, sample_count))
+            )
+        return slices
+
+
+class StreamBuffer(object):
+    """Ring buffers for all analog devices and force plates in a stream.
+
+    Feed it every data packet, for instance from the ``on_packet`` callback:
+
+    ::
+
+        from qtm.ringbuffer import StreamBuffer, ANALOG
+
+        buffers = StreamBuffer(capacity=4000, frequencies={(ANALOG, 1): 2000})
+
+        def on_packet(packet):
+            buffers.feed(packet)
+
+        first_sample, samples = buffers.get(ANALOG, 1).latest_ms(100)
+
+    :param capacity: Number of samples to keep per device.
+    :param frequencies: Sample frequencies keyed by (kind, device id).
+    :param frame_capacity: Number of frames to remember per device.
+    """
+
+    def __init__(self, capacity=10000, frequencies=None, frame_capacity=1000):
+        self.capacity = capacity
+        self.frequencies = frequencies or {}
+        self.frame_capacity = frame_capacity
+        self.buffers = {}
+
+    def feed(self, packet):
+        """Copy the analog and force samples of a packet into the buffers"""
+        analog = packet.get_analog_array()
+        if analog is not None:
+            for device, sample_number, samples in analog[1]:
+                self._get_buffer(ANALOG, device.id, device.channel_count).write(
+                    sample_number.sample_number, samples, packet.framenumber
+                )
+
+        force = packet.get_force_array()
+        if force is not None:
+            for plate, forces in force[1]:
+                if plate.force_count > 0:
+                    self._get_buffer(FORCE, plate.id, forces.shape[1]).write(
+                        plate.force_number, forces.T, packet.framenumber
+                    )
+
+    def get(self, kind, device_id):
+        """Get the buffer of an analog device or force plate.
+
+        :param kind: :data:`ANALOG` or :data:`FORCE`.
+        :rtype: A :class:`SampleRingBuffer` or None if nothing has been received.
+        """
+        return self.buffers.get((kind, device_id))
+
+    def _get_buffer(self, kind, device_id, channel_count):
+        key = (kind, device_id)
+        buffer = self.buffers.get(key)
+
+        if buffer is None or buffer.channel_count != channel_count:
+            buffer = SampleRingBuffer(
+                channel_count,
+                self.capacity,
+                frequency=self.frequencies.get(key),
+                frame_capacity=self.frame_capacity,
+            )
+            self.buffers[key] = buffer
+
+        return buffer
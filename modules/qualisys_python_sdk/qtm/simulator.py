@@ -0,0 +1,486 @@
+""" A stand-in for QTM that serves synthetic or recorded frames over the RT protocol
+
+For testing and benchmarking clients without a capture system::
+
+    simulator = Simulator(SyntheticSource(markers=50, frequency=1000))
+    await simulator.start()
+    connection = await qtm.connect("127.0.0.1", port=simulator.port)
+
+The simulator answers the commands a streaming client uses: ``version``,
+``qtmversion``, ``byteorder``, ``getstate``, ``getparameters``,
+``getcurrentframe`` and ``streamframes``, over TCP or UDP. Other commands are
+answered with an error.
+
+Frames are numbered by the time since the simulator started, so all clients
+see the same frame at the same time, as they would from QTM.
+"""
+
+import asyncio
+import logging
+import math
+import struct
+
+from qtm.packet import QRTPacketType, QRTComponentType, QRTEvent
+from qtm.packet import RTheader, RTDataQRTPacket, RTComponentData
+from qtm.packet import RT3DComponent, RT6DComponent, RTSkeletonComponent
+from qtm.packet import RTSegmentCount
+from qtm.receiver import Receiver
+from qtm.take import TakeReader
+
+# pylint: disable=C0330
+
+LOG = logging.getLogger("qtm")
+
+QTM_VERSION = "QTM Version is 2023.1 (simulator)"
+
+_STREAM_COMPONENTS = {
+    "3d": QRTComponentType.Component3d,
+    "6d": QRTComponentType.Component6d,
+    "skeleton": QRTComponentType.ComponentSkeleton,
+    "skeleton:global": QRTComponentType.ComponentSkeleton,
+}
+
+_PARAMETER_SECTIONS = {
+    "general": "General",
+    "3d": "The_3D",
+    "6d": "The_6D",
+    "skeleton": "Skeletons",
+    "skeleton:global": "Skeletons",
+}
+
+
+def _packet(type_, payload):
+    return RTheader.pack(RTheader.size + len(payload), type_.value) + payload
+
+
+def _component(type_, payload):
+    return (
+        RTComponentData.pack(RTComponentData.size + len(payload), type_.value) + payload
+    )
+
+
+class SyntheticSource(object):
+    """Generates frames of markers, 6DOF bodies and skeletons moving in circles.
+
+    :param markers: Number of labeled markers.
+    :param bodies: Number of 6DOF bodies.
+    :param skeletons: Number of skeletons.
+    :param segments: Number of segments of each skeleton, in a chain.
+    :param frequency: Capture frequency in Hz.
+    """
+
+    def __init__(self, markers=10, bodies=1, skeletons=1, segments=22, frequency=100):
+        self.markers = markers
+        self.bodies = bodies
+        self.skeletons = skeletons
+        self.segments = segments
+        self.frequency = frequency
+
+        self._markers_format = struct.Struct("<%df" % (3 * markers))
+        self._bodies_format = struct.Struct("<" + "12f" * bodies)
+        self._skeleton_format = struct.Struct("<" + "i7f" * segments)
+
+    def parameters(self, sections):
+        """XML reply to getparameters for the requested sections"""
+        if "all" in sections:
+            sections = list(_PARAMETER_SECTIONS)
+
+        tags = set(_PARAMETER_SECTIONS[s] for s in sections if s in _PARAMETER_SECTIONS)
+        xml = ["<QTM_Parameters_Ver_1.24>"]
+
+        if "General" in tags:
+            xml.append("<General><Frequency>%d</Frequency></General>" % self.frequency)
+
+        if "The_3D" in tags:
+            xml.append("<The_3D><AxisUpwards>+Z</AxisUpwards>")
+            for i in range(self.markers):
+                xml.append(
+                    "<Label><Name>marker%d</Name><RGBColor>%d</RGBColor></Label>"
+                    % (i, 0xFF0000 >> (8 * (i % 3)))
+                )
+            xml.append("</The_3D>")
+
+        if "The_6D" in tags:
+            xml.append("<The_6D>")
+            for i in range(self.bodies):
+                xml.append("<Body><Name>body%d</Name><Points>" % i)
+                for j, (x, y) in enumerate(((0, 0), (100, 0), (0, 100))):
+                    xml.append(
+                        '<Point X="%d" Y="%d" Z="0" Virtual="0" Name="body%d_point%d"/>'
+                        % (x, y, i, j)
+                    )
+                xml.append("</Points></Body>")
+            xml.append("</The_6D>")
+
+        if "Skeletons" in tags:
+            xml.append("<Skeletons>")
+            for i in range(self.skeletons):
+                xml.append('<Skeleton Name="skeleton%d"><Segments>' % i)
+                for segment_id in range(1, self.segments + 1):
+                    xml.append(
+                        '<Segment Name="segment%d" ID="%d"><DefaultTransform>'
+                        '<Position X="0" Y="100" Z="0"/>'
+                        '<Rotation X="0" Y="0" Z="0" W="1"/>'
+                        "</DefaultTransform>" % (segment_id, segment_id)
+                    )
+                xml.append("</Segment>" * self.segments)
+                xml.append("</Segments></Skeleton>")
+            xml.append("</Skeletons>")
+
+        xml.append("</QTM_Parameters_Ver_1.24>")
+        return "".join(xml)
+
+    def frame(self, index, components):
+        """Data packet payload of frame index with the requested components.
+
+        :param components: Set of :class:`qtm.packet.QRTComponentType`.
+        """
+        t = index / self.frequency
+        payloads = []
+
+        if QRTComponentType.Component3d in components:
+            values = []
+            for i in range(self.markers):
+                angle = t + i * 0.1
+                values += (500 * math.cos(angle), 500 * math.sin(angle), 10.0 * i)
+            payloads.append(
+                _component(
+                    QRTComponentType.Component3d,
+                    RT3DComponent.format.pack(self.markers, 0, 0)
+                    + self._markers_format.pack(*values),
+                )
+            )
+
+        if QRTComponentType.Component6d in components:
+            values = []
+            c, s = math.cos(t), math.sin(t)
+            for i in range(self.bodies):
+                values += (1000 * c, 1000 * s, 100.0 * i)
+                # Rotation about z, column major.
+                values += (c, s, 0.0, -s, c, 0.0, 0.0, 0.0, 1.0)
+            payloads.append(
+                _component(
+                    QRTComponentType.Component6d,
+                    RT6DComponent.format.pack(self.bodies, 0, 0)
+                    + self._bodies_format.pack(*values),
+                )
+            )
+
+        if QRTComponentType.ComponentSkeleton in components:
+            half = 0.25 * math.sin(t)
+            values = []
+            for segment_id in range(1, self.segments + 1):
+                values += (segment_id, 0.0, 100.0, 0.0)
+                values += (0.0, 0.0, math.sin(half), math.cos(half))
+            skeleton = RTSegmentCount.format.pack(
+                self.segments
+            ) + self._skeleton_format.pack(*values)
+            payloads.append(
+                _component(
+                    QRTComponentType.ComponentSkeleton,
+                    RTSkeletonComponent.format.pack(self.skeletons)
+                    + skeleton * self.skeletons,
+                )
+            )
+
+        header = RTDataQRTPacket.pack(int(t * 1e6), index + 1, len(payloads))
+        return header + b"".join(payloads)
+
+
+class TakeSource(object):
+    """Replays a take recorded with :class:`qtm.take.TakeWriter`.
+
+    The frames are sent as recorded, whatever components a client asks for.
+    When looping, the frame numbers and timestamps of each lap continue from
+    the previous one.
+
+    :param path: Take file.
+    :param xml: Settings XML to reply to getparameters with, as recorded by
+        the same QTM.
+    :param frequency: Frequency in Hz, by default estimated from the timestamps.
+    :param loop: Start over at the end of the take, else end the stream.
+    """
+
+    def __init__(self, path, xml, frequency=None, loop=True):
+        self.take = TakeReader(path)
+        self.xml = xml
+        self.loop = loop
+
+        if not self.take:
+            raise ValueError("%s has no frames" % path)
+
+        timestamps = self.take.timestamps
+        framenumbers = self.take.framenumbers
+        if frequency is None:
+            duration = timestamps[-1] - timestamps[0]
+            frequency = (
+                (len(timestamps) - 1) * 1e6 / duration if duration > 0 else 100.0
+            )
+        self.frequency = frequency
+
+        self._lap_time = timestamps[-1] - timestamps[0] + int(1e6 / frequency)
+        self._lap_frames = framenumbers[-1] - framenumbers[0] + 1
+
+    def parameters(self, sections):
+        return self.xml
+
+    def frame(self, index, components):
+        lap, index = divmod(index, len(self.take))
+        if lap and not self.loop:
+            return None
+
+        data = self.take[index].data
+        if not lap:
+            return bytes(data)
+
+        data = bytearray(data)
+        timestamp, framenumber, count = RTDataQRTPacket.unpack_from(data, 0)
+        RTDataQRTPacket.pack_into(
+            data,
+            0,
+            timestamp + lap * self._lap_time,
+            framenumber + lap * self._lap_frames,
+            count,
+        )
+        return bytes(data)
+
+
+class Simulator(object):
+    """Serves the frames of a source to any number of clients.
+
+    A source has a ``frequency`` in Hz, ``parameters(sections)`` returning
+    the settings XML and ``frame(index, components)`` returning the payload of
+    a data packet, or None when it has no more frames. See
+    :class:`SyntheticSource` and :class:`TakeSource`.
+
+    Frames that are due are sent together, so the rate is kept up however
+    coarse the event loop's timers are. Frames are dropped, as by QTM, while a
+    client is too slow to receive them.
+
+    :param source: Frames to serve.
+    :param host: Address to listen on.
+    :param port: Port to listen on, 0 for any free port.
+    :param state: Event to reply to getstate with.
+    :param max_buffered: Bytes queued for a client above which frames are
+        dropped.
+    """
+
+    def __init__(
+        self,
+        source,
+        host="127.0.0.1",
+        port=22223,
+        state=QRTEvent.EventRTfromFileStarted,
+        max_buffered=1 << 20,
+    ):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.state = state
+        self.max_buffered = max_buffered
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.commands = []
+
+        self.loop = None
+        self._server = None
+        self._clients = set()
+        self._start_time = None
+
+    async def start(self):
+        """Start listening, :attr:`port` is the port listened on afterwards"""
+        self.loop = asyncio.get_event_loop()
+        self._server = await self.loop.create_server(
+            lambda: _SimulatorProtocol(self), self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._start_time = self.loop.time()
+
+    def close(self):
+        """Stop listening and disconnect all clients"""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+        for client in list(self._clients):
+            client.close()
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def current_frame(self):
+        return int((self.loop.time() - self._start_time) * self.source.frequency)
+
+    def frame_time(self, index):
+        return self._start_time + index / self.source.frequency
+
+
+class _SimulatorProtocol(asyncio.Protocol):
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.transport = None
+        self._stream = None
+        self._receiver = Receiver(
+            {
+                QRTPacketType.PacketCommand: self._on_command,
+                QRTPacketType.PacketXML: self._on_xml,
+            }
+        )
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.simulator._clients.add(self)
+        self._send(QRTPacketType.PacketCommand, "QTM RT Interface connected")
+
+    def connection_lost(self, exc):
+        self._stop_stream()
+        self.simulator._clients.discard(self)
+        self.transport = None
+
+    def data_received(self, data):
+        self._receiver.data_received(data)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def _send(self, type_, text):
+        self.transport.write(_packet(type_, text.encode() + b"\0"))
+
+    def _on_xml(self, _):
+        self._send(QRTPacketType.PacketCommand, "Setting parameters succeeded")
+
+    def _on_command(self, command):
+        command = command.decode()
+        self.simulator.commands.append(command)
+        LOG.debug("Simulator R: %s", command)
+
+        words = command.split()
+        name = words[0].lower() if words else ""
+        args = [word.lower() for word in words[1:]]
+
+        if name == "version" and args:
+            self._send(QRTPacketType.PacketCommand, "Version set to %s" % args[0])
+        elif name == "qtmversion":
+            self._send(QRTPacketType.PacketCommand, QTM_VERSION)
+        elif name == "byteorder":
+            self._send(QRTPacketType.PacketCommand, "Byte order is little endian")
+        elif name == "getstate":
+            self.transport.write(
+                _packet(
+                    QRTPacketType.PacketEvent,
+                    struct.pack("<B", self.simulator.state.value),
+                )
+            )
+        elif name == "getparameters":
+            self._send(
+                QRTPacketType.PacketXML,
+                self.simulator.source.parameters(args or ["all"]),
+            )
+        elif name == "getcurrentframe":
+            self._send_frames([self.simulator.current_frame()], _components(args))
+        elif name == "streamframes" and args == ["stop"]:
+            self._stop_stream()
+        elif name == "streamframes" and args:
+            self._start_stream(args)
+        else:
+            self._send(QRTPacketType.PacketError, "Parse error")
+
+    def _start_stream(self, args):
+        frequency = self.simulator.source.frequency
+        frames = args[0]
+
+        try:
+            if frames == "allframes":
+                step = 1.0
+            elif frames.startswith("frequency:"):
+                step = max(1.0, frequency / float(frames.split(":")[1]))
+            elif frames.startswith("frequencydivisor:"):
+                step = float(max(1, int(frames.split(":")[1])))
+            else:
+                raise ValueError(frames)
+        except (ValueError, ZeroDivisionError):
+            self._send(QRTPacketType.PacketError, "Parse error")
+            return
+
+        udp_address = None
+        components = args[1:]
+        if components and components[0].startswith("udp"):
+            address = components.pop(0).split(":")[1:]
+            port = int(address[-1]) if address else 22223
+            host = address[0] if len(address) > 1 else None
+            udp_address = (host or self.transport.get_extra_info("peername")[0], port)
+
+        self._stop_stream()
+        self._stream = asyncio.ensure_future(
+            self._stream_frames(step, _components(components), udp_address)
+        )
+
+    def _stop_stream(self):
+        if self._stream is not None:
+            self._stream.cancel()
+            self._stream = None
+
+    async def _stream_frames(self, step, components, udp_address):
+        simulator = self.simulator
+        loop = simulator.loop
+
+        udp = None
+        if udp_address is not None:
+            udp, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=udp_address
+            )
+
+        try:
+            next_frame = float(simulator.current_frame())
+            while True:
+                due = simulator.current_frame()
+                indices = []
+                while next_frame <= due:
+                    indices.append(int(next_frame))
+                    next_frame += step
+
+                if indices and not self._send_frames(indices, components, udp):
+                    return
+
+                await asyncio.sleep(
+                    max(0.0, simulator.frame_time(next_frame) - loop.time())
+                )
+        finally:
+            if udp is not None:
+                udp.close()
+
+    def _send_frames(self, indices, components, udp=None):
+        """Send the frames, returns False when the source has no more"""
+        simulator = self.simulator
+        packets = []
+        ended = False
+
+        for index in indices:
+            payload = simulator.source.frame(index, components)
+            if payload is None:
+                ended = True
+                break
+            packets.append(_packet(QRTPacketType.PacketData, payload))
+
+        if udp is not None:
+            for packet in packets:
+                udp.sendto(packet)
+            simulator.frames_sent += len(packets)
+        elif self.transport.get_write_buffer_size() > simulator.max_buffered:
+            simulator.frames_dropped += len(packets)
+        else:
+            self.transport.write(b"".join(packets))
+            simulator.frames_sent += len(packets)
+
+        if ended:
+            self.transport.write(_packet(QRTPacketType.PacketNoMoreData, b""))
+        return not ended
+
+
+def _components(names):
+    if not names or "all" in names:
+        return frozenset(_STREAM_COMPONENTS.values())
+    return frozenset(_STREAM_COMPONENTS[n] for n in names if n in _STREAM_COMPONENTS)
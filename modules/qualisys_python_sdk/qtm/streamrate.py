@@ -0,0 +1,163 @@
+""" Choosing the rate QTM streams frames at """
+
+import math
+
+# pylint: disable=C0330
+
+ALL_FRAMES = "allframes"
+
+
+def frames_option(frequency=None, frequency_divisor=None):
+    """Build the frames option of streamframes.
+
+    :param frequency: Frames per second, gives 'frequency:n'.
+    :param frequency_divisor: Send every n:th frame, gives 'frequencydivisor:n'.
+    :rtype: 'allframes' if neither is given.
+    """
+    if frequency is not None and frequency_divisor is not None:
+        raise ValueError("Give either frequency or frequency_divisor, not both")
+    if frequency is not None:
+        return "frequency:%d" % frequency
+    if frequency_divisor is not None:
+        return "frequencydivisor:%d" % frequency_divisor
+    return ALL_FRAMES
+
+
+def frame_step(frames):
+    """Frame numbers between consecutive frames streamed with a frames option.
+
+    :rtype: 1 for 'allframes', n for 'frequencydivisor:n' and None for
+        'frequency:n', where QTM picks the frames closest to the frequency.
+    """
+    if frames.startswith("frequencydivisor:"):
+        return int(frames.split(":")[1])
+    if frames.startswith("frequency:"):
+        return None
+    return 1
+
+
+class AdaptiveRate(object):
+    """Finds the highest stream frequency, up to a target, that the client keeps up with.
+
+    Call :func:`frame_applied` with the timestamp of each frame once it has been
+    applied and :func:`update` about once a second. The client is falling behind
+    when frames are dropped, e.g. by a coalescing :class:`qtm.Receiver`, or when
+    the timestamps of applied frames advance slower than the wall clock. The
+    frequency is then lowered to just below the rate frames were applied at, and
+    raised step by step towards the target while the client keeps up.
+
+    :param target_frequency: Highest frequency to request, e.g. the display rate.
+    :param min_frequency: Lowest frequency to request.
+    :param step_up: Factor to raise the frequency by.
+    :param backoff: Fraction of the applied rate to lower the frequency to.
+    :param stable_updates: Updates without falling behind before raising.
+    :param retry_updates: Updates without falling behind before trying a
+        frequency the client fell behind at again.
+    """
+
+    def __init__(
+        self,
+        target_frequency=60,
+        min_frequency=5,
+        step_up=1.25,
+        backoff=0.9,
+        stable_updates=3,
+        retry_updates=30,
+    ):
+        self.target_frequency = target_frequency
+        self.min_frequency = min_frequency
+        self.step_up = step_up
+        self.backoff = backoff
+        self.stable_updates = stable_updates
+        self.retry_updates = retry_updates
+
+        self.frequency = target_frequency
+        self.frames_applied = 0
+        self._window_start = None
+        self._window_timestamp = None
+        self._window_dropped = 0
+        self._last_timestamp = None
+        self._stable = 0
+        self._ceiling = None
+        self._since_behind = 0
+
+    @property
+    def frames(self):
+        """The frames option for streamframes at the current frequency"""
+        return frames_option(frequency=self.frequency)
+
+    def reset(self, now=None, dropped_frames=0):
+        """Start measuring from scratch, e.g. when streaming (re)starts"""
+        self._last_timestamp = None
+        self._stable = 0
+        self._ceiling = None
+        self._since_behind = 0
+        self._start_window(now, dropped_frames)
+
+    def _start_window(self, now, dropped_frames):
+        self.frames_applied = 0
+        self._window_start = now
+        self._window_timestamp = self._last_timestamp
+        self._window_dropped = dropped_frames
+
+    def frame_applied(self, timestamp):
+        """:param timestamp: Capture timestamp of the frame in microseconds."""
+        self.frames_applied += 1
+        self._last_timestamp = timestamp
+        if self._window_timestamp is None:
+            self._window_timestamp = timestamp
+
+    def update(self, now, dropped_frames=0):
+        """Evaluate the frames applied since the last update.
+
+        :param now: Wall clock time in seconds.
+        :param dropped_frames: Total frames dropped by the receiver so far.
+        :rtype: The new frames option if the frequency should be renegotiated,
+            otherwise None.
+        """
+        if self._window_start is None:
+            self.reset(now, dropped_frames)
+            return None
+
+        elapsed = now - self._window_start
+        applied = self.frames_applied
+        dropped = dropped_frames - self._window_dropped
+
+        if elapsed <= 0 or applied < 2:
+            return None
+
+        # How much further the wall clock moved than the capture timestamps, up
+        # to a frame period off depending on when the last frame arrived.
+        lag = elapsed - (self._last_timestamp - self._window_timestamp) / 1e6
+        behind = dropped > 0.05 * (applied + dropped) or lag > max(
+            0.1 * elapsed, 2.0 / self.frequency
+        )
+
+        frequency = self.frequency
+        if behind:
+            self._stable = 0
+            self._since_behind = 0
+            self._ceiling = frequency
+            frequency = min(frequency - 1, int(applied / elapsed * self.backoff))
+        else:
+            self._stable += 1
+            self._since_behind += 1
+            if self._since_behind >= self.retry_updates:
+                self._ceiling = None
+
+            if self._stable >= self.stable_updates:
+                self._stable = 0
+                frequency = int(math.ceil(frequency * self.step_up))
+                # Approach where the client last fell behind halfway at a time.
+                if self._ceiling is not None:
+                    frequency = min(frequency, (self.frequency + self._ceiling) // 2)
+
+        frequency = max(self.min_frequency, min(self.target_frequency, frequency))
+
+        self._start_window(now, dropped_frames)
+
+        if frequency == self.frequency:
+            return None
+
+        self.frequency = frequency
+        return self.frames
@@ -0,0 +1,222 @@
+""" Recording streamed data packets to a take file and reading them back
+
+A take file is made of:
+
+* A header, ``TakeHeader``: magic and format version.
+* The data packets as QTM sends them, each framed by its RT header, so that
+  the file can be read front to back even without an index.
+* The index, a ``TakeIndexEntry`` of file offset, frame number and timestamp
+  for each packet, in the order they were written.
+* A footer, ``TakeFooter``: offset of the index, packet count and magic.
+
+A take that was not closed, e.g. because the application crashed, has no
+index and footer. :class:`TakeReader` then rebuilds the index by scanning the
+packets.
+"""
+
+import bisect
+import collections
+import io
+import struct
+import threading
+
+from qtm.packet import QRTPacket, QRTPacketType, RTheader, RTDataQRTPacket
+
+# pylint: disable=C0330
+
+TAKE_MAGIC = b"QTMTAKE\0"
+TAKE_VERSION = 1
+INDEX_MAGIC = b"QTMINDEX"
+
+TakeHeader = struct.Struct("<8sI")
+TakeIndexEntry = struct.Struct("<QIq")
+TakeFooter = struct.Struct("<QI8s")
+
+
+class TakeWriter(object):
+    """Writes data packets to a take file on a background thread.
+
+    :func:`write` only queues the packet, so it can be called for every frame
+    from the thread receiving them. The packets are written in large buffered
+    chunks and the index when the take is closed.
+
+    :param path: File to write, replaced if it exists.
+    :param buffer_size: Bytes buffered before writing to the file.
+    :param flush_interval: Seconds the writer thread sleeps when idle.
+    """
+
+    def __init__(self, path, buffer_size=1 << 20, flush_interval=0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.frame_count = 0
+        self.bytes_written = 0
+        self.error = None
+
+        self._file = io.open(path, "wb", buffering=buffer_size)
+        self._file.write(TakeHeader.pack(TAKE_MAGIC, TAKE_VERSION))
+        self._offset = TakeHeader.size
+        self._index = []
+        self._pending = collections.deque()
+        self._closing = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name="QtmTakeWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, packet):
+        """Queue a :class:`qtm.QRTPacket` to be written, anything else is ignored.
+
+        The packet data must not change afterwards, which holds for packets
+        from :class:`qtm.Receiver`.
+        """
+        if isinstance(packet, QRTPacket):
+            self._pending.append(packet)
+
+    def _run(self):
+        try:
+            while True:
+                closing = self._closing.is_set()
+                self._write_pending()
+                if closing:
+                    break
+                self._closing.wait(self.flush_interval)
+        except (OSError, ValueError) as error:
+            self.error = error
+
+    def _write_pending(self):
+        pending = self._pending
+        write = self._file.write
+        data_type = QRTPacketType.PacketData.value
+
+        while pending:
+            packet = pending.popleft()
+            data = packet.data
+            size = RTheader.size + len(data)
+
+            write(RTheader.pack(size, data_type))
+            write(data)
+
+            self._index.append((self._offset, packet.framenumber, packet.timestamp))
+            self._offset += size
+            self.frame_count += 1
+
+        self.bytes_written = self._offset
+
+    def close(self):
+        """Write what is queued and the index, then close the file"""
+        if self._file is None:
+            return
+
+        self._closing.set()
+        self._thread.join()
+
+        try:
+            if self.error is None:
+                index_offset = self._offset
+                write = self._file.write
+                for entry in self._index:
+                    write(TakeIndexEntry.pack(*entry))
+                write(TakeFooter.pack(index_offset, len(self._index), INDEX_MAGIC))
+        finally:
+            self._file.close()
+            self._file = None
+
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class TakeReader(object):
+    """Reads the packets of a take file.
+
+    Packets are numbered in the order they were recorded and returned as
+    :class:`qtm.QRTPacket`.
+
+    :param path: Take file to read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with io.open(path, "rb") as take_file:
+            self._data = take_file.read()
+
+        magic, version = TakeHeader.unpack_from(self._data, 0)
+        if magic != TAKE_MAGIC:
+            raise ValueError("%s is not a take file" % path)
+        if version > TAKE_VERSION:
+            raise ValueError("Unsupported take version %d" % version)
+
+        self.recovered = False
+        index = self._read_index()
+        if index is None:
+            index = self._scan()
+            self.recovered = True
+
+        self._offsets = [offset for offset, _, _ in index]
+        self.framenumbers = [framenumber for _, framenumber, _ in index]
+        self.timestamps = [timestamp for _, _, timestamp in index]
+
+    def _read_index(self):
+        data = self._data
+        if len(data) < TakeHeader.size + TakeFooter.size:
+            return None
+
+        index_offset, count, magic = TakeFooter.unpack_from(
+            data, len(data) - TakeFooter.size
+        )
+        if (
+            magic != INDEX_MAGIC
+            or index_offset + count * TakeIndexEntry.size + TakeFooter.size != len(data)
+        ):
+            return None
+
+        return [
+            TakeIndexEntry.unpack_from(data, index_offset + i * TakeIndexEntry.size)
+            for i in range(count)
+        ]
+
+    def _scan(self):
+        data = self._data
+        end = len(data)
+        position = TakeHeader.size
+        index = []
+
+        while end - position >= RTheader.size:
+            size, type_ = RTheader.unpack_from(data, position)
+            # A packet cut short when writing stopped ends the take.
+            if size < RTheader.size + RTDataQRTPacket.size or end - position < size:
+                break
+            if type_ == QRTPacketType.PacketData.value:
+                timestamp, framenumber, _ = RTDataQRTPacket.unpack_from(
+                    data, position + RTheader.size
+                )
+                index.append((position, framenumber, timestamp))
+            position += size
+
+        return index
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        offset = self._offsets[index]
+        size, _ = RTheader.unpack_from(self._data, offset)
+        return QRTPacket(memoryview(self._data)[offset + RTheader.size : offset + size])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def index_at(self, timestamp):
+        """Index of the last packet recorded at or before timestamp, 0 if none was.
+
+        Timestamps only increase within a measurement, so this is only
+        meaningful for takes recorded from a single one.
+        """
+        return max(0, bisect.bisect_right(self.timestamps, timestamp) - 1)
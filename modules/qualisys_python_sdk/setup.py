@@ -15,6 +15,7 @@ setup(
     license="MIT",
     packages=["qtm"],
     package_data={"qtm": ["data/demo.qtm"]},
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Operating System :: OS Independent",
         "Intended Audience :: Developers",
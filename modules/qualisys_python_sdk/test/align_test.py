@@ -0,0 +1,115 @@
+"""
+    Tests for TimestampAligner
+"""
+
+import pytest
+
+from qtm.align import TimestampAligner
+
+# pylint: disable=W0621, C0111, C0330
+
+
+@pytest.fixture
+def aligner():
+    return TimestampAligner(window=10.0, history=0.5, timeout=0.5)
+
+
+def receive(aligner, source, capture_time, clock_offset, latency):
+    """A frame captured at local capture_time by a server clock_offset behind"""
+    timestamp = int((capture_time - clock_offset) * 1e6)
+    aligner.add(source, timestamp, capture_time + latency, (source, capture_time))
+
+
+def test_offset_is_least_delayed_frame(aligner):
+    for i, latency in enumerate([0.004, 0.001, 0.010, 0.002]):
+        receive(aligner, "body", 1.0 + i * 0.01, 100.0, latency)
+
+    assert aligner.offset("body") == pytest.approx(100.001)
+    assert aligner.offset("face") is None
+
+
+def test_pairs_frames_captured_together(aligner):
+    # body streams at 100 Hz with little delay, face at 50 Hz delayed 20 ms and
+    # with a clock a long way off.
+    for i in range(100):
+        capture_time = 1.0 + i * 0.01
+        receive(aligner, "body", capture_time, 5.0, 0.001)
+        if i % 2 == 0:
+            receive(aligner, "face", capture_time, -3000.0, 0.001)
+
+    frames = aligner.frames(now=2.0)
+
+    assert frames["face"][1] == pytest.approx(1.98)
+    assert frames["body"][1] == pytest.approx(1.98)
+
+
+def test_newest_common_time(aligner):
+    # face lags a frame behind body, the common time is face's newest frame.
+    for i in range(10):
+        receive(aligner, "body", 1.0 + i * 0.01, 0.0, 0.001)
+    for i in range(9):
+        receive(aligner, "face", 1.0 + i * 0.01, 0.0, 0.001)
+
+    frames = aligner.frames(now=1.1)
+
+    assert frames["body"][1] == pytest.approx(1.08)
+    assert frames["face"][1] == pytest.approx(1.08)
+
+    # The next frame of face moves both on.
+    receive(aligner, "face", 1.09, 0.0, 0.001)
+    frames = aligner.frames(now=1.1)
+    assert frames["body"][1] == pytest.approx(1.09)
+
+
+def test_closest_frame_when_rates_differ(aligner):
+    for i in range(10):
+        receive(aligner, "body", 1.0 + i * 0.03, 0.0, 0.0)
+    receive(aligner, "face", 1.0, 0.0, 0.0)
+    receive(aligner, "face", 1.16, 0.0, 0.0)
+
+    frames = aligner.frames(now=1.3)
+
+    assert frames["body"][1] == pytest.approx(1.15)
+
+
+def test_stopped_source_left_out(aligner):
+    receive(aligner, "face", 1.0, 0.0, 0.001)
+    for i in range(10):
+        receive(aligner, "body", 1.0 + i * 0.01, 0.0, 0.001)
+
+    frames = aligner.frames(now=1.1)
+    assert frames["body"][1] == pytest.approx(1.0)
+
+    for i in range(10, 60):
+        receive(aligner, "body", 1.0 + i * 0.01, 0.0, 0.001)
+
+    frames = aligner.frames(now=1.6)
+    assert list(frames) == ["body"]
+    assert frames["body"][1] == pytest.approx(1.59)
+
+
+def test_restarted_timestamps(aligner):
+    receive(aligner, "body", 10.0, 0.0, 0.001)
+    receive(aligner, "body", 10.01, 0.0, 0.001)
+    # A new measurement, timestamps start over.
+    aligner.add("body", 0, 10.02, ("body", "restarted"))
+
+    assert aligner.offset("body") == pytest.approx(10.02)
+    assert aligner.frames(now=10.03) == {"body": ("body", "restarted")}
+
+
+def test_remove(aligner):
+    receive(aligner, "body", 1.0, 0.0, 0.001)
+    aligner.remove("body")
+    aligner.remove("face")
+
+    assert aligner.frames(now=1.0) == {}
+
+
+def test_reset(aligner):
+    receive(aligner, "body", 1.0, 0.0, 0.001)
+    receive(aligner, "face", 1.0, 5.0, 0.001)
+    aligner.reset()
+
+    assert aligner.offset("body") is None and aligner.offset("face") is None
+    assert aligner.frames(now=1.0) == {}
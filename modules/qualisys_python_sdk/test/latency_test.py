@@ -0,0 +1,119 @@
+"""
+    Tests for LatencyMonitor
+"""
+
+import pytest
+
+from qtm.latency import LatencyMonitor, latency_stats
+
+# pylint: disable=W0621, C0111, C0330
+
+
+class Packet(object):
+    def __init__(self, framenumber, timestamp=None):
+        self.framenumber = framenumber
+        self.timestamp = framenumber * 10000 if timestamp is None else timestamp
+
+
+@pytest.fixture
+def monitor():
+    return LatencyMonitor(window=100)
+
+
+def test_percentiles():
+    stats = latency_stats([i / 1000.0 for i in range(100, 0, -1)])
+
+    assert stats.count == 100
+    assert stats.p50 == pytest.approx(0.050)
+    assert stats.p95 == pytest.approx(0.095)
+    assert stats.p99 == pytest.approx(0.099)
+    assert stats.max == pytest.approx(0.100)
+    assert latency_stats([]) is None
+
+
+def test_stages(monitor):
+    packet = Packet(1)
+    monitor.received(packet, received=1.0, parsed=1.001)
+    monitor.applied(packet, "markers", 1.003)
+    monitor.applied(packet, "skeletons", 1.010)
+
+    stats = monitor.stats()
+    assert stats["parse"].p50 == pytest.approx(0.001)
+    assert stats["markers"].p50 == pytest.approx(0.003)
+    assert stats["skeletons"].p50 == pytest.approx(0.010)
+    # The least delayed frame so far is this one.
+    assert stats["capture"].count == 1
+    assert stats["capture"].p50 == pytest.approx(0.010)
+
+
+def test_capture_latency_over_least_delayed(monitor):
+    # Frames 10 ms apart, delays of 2 ms and 7 ms on the way.
+    for framenumber, delay in [(1, 0.002), (2, 0.007), (3, 0.002), (4, 0.007)]:
+        packet = Packet(framenumber)
+        received = framenumber * 0.01 + delay + 100.0
+        monitor.received(packet, received, received)
+        monitor.applied(packet, "scene", received + 0.001)
+
+    stats = monitor.stats()["capture"]
+    assert stats.count == 4
+    assert sorted([stats.p50, stats.max]) == pytest.approx([0.001, 0.006])
+
+
+def test_dropped_and_skipped(monitor):
+    for framenumber in [1, 2, 5, 6, 7]:
+        monitor.received(Packet(framenumber), 0.0, 0.0)
+    # 6 was passed over for 7.
+    monitor.applied(Packet(2), "scene", 0.0)
+    monitor.applied(Packet(7), "scene", 0.0)
+
+    assert monitor.received_frames == 5
+    assert monitor.dropped_frames == 2
+    assert monitor.skipped_frames == 3
+
+
+def test_frame_step(monitor):
+    monitor.frame_step = 4
+    for framenumber in [4, 8, 16]:
+        monitor.received(Packet(framenumber), 0.0, 0.0)
+
+    assert monitor.dropped_frames == 1
+
+    monitor.frame_step = None
+    monitor.received(Packet(100), 0.0, 0.0)
+    assert monitor.dropped_frames == 1
+
+
+def test_restarted_framenumbers(monitor):
+    monitor.received(Packet(5000), 0.0, 0.0)
+    monitor.received(Packet(4999), 0.0, 0.0)
+    assert monitor.received_frames == 1
+
+    monitor.received(Packet(1), 0.0, 0.0)
+    monitor.received(Packet(2), 0.0, 0.0)
+    assert monitor.received_frames == 3
+    assert monitor.dropped_frames == 0
+
+
+def test_window(monitor):
+    for framenumber in range(1, 301):
+        packet = Packet(framenumber)
+        monitor.received(packet, 0.0, framenumber / 1000.0)
+        monitor.applied(packet, "scene", 0.0)
+
+    assert monitor.stats()["parse"].count == 100
+    assert monitor.stats()["parse"].p50 == pytest.approx(0.250)
+
+
+def test_applied_unknown_frame(monitor):
+    monitor.applied(Packet(1), "scene", 0.0)
+
+    assert monitor.stats() == {}
+
+
+def test_reset(monitor):
+    monitor.received(Packet(1), 0.0, 0.0)
+    monitor.received(Packet(3), 0.0, 0.0)
+    monitor.reset()
+
+    assert (monitor.received_frames, monitor.dropped_frames) == (0, 0)
+    assert monitor.stats() == {}
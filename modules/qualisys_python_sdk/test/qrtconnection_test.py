@@ -6,6 +6,7 @@ import asyncio
 
 import pytest
 
+from qtm.packet import QRTPacketType, RTheader, RTDataQRTPacket
 from qtm.qrt import QRTConnection, connect
 from qtm.protocol import QTMProtocol, QRTCommandException
 
@@ -497,3 +498,101 @@ async def test_set_qtm_event_fail(a_qrt):
 
 
 # TODO XML test
+
+
+def packet(type_, payload):
+    return RTheader.pack(RTheader.size + len(payload), type_.value) + payload
+
+
+async def serve_udp_stream(framenumbers, commands, fail=False):
+    """Stand-in for QTM that streams the framenumbers over UDP when asked to"""
+
+    async def client(reader, writer):
+        writer.write(
+            packet(QRTPacketType.PacketCommand, b"QTM RT Interface connected\0")
+        )
+        while True:
+            header = await reader.read(RTheader.size)
+            if not header:
+                break
+            size, _ = RTheader.unpack(header)
+            command = (await reader.readexactly(size - RTheader.size))[:-1].decode()
+            commands.append(command)
+
+            if command.startswith("version"):
+                writer.write(packet(QRTPacketType.PacketCommand, b"Version set\0"))
+            elif command.startswith("streamframes") and fail:
+                writer.write(packet(QRTPacketType.PacketError, b"Parse error\0"))
+            elif command.startswith("streamframes") and "UDP:" in command:
+                port = int(command.split()[2].split(":")[1])
+                transport, _ = await asyncio.get_event_loop().create_datagram_endpoint(
+                    asyncio.DatagramProtocol, remote_addr=("127.0.0.1", port)
+                )
+                for framenumber in framenumbers:
+                    transport.sendto(
+                        packet(
+                            QRTPacketType.PacketData,
+                            RTDataQRTPacket.pack(1000 * framenumber, framenumber, 0),
+                        )
+                    )
+                transport.close()
+        writer.close()
+
+    return await asyncio.start_server(client, "127.0.0.1", 0)
+
+
+@pytest.mark.asyncio
+async def test_stream_frames_udp():
+    commands = []
+    received = []
+
+    async def run():
+        server = await serve_udp_stream([1, 2, 4, 3, 5, 8], commands)
+        connection = await connect(
+            "127.0.0.1", port=server.sockets[0].getsockname()[1], timeout=2
+        )
+
+        result = await connection.stream_frames(
+            frames="allframes",
+            components=["3d"],
+            on_packet=lambda packet: received.append(packet.framenumber),
+            udp_port=0,
+        )
+        while len(received) < 5:
+            await asyncio.sleep(0.01)
+
+        await connection.stream_frames_stop()
+        # QTM does not reply to streamframes stop, wait for it to arrive.
+        while len(commands) < 3:
+            await asyncio.sleep(0.01)
+
+        connection.disconnect()
+        server.close()
+        return result, connection.udp_stats
+
+    result, stats = await asyncio.wait_for(run(), 5)
+
+    assert result == b"Ok"
+    assert commands[1].startswith("streamframes allframes UDP:")
+    assert commands[1].endswith(" 3d")
+    assert commands[2] == "streamframes stop"
+    assert received == [1, 2, 4, 5, 8]
+    assert (stats.received, stats.out_of_order, stats.lost) == (5, 1, 3)
+
+
+@pytest.mark.asyncio
+async def test_stream_frames_udp_fail():
+    async def run():
+        server = await serve_udp_stream([], [], fail=True)
+        connection = await connect(
+            "127.0.0.1", port=server.sockets[0].getsockname()[1], timeout=2
+        )
+        try:
+            with pytest.raises(QRTCommandException):
+                await connection.stream_frames(components=["3d"], udp_port=0)
+            return connection._udp.transport
+        finally:
+            connection.disconnect()
+            server.close()
+
+    assert await asyncio.wait_for(run(), 5) is None
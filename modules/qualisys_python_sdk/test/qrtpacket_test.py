@@ -0,0 +1,377 @@
+"""
+    Tests for QRTPacket
+"""
+
+import struct
+
+import pytest
+
+from qtm.packet import QRTPacket, QRTComponentType
+from qtm.packet import RTDataQRTPacket, RTComponentData
+
+np = pytest.importorskip("numpy")
+
+# pylint: disable=W0621, C0111, C0330
+
+
+def make_packet(*components, timestamp=1000, framenumber=1):
+    """Build the payload of a data packet from (component type, body) pairs"""
+    data = RTDataQRTPacket.pack(timestamp, framenumber, len(components))
+    for component_type, body in components:
+        data += RTComponentData.pack(
+            RTComponentData.size + len(body), component_type.value
+        )
+        data += body
+    return data
+
+
+def markers_3d(markers, marker_format):
+    body = struct.pack("<Ihh", len(markers), 0, 0)
+    for marker in markers:
+        body += struct.pack(marker_format, *marker)
+    return body
+
+
+MARKERS = [(1.0, 2.0, 3.0), (4.5, 5.5, 6.5), (-7.0, 8.0, -9.0)]
+
+
+@pytest.fixture
+def packet_3d():
+    return QRTPacket(
+        make_packet(
+            (QRTComponentType.Component3d, markers_3d(MARKERS, "<3f")),
+            (
+                QRTComponentType.Component3dRes,
+                markers_3d([m + (0.25,) for m in MARKERS], "<4f"),
+            ),
+            (
+                QRTComponentType.Component3dNoLabels,
+                markers_3d([m + (i,) for i, m in enumerate(MARKERS)], "<3fi"),
+            ),
+            (
+                QRTComponentType.Component3dNoLabelsRes,
+                markers_3d([m + (i, 0.5) for i, m in enumerate(MARKERS)], "<3fif"),
+            ),
+        )
+    )
+
+
+def test_3d_markers_array(packet_3d):
+    info, markers = packet_3d.get_3d_markers_array()
+    _, expected = packet_3d.get_3d_markers()
+
+    assert info.marker_count == len(MARKERS)
+    assert markers.shape == (3, 3)
+    assert markers.dtype == np.float32
+    assert markers.tolist() == [list(m) for m in expected]
+
+
+def test_3d_markers_array_is_view(packet_3d):
+    _, markers = packet_3d.get_3d_markers_array()
+
+    assert not markers.flags.owndata
+    assert not markers.flags.writeable
+
+
+def test_3d_markers_array_read_only_from_bytearray(packet_3d):
+    # The receiver joins packets that arrive in several reads into a bytearray.
+    packet = QRTPacket(memoryview(bytearray(packet_3d.data)))
+    _, markers = packet.get_3d_markers_array()
+    _, no_label = packet.get_3d_markers_no_label_array()
+
+    assert not markers.flags.writeable
+    assert not no_label["position"].flags.writeable
+    with pytest.raises(ValueError):
+        markers[0, 0] = 0.0
+
+
+def test_3d_markers_residual_array(packet_3d):
+    _, markers = packet_3d.get_3d_markers_residual_array()
+    _, expected = packet_3d.get_3d_markers_residual()
+
+    assert markers.shape == (3, 4)
+    assert markers.tolist() == [list(m) for m in expected]
+
+
+def test_3d_markers_no_label_array(packet_3d):
+    _, markers = packet_3d.get_3d_markers_no_label_array()
+    _, expected = packet_3d.get_3d_markers_no_label()
+
+    assert markers["position"].shape == (3, 3)
+    assert markers["position"].tolist() == [[m.x, m.y, m.z] for m in expected]
+    assert markers["id"].tolist() == [m.id for m in expected]
+
+
+def test_3d_markers_no_label_residual_array(packet_3d):
+    _, markers = packet_3d.get_3d_markers_no_label_residual_array()
+    _, expected = packet_3d.get_3d_markers_no_label_residual()
+
+    assert markers["position"].tolist() == [[m.x, m.y, m.z] for m in expected]
+    assert markers["id"].tolist() == [m.id for m in expected]
+    assert markers["residual"].tolist() == [m.residual for m in expected]
+
+
+def test_3d_markers_array_empty():
+    packet = QRTPacket(
+        make_packet((QRTComponentType.Component3d, markers_3d([], "<3f")))
+    )
+    _, markers = packet.get_3d_markers_array()
+
+    assert markers.shape == (0, 3)
+
+
+def test_array_getter_missing_component(packet_3d):
+    assert packet_3d.get_6d() is None
+    assert QRTPacket(make_packet()).get_3d_markers_array() is None
+
+
+def skeletons_body(skeletons):
+    body = struct.pack("<i", len(skeletons))
+    for segments in skeletons:
+        body += struct.pack("<i", len(segments))
+        for segment_id, position, rotation in segments:
+            body += struct.pack("<i3f4f", segment_id, *(position + rotation))
+    return body
+
+
+SKELETONS = [
+    [
+        (1, (1.0, 2.0, 3.0), (0.0, 0.0, 0.0, 1.0)),
+        (2, (4.0, 5.0, 6.0), (0.5, 0.5, 0.5, 0.5)),
+    ],
+    [],
+    [(7, (-1.0, -2.0, -3.0), (1.0, 0.0, 0.0, 0.0))],
+]
+
+
+@pytest.fixture
+def packet_skeletons():
+    return QRTPacket(
+        make_packet((QRTComponentType.ComponentSkeleton, skeletons_body(SKELETONS)))
+    )
+
+
+def test_skeletons_array(packet_skeletons):
+    info, skeletons = packet_skeletons.get_skeletons_array()
+    _, expected = packet_skeletons.get_skeletons()
+
+    assert info.skeleton_count == 3
+    assert [len(segments) for segments in skeletons] == [2, 0, 1]
+    for segments, expected_segments in zip(skeletons, expected):
+        assert segments["id"].tolist() == [s[0] for s in expected_segments]
+        assert segments["position"].tolist() == [list(s[1]) for s in expected_segments]
+        assert segments["rotation"].tolist() == [list(s[2]) for s in expected_segments]
+
+
+def test_skeletons_flat_array(packet_skeletons):
+    _, (segments, offsets) = packet_skeletons.get_skeletons_flat_array()
+
+    assert offsets.tolist() == [0, 2, 2, 3]
+    assert segments["id"].tolist() == [1, 2, 7]
+    assert segments["position"][offsets[2] : offsets[3]].tolist() == [
+        [-1.0, -2.0, -3.0]
+    ]
+
+
+def test_skeletons_flat_array_empty():
+    packet = QRTPacket(
+        make_packet((QRTComponentType.ComponentSkeleton, skeletons_body([])))
+    )
+    _, (segments, offsets) = packet.get_skeletons_flat_array()
+
+    assert len(segments) == 0
+    assert offsets.tolist() == [0]
+
+
+BODIES = [
+    ((1.0, 2.0, 3.0), tuple(float(i) for i in range(9)), 0.5),
+    ((4.0, 5.0, 6.0), tuple(float(i) for i in range(10, 19)), 1.5),
+]
+
+
+def bodies_6d(bodies, rotation_size, residual):
+    body = struct.pack("<ihh", len(bodies), 0, 0)
+    for position, rotation, body_residual in bodies:
+        values = position + rotation[:rotation_size]
+        if residual:
+            values += (body_residual,)
+        body += struct.pack("<%df" % len(values), *values)
+    return body
+
+
+@pytest.fixture
+def packet_6d():
+    return QRTPacket(
+        make_packet(
+            (QRTComponentType.Component6d, bodies_6d(BODIES, 9, False)),
+            (QRTComponentType.Component6dRes, bodies_6d(BODIES, 9, True)),
+            (QRTComponentType.Component6dEuler, bodies_6d(BODIES, 3, False)),
+            (QRTComponentType.Component6dEulerRes, bodies_6d(BODIES, 3, True)),
+        )
+    )
+
+
+def test_6d_array(packet_6d):
+    info, (positions, rotations) = packet_6d.get_6d_array()
+    _, expected = packet_6d.get_6d()
+
+    assert info.body_count == 2
+    assert positions.shape == (2, 3)
+    assert rotations.shape == (2, 3, 3)
+    assert positions.flags.c_contiguous and rotations.flags.c_contiguous
+    assert positions.tolist() == [list(p) for p, _ in expected]
+    assert rotations.transpose(0, 2, 1).reshape(2, 9).tolist() == [
+        list(r.matrix) for _, r in expected
+    ]
+
+
+def test_6d_array_rotation_orientation():
+    # 90 degrees about z, sent column-major: the x axis maps onto the y axis.
+    matrix = (0.0, 1.0, 0.0, -1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+    packet = QRTPacket(
+        make_packet(
+            (
+                QRTComponentType.Component6d,
+                bodies_6d([((0.0, 0.0, 0.0), matrix, 0.0)], 9, False),
+            )
+        )
+    )
+    _, (_, rotations) = packet.get_6d_array()
+    _, [(_, expected)] = packet.get_6d()
+
+    m = expected.matrix
+    assert rotations[0].tolist() == [
+        [m[row + 3 * col] for col in range(3)] for row in range(3)
+    ]
+    assert rotations[0].dot([1.0, 0.0, 0.0]).tolist() == [0.0, 1.0, 0.0]
+
+
+def test_6d_residual_array(packet_6d):
+    _, (positions, rotations, residuals) = packet_6d.get_6d_residual_array()
+    _, expected = packet_6d.get_6d_residual()
+
+    assert positions.tolist() == [list(p) for p, _, _ in expected]
+    assert rotations.transpose(0, 2, 1).reshape(2, 9).tolist() == [
+        list(r.matrix) for _, r, _ in expected
+    ]
+    assert residuals.tolist() == [r.residual for _, _, r in expected]
+
+
+def test_6d_arrays_read_only_from_bytearray(packet_6d):
+    packet = QRTPacket(memoryview(bytearray(packet_6d.data)))
+    _, arrays = packet.get_6d_residual_array()
+    _, euler_arrays = packet.get_6d_euler_array()
+
+    assert not any(array.flags.writeable for array in arrays + euler_arrays)
+
+
+def test_6d_euler_array(packet_6d):
+    _, (positions, eulers) = packet_6d.get_6d_euler_array()
+    _, expected = packet_6d.get_6d_euler()
+
+    assert positions.tolist() == [list(p) for p, _ in expected]
+    assert eulers.tolist() == [list(e) for _, e in expected]
+
+
+def test_6d_euler_residual_array(packet_6d):
+    _, (positions, eulers, residuals) = packet_6d.get_6d_euler_residual_array()
+    _, expected = packet_6d.get_6d_euler_residual()
+
+    assert positions.tolist() == [list(p) for p, _, _ in expected]
+    assert eulers.tolist() == [list(e) for _, e, _ in expected]
+    assert residuals.tolist() == [r.residual for _, _, r in expected]
+
+
+def analog_body(devices):
+    body = struct.pack("<i", len(devices))
+    for device_id, sample_number, channels in devices:
+        sample_count = len(channels[0]) if channels else 0
+        body += struct.pack("<iii", device_id, len(channels), sample_count)
+        if sample_count > 0:
+            body += struct.pack("<i", sample_number)
+            for channel in channels:
+                body += struct.pack("<%df" % sample_count, *channel)
+    return body
+
+
+def analog_single_body(devices):
+    body = struct.pack("<i", len(devices))
+    for device_id, samples in devices:
+        body += struct.pack("<ii", device_id, len(samples))
+        body += struct.pack("<%df" % len(samples), *samples)
+    return body
+
+
+ANALOG = [
+    (1, 100, [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]),
+    (2, 0, []),
+    (3, 7, [[0.5, 1.5], [2.5, 3.5], [4.5, 5.5]]),
+]
+
+
+@pytest.fixture
+def packet_analog():
+    return QRTPacket(
+        make_packet(
+            (QRTComponentType.ComponentAnalog, analog_body(ANALOG)),
+            (
+                QRTComponentType.ComponentAnalogSingle,
+                analog_single_body([(1, [1.0, 2.0]), (2, [3.0, 4.0, 5.0])]),
+            ),
+        )
+    )
+
+
+def test_analog(packet_analog):
+    _, channels = packet_analog.get_analog()
+
+    assert [(d.id, s.sample_number, list(c.samples)) for d, s, c in channels] == [
+        (1, 100, [1.0, 2.0, 3.0]),
+        (1, 100, [4.0, 5.0, 6.0]),
+        (3, 7, [0.5, 1.5]),
+        (3, 7, [2.5, 3.5]),
+        (3, 7, [4.5, 5.5]),
+    ]
+
+
+def test_analog_array(packet_analog):
+    _, devices = packet_analog.get_analog_array()
+
+    assert [(d.id, s.sample_number) for d, s, _ in devices] == [(1, 100), (3, 7)]
+    assert devices[0][2].shape == (2, 3)
+    assert devices[1][2].tolist() == [[0.5, 1.5], [2.5, 3.5], [4.5, 5.5]]
+
+
+def test_analog_array_read_only_from_bytearray(packet_analog):
+    packet = QRTPacket(memoryview(bytearray(packet_analog.data)))
+    _, devices = packet.get_analog_array()
+
+    assert not any(samples.flags.writeable for _, _, samples in devices)
+
+
+def test_analog_single(packet_analog):
+    _, devices = packet_analog.get_analog_single()
+
+    assert [(d.id, list(s.samples)) for d, s in devices] == [
+        (1, [1.0, 2.0]),
+        (2, [3.0, 4.0, 5.0]),
+    ]
+
+
+def test_analog_single_array(packet_analog):
+    _, devices = packet_analog.get_analog_single_array()
+
+    assert [(d.id, s.tolist()) for d, s in devices] == [
+        (1, [1.0, 2.0]),
+        (2, [3.0, 4.0, 5.0]),
+    ]
+
+
+def test_analog_formats_are_cached(packet_analog):
+    packet_analog.get_analog()
+    formats = dict(QRTPacket._analog_formats)
+    packet_analog.get_analog()
+
+    assert (3, 2) in formats
+    for key, analog_format in formats.items():
+        assert QRTPacket._analog_formats[key] is analog_format
@@ -0,0 +1,239 @@
+"""
+    Tests for Receiver
+"""
+
+import struct
+
+import pytest
+
+from qtm.packet import QRTPacketType, QRTEvent, RTheader
+from qtm.packet import RTDataQRTPacket
+from qtm.receiver import Receiver, UdpReceiver
+
+# pylint: disable=W0621, C0111, C0330
+
+
+def frame(type_, payload):
+    return RTheader.pack(RTheader.size + len(payload), type_.value) + payload
+
+
+def data_frame(framenumber):
+    return frame(QRTPacketType.PacketData, RTDataQRTPacket.pack(1000, framenumber, 0))
+
+
+STREAM = (
+    frame(QRTPacketType.PacketCommand, b"QTM RT Interface connected\0")
+    + data_frame(1)
+    + frame(QRTPacketType.PacketEvent, struct.pack("<c", b"\x03"))
+    + data_frame(2)
+    + frame(QRTPacketType.PacketXML, b"<QTM_Parameters_Ver_1.24/>\0")
+    + data_frame(3)
+)
+
+EXPECTED = [
+    (QRTPacketType.PacketCommand, b"QTM RT Interface connected"),
+    (QRTPacketType.PacketData, 1),
+    (QRTPacketType.PacketEvent, QRTEvent.EventCaptureStarted),
+    (QRTPacketType.PacketData, 2),
+    (QRTPacketType.PacketXML, b"<QTM_Parameters_Ver_1.24/>"),
+    (QRTPacketType.PacketData, 3),
+]
+
+
+@pytest.fixture
+def received():
+    return []
+
+
+@pytest.fixture
+def receiver(received):
+    def handler(type_):
+        if type_ == QRTPacketType.PacketData:
+            return lambda packet: received.append((type_, packet.framenumber))
+        return lambda data: received.append((type_, data))
+
+    return Receiver(
+        {
+            type_: handler(type_)
+            for type_ in [
+                QRTPacketType.PacketCommand,
+                QRTPacketType.PacketData,
+                QRTPacketType.PacketEvent,
+                QRTPacketType.PacketXML,
+            ]
+        }
+    )
+
+
+def test_whole_stream(receiver, received):
+    receiver.data_received(STREAM)
+
+    assert received == EXPECTED
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 7, 13, 31])
+def test_chunked_stream(receiver, received, chunk_size):
+    for start in range(0, len(STREAM), chunk_size):
+        receiver.data_received(STREAM[start : start + chunk_size])
+
+    assert received == EXPECTED
+
+
+@pytest.mark.parametrize("split", range(1, len(STREAM)))
+def test_split_stream(receiver, received, split):
+    receiver.data_received(STREAM[:split])
+    receiver.data_received(STREAM[split:])
+
+    assert received == EXPECTED
+
+
+def test_packet_data_is_view(receiver):
+    packets = []
+    receiver._handlers[QRTPacketType.PacketData] = packets.append
+
+    receiver.data_received(STREAM)
+
+    assert all(isinstance(packet.data, memoryview) for packet in packets)
+    assert [packet.framenumber for packet in packets] == [1, 2, 3]
+
+
+def test_command_is_bytes(receiver, received):
+    receiver.data_received(STREAM[:40])
+
+    assert isinstance(received[0][1], bytes)
+
+
+def test_coalesce(receiver, received):
+    receiver.coalesce = True
+    receiver.data_received(STREAM)
+
+    assert received == [
+        (QRTPacketType.PacketCommand, b"QTM RT Interface connected"),
+        (QRTPacketType.PacketEvent, QRTEvent.EventCaptureStarted),
+        (QRTPacketType.PacketXML, b"<QTM_Parameters_Ver_1.24/>"),
+        (QRTPacketType.PacketData, 3),
+    ]
+    assert receiver.dropped_frames == 2
+
+
+def test_coalesce_keeps_order_after_newest_frame(receiver, received):
+    receiver.coalesce = True
+    receiver.data_received(
+        data_frame(1)
+        + data_frame(2)
+        + frame(QRTPacketType.PacketEvent, struct.pack("<c", b"\x04"))
+    )
+
+    assert received == [
+        (QRTPacketType.PacketData, 2),
+        (QRTPacketType.PacketEvent, QRTEvent.EventCaptureStopped),
+    ]
+    assert receiver.dropped_frames == 1
+
+
+@pytest.mark.parametrize("split", range(1, len(STREAM)))
+def test_coalesce_split_stream(receiver, received, split):
+    receiver.coalesce = True
+    receiver.data_received(STREAM[:split])
+    receiver.data_received(STREAM[split:])
+
+    frames = [data for type_, data in received if type_ == QRTPacketType.PacketData]
+    assert frames[-1] == 3
+    assert len(frames) + receiver.dropped_frames == 3
+    assert [r for r in received if r[0] != QRTPacketType.PacketData] == [
+        r for r in EXPECTED if r[0] != QRTPacketType.PacketData
+    ]
+
+
+@pytest.fixture
+def udp_receiver(received):
+    return UdpReceiver(
+        {
+            QRTPacketType.PacketData: lambda packet: received.append(
+                packet.framenumber
+            ),
+            QRTPacketType.PacketNoMoreData: lambda _: received.append(None),
+        }
+    )
+
+
+def receive_frames(receiver, framenumbers):
+    for framenumber in framenumbers:
+        receiver.datagram_received(data_frame(framenumber), ("127.0.0.1", 22225))
+
+
+def test_udp_in_order(udp_receiver, received):
+    receive_frames(udp_receiver, [1, 2, 3, 4])
+
+    assert received == [1, 2, 3, 4]
+    assert udp_receiver.stats.received == 4
+    assert udp_receiver.stats.out_of_order == 0
+    assert udp_receiver.stats.lost == 0
+
+
+def test_udp_discards_out_of_order(udp_receiver, received):
+    receive_frames(udp_receiver, [1, 3, 2, 4, 4, 6, 5])
+
+    assert received == [1, 3, 4, 6]
+    assert udp_receiver.stats.received == 4
+    assert udp_receiver.stats.out_of_order == 3
+    assert udp_receiver.stats.lost == 2
+    assert udp_receiver.stats.loss_ratio == pytest.approx(2 / 6.0)
+
+
+def test_udp_lost_frames(udp_receiver, received):
+    receive_frames(udp_receiver, [10, 11, 15, 16])
+
+    assert received == [10, 11, 15, 16]
+    assert udp_receiver.stats.lost == 3
+
+
+def test_udp_frame_step(udp_receiver, received):
+    udp_receiver.frame_step = 4
+    receive_frames(udp_receiver, [4, 8, 16, 12, 20])
+
+    assert received == [4, 8, 16, 20]
+    assert udp_receiver.stats.lost == 1
+    assert udp_receiver.stats.out_of_order == 1
+
+
+def test_udp_unknown_frame_step(udp_receiver, received):
+    udp_receiver.frame_step = None
+    receive_frames(udp_receiver, [2, 3, 5, 4, 7])
+
+    assert received == [2, 3, 5, 7]
+    assert udp_receiver.stats.lost == 0
+    assert udp_receiver.stats.out_of_order == 1
+
+
+def test_udp_numbering_restarts(udp_receiver, received):
+    receive_frames(udp_receiver, [5000, 5001, 1, 2])
+
+    assert received == [5000, 5001, 1, 2]
+    assert udp_receiver.stats.out_of_order == 0
+    assert udp_receiver.stats.lost == 0
+
+
+def test_udp_reset(udp_receiver, received):
+    receive_frames(udp_receiver, [5, 7])
+    udp_receiver.reset()
+    receive_frames(udp_receiver, [3])
+
+    assert received == [5, 7, 3]
+    assert udp_receiver.stats.received == 1
+    assert udp_receiver.stats.lost == 0
+
+
+def test_udp_other_packets(udp_receiver, received):
+    udp_receiver.datagram_received(frame(QRTPacketType.PacketNoMoreData, b""))
+    receive_frames(udp_receiver, [1])
+
+    assert received == [None, 1]
+
+
+@pytest.mark.parametrize("length", [0, 4, 8, 20])
+def test_udp_truncated_datagram(udp_receiver, received, length):
+    udp_receiver.datagram_received(data_frame(1)[:length])
+
+    assert received == []
+    assert udp_receiver.stats.received == 0
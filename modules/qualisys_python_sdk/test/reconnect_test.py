@@ -0,0 +1,66 @@
+"""
+    Tests for Backoff and ReconnectStats
+"""
+
+import pytest
+
+from qtm.reconnect import Backoff, ReconnectStats
+
+# pylint: disable=W0621, C0111, C0330
+
+
+def test_backoff_doubles_up_to_maximum():
+    backoff = Backoff(initial=0.5, factor=2.0, maximum=5.0, jitter=0)
+
+    assert [backoff.next_delay() for _ in range(6)] == [0.5, 1, 2, 4, 5, 5]
+    assert backoff.attempts == 6
+
+
+def test_backoff_reset():
+    backoff = Backoff(initial=1.0, jitter=0)
+    backoff.next_delay()
+    backoff.next_delay()
+    backoff.reset()
+
+    assert backoff.next_delay() == 1.0
+
+
+def test_backoff_jitter_only_shortens():
+    backoff = Backoff(initial=1.0, factor=1.0, jitter=0.2)
+    delays = [backoff.next_delay() for _ in range(200)]
+
+    assert all(0.8 <= delay <= 1.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_reconnect_stats():
+    stats = ReconnectStats()
+    assert not stats.is_down
+    assert stats.current_downtime(5.0) == 0.0
+
+    stats.disconnected(10.0)
+    stats.attempted()
+    stats.attempted()
+    assert stats.is_down
+    assert stats.current_downtime(11.5) == pytest.approx(1.5)
+
+    stats.reconnected(12.0)
+    stats.disconnected(20.0)
+    stats.attempted()
+    stats.reconnected(20.5)
+
+    assert (stats.disconnects, stats.attempts, stats.reconnects) == (2, 3, 2)
+    assert stats.downtime == pytest.approx(2.5)
+    assert stats.last_downtime == pytest.approx(0.5)
+    assert not stats.is_down
+
+
+def test_reconnect_stats_given_up():
+    stats = ReconnectStats()
+    stats.disconnected(1.0)
+    stats.attempted()
+    stats.ended(4.0)
+    stats.ended(6.0)
+
+    assert stats.reconnects == 0
+    assert stats.downtime == pytest.approx(3.0)
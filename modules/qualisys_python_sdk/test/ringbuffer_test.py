@@ -0,0 +1,156 @@
+"""
+    Tests for SampleRingBuffer and StreamBuffer
+"""
+
+import struct
+
+import pytest
+
+from qtm.packet import QRTPacket, QRTComponentType
+
+from test.qrtpacket_test import make_packet, analog_body
+
+np = pytest.importorskip("numpy")
+
+from qtm.ringbuffer import SampleRingBuffer, StreamBuffer, ANALOG, FORCE
+
+# pylint: disable=W0621, C0111, C0330, C0413
+
+
+def ramp(start, count, channel_count=2):
+    """Samples whose value is their sample number, offset per channel"""
+    values = np.arange(start, start + count, dtype=np.float32)
+    return np.vstack([values + 1000 * channel for channel in range(channel_count)])
+
+
+def test_write_and_read():
+    buffer = SampleRingBuffer(2, 8)
+    buffer.write(10, ramp(10, 3))
+    buffer.write(13, ramp(13, 2))
+
+    assert len(buffer) == 5
+    assert buffer.first_sample_number == 10
+    assert buffer.end_sample_number == 15
+    assert buffer.read(11, 3).tolist() == ramp(11, 3).tolist()
+
+
+def test_wraps_around():
+    buffer = SampleRingBuffer(2, 8)
+    for start in range(0, 20, 3):
+        buffer.write(start, ramp(start, 3))
+
+    assert len(buffer) == 8
+    first, samples = buffer.latest()
+    assert first == 13
+    assert samples.tolist() == ramp(13, 8).tolist()
+
+
+def test_write_larger_than_capacity():
+    buffer = SampleRingBuffer(2, 4)
+    buffer.write(0, ramp(0, 10))
+
+    assert buffer.latest() == (6, pytest.approx(ramp(6, 4)))
+
+
+def test_read_outside_buffer():
+    buffer = SampleRingBuffer(2, 4)
+    buffer.write(0, ramp(0, 6))
+
+    with pytest.raises(ValueError):
+        buffer.read(0, 2)
+    with pytest.raises(ValueError):
+        buffer.read(4, 3)
+
+
+def test_gap_is_filled_with_nan():
+    buffer = SampleRingBuffer(2, 16)
+    buffer.write(0, ramp(0, 4))
+    buffer.write(7, ramp(7, 2))
+
+    assert buffer.gap_count == 1
+    assert buffer.missing_samples == 3
+    samples = buffer.read(3, 5)
+    assert samples[:, 0].tolist() == [3, 1003]
+    assert np.isnan(samples[:, 1:4]).all()
+    assert samples[:, 4].tolist() == [7, 1007]
+
+
+def test_restart_clears_buffer():
+    buffer = SampleRingBuffer(2, 16)
+    buffer.write(100, ramp(100, 4))
+    buffer.write(0, ramp(0, 4))
+
+    assert buffer.latest() == (0, pytest.approx(ramp(0, 4)))
+    assert buffer.gap_count == 0
+
+
+def test_latest_ms():
+    buffer = SampleRingBuffer(2, 100, frequency=1000)
+    buffer.write(0, ramp(0, 50))
+
+    first, samples = buffer.latest_ms(10)
+    assert first == 40
+    assert samples.shape == (2, 10)
+
+    with pytest.raises(ValueError):
+        SampleRingBuffer(2, 100).latest_ms(10)
+
+
+def test_latest_empty():
+    first, samples = SampleRingBuffer(3, 10).latest(5)
+
+    assert first is None
+    assert samples.shape == (3, 0)
+
+
+def test_read_frame():
+    buffer = SampleRingBuffer(2, 8, frame_capacity=4)
+    for frame in range(6):
+        buffer.write(frame * 2, ramp(frame * 2, 2), framenumber=frame)
+
+    assert buffer.read_frame(5) == (10, pytest.approx(ramp(10, 2)))
+    assert buffer.read_frame(1) is None  # Evicted from the frame index
+    assert buffer.read_frame(9) is None
+
+
+def force_body(plates):
+    body = struct.pack("<i", len(plates))
+    for plate_id, force_number, forces in plates:
+        body += struct.pack("<iii", plate_id, len(forces), force_number)
+        for force in forces:
+            body += struct.pack("<9f", *force)
+    return body
+
+
+def test_stream_buffer_feed():
+    buffers = StreamBuffer(capacity=16, frequencies={(ANALOG, 1): 2000})
+    forces = [tuple(float(i + j) for i in range(9)) for j in range(2)]
+
+    for frame in range(3):
+        buffers.feed(
+            QRTPacket(
+                make_packet(
+                    (
+                        QRTComponentType.ComponentAnalog,
+                        analog_body([(1, frame * 3, ramp(frame * 3, 3).tolist())]),
+                    ),
+                    (
+                        QRTComponentType.ComponentForce,
+                        force_body([(2, frame * 2, forces)]),
+                    ),
+                    framenumber=frame,
+                )
+            )
+        )
+
+    analog = buffers.get(ANALOG, 1)
+    assert analog.frequency == 2000
+    assert analog.latest() == (0, pytest.approx(ramp(0, 9)))
+    assert analog.read_frame(1) == (3, pytest.approx(ramp(3, 3)))
+
+    force = buffers.get(FORCE, 2)
+    assert force.channel_count == 9
+    assert len(force) == 6
+    assert force.read_frame(2)[1].T.tolist() == [list(f) for f in forces]
+
+    assert buffers.get(ANALOG, 2) is None
@@ -0,0 +1,219 @@
+"""
+    Tests for the QTM simulator
+"""
+
+import asyncio
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from qtm.packet import QRTComponentType, QRTEvent, QRTPacket
+from qtm.protocol import QRTCommandException
+from qtm.qrt import connect
+from qtm.simulator import Simulator, SyntheticSource, TakeSource
+from qtm.take import TakeWriter
+
+# pylint: disable=W0621, C0111, C0330
+
+
+async def run(source, session, timeout=10):
+    """Runs session(simulator, connection) against a simulator serving source"""
+
+    async def main():
+        simulator = Simulator(source, port=0)
+        await simulator.start()
+        connection = await connect("127.0.0.1", port=simulator.port, timeout=2)
+        try:
+            return await session(simulator, connection)
+        finally:
+            connection.disconnect()
+            simulator.close()
+
+    return await asyncio.wait_for(main(), timeout)
+
+
+async def stream(connection, count, **kwargs):
+    received = []
+    await connection.stream_frames(on_packet=received.append, **kwargs)
+    while len(received) < count:
+        await asyncio.sleep(0.01)
+    await connection.stream_frames_stop()
+    return received
+
+
+@pytest.mark.asyncio
+async def test_handshake_and_state():
+    async def session(simulator, connection):
+        return await connection.qtm_version(), await connection.get_state()
+
+    version, state = await run(SyntheticSource(), session)
+
+    assert version.startswith(b"QTM Version is")
+    assert state == QRTEvent.EventRTfromFileStarted
+
+
+@pytest.mark.asyncio
+async def test_parameters():
+    async def session(_, connection):
+        return await connection.get_parameters(["3d", "6d", "skeleton"])
+
+    xml = await run(
+        SyntheticSource(markers=3, bodies=2, skeletons=1, segments=4), session
+    )
+    root = ET.fromstring(xml.decode())
+
+    assert [label.findtext("Name") for label in root.iter("Label")] == [
+        "marker0",
+        "marker1",
+        "marker2",
+    ]
+    # Points need names, the plugin creates a locator named after each.
+    assert [point.get("Name") for point in root.iter("Point")] == [
+        "body%d_point%d" % (body, point) for body in range(2) for point in range(3)
+    ]
+    assert len(list(root.iter("Segment"))) == 4
+    assert root.find("General") is None
+
+
+@pytest.mark.asyncio
+async def test_stream_components():
+    async def session(_, connection):
+        return await stream(connection, 3, components=["3d", "6d", "skeleton"])
+
+    packets = await run(
+        SyntheticSource(markers=5, bodies=2, skeletons=3, segments=4), session
+    )
+    packet = packets[0]
+
+    assert packet.get_3d_markers()[0].marker_count == 5
+    assert len(packet.get_3d_markers()[1]) == 5
+    assert len(packet.get_6d()[1]) == 2
+    skeletons = packet.get_skeletons()[1]
+    assert [len(segments) for segments in skeletons] == [4, 4, 4]
+    assert skeletons[0][0][0] == 1
+    assert QRTComponentType.Component2d not in packet.components
+
+
+@pytest.mark.asyncio
+async def test_current_frame():
+    async def session(_, connection):
+        return await connection.get_current_frame(components=["3d"])
+
+    packet = await run(SyntheticSource(markers=2), session)
+
+    assert list(packet.components) == [QRTComponentType.Component3d]
+
+
+@pytest.mark.asyncio
+async def test_sustains_high_rate():
+    frequency = 2000
+
+    async def session(simulator, connection):
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        received = await stream(connection, frequency // 2, components=["3d"])
+        return received, loop.time() - start
+
+    received, elapsed = await run(
+        SyntheticSource(markers=20, frequency=frequency), session
+    )
+
+    framenumbers = [packet.framenumber for packet in received]
+    assert framenumbers == list(range(framenumbers[0], framenumbers[0] + len(received)))
+    assert elapsed < 2 * len(received) / frequency
+
+
+@pytest.mark.parametrize(
+    "frames, step", [("frequency:100", 10), ("frequencydivisor:4", 4)]
+)
+@pytest.mark.asyncio
+async def test_stream_rate(frames, step):
+    async def session(_, connection):
+        return await stream(connection, 5, frames=frames, components=["3d"])
+
+    received = await run(SyntheticSource(frequency=1000), session)
+
+    framenumbers = [packet.framenumber for packet in received[:5]]
+    assert [b - a for a, b in zip(framenumbers, framenumbers[1:])] == [step] * 4
+
+
+@pytest.mark.asyncio
+async def test_stream_udp():
+    async def session(_, connection):
+        received = await stream(connection, 10, components=["6d"], udp_port=0)
+        return received, connection.udp_stats
+
+    received, stats = await run(SyntheticSource(frequency=500), session)
+
+    assert len(received) >= 10
+    assert stats.lost == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_command():
+    async def session(_, connection):
+        with pytest.raises(QRTCommandException):
+            await connection.take_control("password")
+
+    await run(SyntheticSource(), session)
+
+
+@pytest.mark.asyncio
+async def test_several_clients_see_the_same_frames():
+    async def session(simulator, connection):
+        other = await connect("127.0.0.1", port=simulator.port, timeout=2)
+        try:
+            assert simulator.clients == 2
+            first = await connection.get_current_frame(components=["3d"])
+            second = await other.get_current_frame(components=["3d"])
+        finally:
+            other.disconnect()
+        return first, second
+
+    first, second = await run(SyntheticSource(frequency=10), session)
+
+    assert second.framenumber - first.framenumber <= 1
+
+
+@pytest.fixture
+def take_path(tmpdir):
+    path = str(tmpdir.join("take.qtake"))
+    source = SyntheticSource(markers=2, frequency=100)
+    components = {QRTComponentType.Component3d}
+    with TakeWriter(path) as writer:
+        for index in range(50, 60):
+            writer.write(QRTPacket(source.frame(index, components)))
+    return path
+
+
+def test_take_source(take_path):
+    source = TakeSource(take_path, "<QTM_Parameters_Ver_1.24/>", loop=True)
+
+    assert source.frequency == pytest.approx(100)
+    assert source.parameters(["3d"]) == "<QTM_Parameters_Ver_1.24/>"
+
+    first = QRTPacket(source.frame(0, None))
+    assert (first.framenumber, first.timestamp) == (51, 500000)
+
+    # The second lap continues where the first ended.
+    lap = QRTPacket(source.frame(10, None))
+    assert (lap.framenumber, lap.timestamp) == (61, 600000)
+    assert bytes(lap.data[16:]) == bytes(first.data[16:])
+
+
+def test_take_source_ends(take_path):
+    source = TakeSource(take_path, "", loop=False)
+
+    assert source.frame(9, None) is not None
+    assert source.frame(10, None) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_take(take_path):
+    async def session(_, connection):
+        return await stream(connection, 25, components=["3d"])
+
+    received = await run(TakeSource(take_path, "", frequency=500), session)
+
+    framenumbers = [packet.framenumber for packet in received]
+    assert framenumbers == list(range(framenumbers[0], framenumbers[0] + len(received)))
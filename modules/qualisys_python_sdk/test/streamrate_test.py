@@ -0,0 +1,111 @@
+"""
+    Tests for frames_option and AdaptiveRate
+"""
+
+import pytest
+
+from qtm.streamrate import AdaptiveRate, frame_step, frames_option
+
+# pylint: disable=W0621, C0111, C0330
+
+
+def test_frames_option():
+    assert frames_option() == "allframes"
+    assert frames_option(frequency=60) == "frequency:60"
+    assert frames_option(frequency_divisor=4) == "frequencydivisor:4"
+
+    with pytest.raises(ValueError):
+        frames_option(frequency=60, frequency_divisor=4)
+
+
+def test_frame_step():
+    assert frame_step("allframes") == 1
+    assert frame_step("frequencydivisor:4") == 4
+    assert frame_step("frequency:60") is None
+
+
+def simulate(rate, seconds, capacity, coalesce):
+    """Stream at the controller's frequency to a client applying at most
+    capacity frames per second, updating once a second.
+
+    Returns the frames option of every update.
+    """
+    now = 0.0
+    timestamp = 0.0
+    backlog = 0.0
+    dropped = 0
+    options = []
+    rate.update(now, dropped)
+
+    for _ in range(seconds):
+        sent = rate.frequency
+        if coalesce:
+            applied = min(sent, capacity)
+            dropped += sent - applied
+            captured = 1.0
+        else:
+            # Frames queue up, so the applied ones were captured further back.
+            applied = min(sent + backlog, capacity)
+            backlog += sent - applied
+            captured = applied / float(sent)
+
+        for i in range(int(applied)):
+            rate.frame_applied(int((timestamp + captured * (i + 1) / applied) * 1e6))
+        timestamp += captured
+
+        now += 1.0
+        options.append(rate.update(now, dropped))
+
+    return options
+
+
+def test_keeps_target_when_keeping_up():
+    rate = AdaptiveRate(target_frequency=60)
+
+    assert simulate(rate, 10, capacity=200, coalesce=True) == [None] * 10
+    assert rate.frames == "frequency:60"
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_lowers_frequency_when_falling_behind(coalesce):
+    rate = AdaptiveRate(target_frequency=60)
+    options = simulate(rate, 2, capacity=30, coalesce=coalesce)
+
+    assert options == ["frequency:27", None]
+
+
+def test_settles_below_where_it_fell_behind():
+    rate = AdaptiveRate(target_frequency=60)
+    options = simulate(rate, 30, capacity=30, coalesce=True)
+
+    assert options[:4] == ["frequency:27", None, None, "frequency:34"]
+    assert options[-5:] == [None] * 5
+    assert 27 <= rate.frequency <= 31
+
+
+def test_raises_frequency_towards_target():
+    rate = AdaptiveRate(target_frequency=60, min_frequency=10)
+    simulate(rate, 2, capacity=20, coalesce=True)
+    lowered = rate.frequency
+
+    options = simulate(rate, 40, capacity=200, coalesce=True)
+
+    assert lowered < 20
+    assert rate.frequency == 60
+    assert [o for o in options if o is not None][-1] == "frequency:60"
+
+
+def test_never_below_min_frequency():
+    rate = AdaptiveRate(target_frequency=60, min_frequency=10)
+    simulate(rate, 5, capacity=3, coalesce=True)
+
+    assert rate.frequency == 10
+
+
+def test_no_frames_is_not_falling_behind():
+    rate = AdaptiveRate(target_frequency=60)
+    rate.update(0.0)
+
+    assert rate.update(1.0) is None
+    assert rate.update(2.0) is None
+    assert rate.frequency == 60
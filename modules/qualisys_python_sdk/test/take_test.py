@@ -0,0 +1,101 @@
+"""
+    Tests for TakeWriter and TakeReader
+"""
+
+import pytest
+
+from qtm.packet import QRTPacket, RTDataQRTPacket, RTComponentData
+from qtm.take import TakeWriter, TakeReader, TakeFooter
+
+# pylint: disable=W0621, C0111, C0330
+
+
+def packet(framenumber, timestamp=None, payload=b""):
+    if timestamp is None:
+        timestamp = framenumber * 10000
+    data = RTDataQRTPacket.pack(timestamp, framenumber, 1)
+    data += RTComponentData.pack(RTComponentData.size + len(payload), 1) + payload
+    return QRTPacket(memoryview(data))
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join("rehearsal.qtake"))
+
+
+def record(path, packets):
+    with TakeWriter(path, flush_interval=0.001) as writer:
+        for item in packets:
+            writer.write(item)
+    return writer
+
+
+def test_roundtrip(path):
+    packets = [packet(i, payload=bytes([i]) * i) for i in range(1, 50)]
+
+    writer = record(path, packets)
+    assert writer.frame_count == 49
+
+    take = TakeReader(path)
+    assert not take.recovered
+    assert len(take) == 49
+    assert take.framenumbers == list(range(1, 50))
+    for written, read in zip(packets, take):
+        assert bytes(read.data) == bytes(written.data)
+        assert read.timestamp == written.timestamp
+        assert read.components == written.components
+
+
+def test_ignores_other_packets(path):
+    record(path, [b"Ok", packet(1), None, packet(2)])
+
+    assert TakeReader(path).framenumbers == [1, 2]
+
+
+def test_empty(path):
+    record(path, [])
+
+    take = TakeReader(path)
+    assert len(take) == 0
+    assert list(take) == []
+
+
+def test_random_access(path):
+    record(path, [packet(i) for i in range(100, 200)])
+
+    take = TakeReader(path)
+    assert take[42].framenumber == 142
+    assert take[-1].framenumber == 199
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected", [(0, 0), (1010000, 1), (1015000, 1), (5000000, 99)]
+)
+def test_index_at(path, timestamp, expected):
+    record(path, [packet(i) for i in range(100, 200)])
+
+    assert TakeReader(path).index_at(timestamp) == expected
+
+
+@pytest.mark.parametrize("cut", [0, 5, 16])
+def test_recover_unclosed(path, cut):
+    record(path, [packet(i, payload=b"abcd") for i in range(10)])
+
+    with open(path, "rb") as take_file:
+        data = take_file.read()
+    # Drop the index and footer, and part of the last packet.
+    index_offset = TakeFooter.unpack_from(data, len(data) - TakeFooter.size)[0]
+    with open(path, "wb") as take_file:
+        take_file.write(data[: index_offset - cut])
+
+    take = TakeReader(path)
+    assert take.recovered
+    assert take.framenumbers == list(range(10 if cut == 0 else 9))
+
+
+def test_not_a_take(path):
+    with open(path, "wb") as take_file:
+        take_file.write(b"<QTM_Parameters_Ver_1.24/>")
+
+    with pytest.raises(ValueError):
+        TakeReader(path)
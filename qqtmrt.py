@@ -1,62 +1,346 @@
-import json
+import collections
+import time
 from Qt import QtNetwork
 from Qt import QtCore
 from Qt.QtCore import Signal, Property
 
-import xml2json
 from qtmparser import QtmParser
+from qtmsettings import parse_settings
+from streamthread import StreamThread
 
 from qtm.packet import QRTPacketType, QRTPacket, QRTEvent
 from qtm.packet import RTheader, RTEvent
+from qtm.streamrate import AdaptiveRate, ALL_FRAMES, frame_step
+from qtm.reconnect import Backoff, ReconnectStats
+from qtm.take import TakeWriter
+from qtm.latency import LatencyMonitor
 import qtm
 from time import sleep
 
+class QtmReply(QtCore.QObject):
+    """Reply to a command sent with QQtmRt.send_command_async.
+
+    finished is emitted with the response when it arrives. failed is emitted with
+    the message when QTM responds with an error or the connection is lost.
+    """
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, command, event=False):
+        super(QtmReply, self).__init__()
+
+        self.command = command
+        self.event = event
+        self.response = None
+        self.error = None
+        self.is_finished = False
+
+    def _finish(self, response):
+        self.response = response
+        self.is_finished = True
+        self.finished.emit(response)
+
+    def _fail(self, error):
+        self.error = error
+        self.is_finished = True
+        self.failed.emit(error)
+
 class QQtmRt(QtCore.QObject):
     connectedChanged = Signal(bool)
+    connectFinished = Signal(bool)
     streamingChanged = Signal(bool)
     packetReceived = Signal(QRTPacket)
     noDataReceived = Signal(QRTPacket)
     eventReceived = Signal(int)
+    framesChanged = Signal(str)
+    reconnectingChanged = Signal(bool)
+    _streamThreadWoken = Signal()
 
     def __init__(self, parent=None):
         super(QQtmRt, self).__init__(parent=parent)
 
         self._connected = False
         self._streaming = False
+        self._threaded = False
+        self._stream_thread = None
+        self._udp = False
+        self._udp_socket = None
+        self._udp_packets = []
+        self._stream_components = None
+        self._frames = ALL_FRAMES
+        self._adaptive_rate = None
+        # Frames passed over for a newer one before being applied, see frame_skipped.
+        self._skipped_frames = 0
+        self._host = None
+        self._connecting = False
+        self._replies = collections.deque()
+        self._welcome_reply = None
+        self._connect_timeout = 3000
+        self._auto_reconnect = False
+        self._reconnecting = False
+        self._disconnecting = False
+        self._stream_request = None
+        self._resume_stream_request = None
+        # Reply marking the end of a stopped stream, frames are dropped until it arrives.
+        self._stop_reply = None
+        self._take_writer = None
+        self._latency = LatencyMonitor()
+        # When the data being handled was read, for measuring latency.
+        self._receipt_time = 0.0
+        self._backoff = Backoff()
+        self._reconnect_stats = ReconnectStats()
+        self._settings_cache = {}
+        self._settings_xml = {}
+        # Settings from before the connection was lost, reused after reconnecting
+        # if QTM sends the same XML.
+        self._stale_settings = {}
+        # Components always fetched along with the requested ones when the
+        # settings cache misses, so that a single round-trip serves all callers.
+        self.settings_components = []
+        self.requested_version = '1.24'
         self._socket = QtNetwork.QTcpSocket(parent=self)
 
+        self._socket.connected.connect(self._socket_connected)
         self._socket.disconnected.connect(self._disconnected)
+        self._socket.stateChanged.connect(self._socket_state_changed)
+        self._socket.readyRead.connect(self._data_received)
+
+        self._connect_timer = QtCore.QTimer(self)
+        self._connect_timer.setSingleShot(True)
+        self._connect_timer.timeout.connect(self._connect_failed)
+
+        self._reconnect_timer = QtCore.QTimer(self)
+        self._reconnect_timer.setSingleShot(True)
+        self._reconnect_timer.timeout.connect(self._reconnect)
+
+        self._rate_timer = QtCore.QTimer(self)
+        self._rate_timer.timeout.connect(self._update_rate)
 
         self._handlers = {
             QRTPacketType.PacketData: self._on_data,
             QRTPacketType.PacketEvent: self._on_event,
             QRTPacketType.PacketError: self._on_error,
             QRTPacketType.PacketNoMoreData: self._on_no_data,
+            QRTPacketType.PacketCommand: self._on_command,
+            QRTPacketType.PacketXML: self._on_xml,
         }
 
         self._receiver = qtm.Receiver(self._handlers)
+        self._udp_receiver = qtm.UdpReceiver(
+            {
+                QRTPacketType.PacketData: self._udp_packets.append,
+                QRTPacketType.PacketNoMoreData: self._on_no_data,
+            }
+        )
 
-        self.streamingChanged.connect(self._streaming_changed)
+        self._streamThreadWoken.connect(
+            self._take_from_stream_thread, QtCore.Qt.QueuedConnection
+        )
 
     def _on_no_data(self, packet):
         self.noDataReceived.emit(packet)
 
     def _on_data(self, packet):
-        self.packetReceived.emit(packet)
+        if self._stop_reply is not None:
+            return
 
-    def _on_xml(self, packet):
+        self._latency.received(packet, self._receipt_time, time.perf_counter())
         self.packetReceived.emit(packet)
 
-    def _on_error(self, packet):
-        self.packetReceived.emit(packet)
+    def frame_applied(self, packet):
+        """Reports that a received frame has been applied to the scene.
+
+        With adaptive streaming the rate is set by the frames actually applied,
+        so whatever applies them, e.g. an ApplyScheduler, has to report them.
+        """
+        if self._adaptive_rate is not None:
+            self._adaptive_rate.frame_applied(packet.timestamp)
+
+    def frame_skipped(self, packet):
+        """Reports that a received frame was passed over for a newer one.
+
+        Skipped frames count as dropped for adaptive streaming, the scene is not
+        keeping up with the stream.
+        """
+        self._skipped_frames += 1
+
+    def _on_command(self, response):
+        self._resolve_reply(response.decode('utf-8'))
+
+    def _on_xml(self, response):
+        self._resolve_reply(response.decode('utf-8'))
+
+    def _on_error(self, response):
+        response = response.decode('utf-8')
+        reply = self._pop_reply()
+
+        if reply is None:
+            self.packetReceived.emit(response)
+        else:
+            reply._fail(response)
 
     def _on_event(self, event):
-        self.eventReceived.emit(event)
+        # The reply to getstate is an event.
+        if self._replies and self._replies[0].event:
+            self._replies.popleft()._finish(event)
+        else:
+            if event in (
+                QRTEvent.EventCameraSettingsChanged,
+                QRTEvent.EventRTfromFileStarted,
+            ):
+                self.clear_settings_cache()
+
+            self.eventReceived.emit(event)
+
+    def _pop_reply(self):
+        for reply in self._replies:
+            if not reply.event:
+                self._replies.remove(reply)
+                return reply
+
+        return None
+
+    def _resolve_reply(self, response):
+        reply = self._pop_reply()
+
+        if reply is not None:
+            reply._finish(response)
+
+    def _queue_reply(self, command, event=False, callback=None):
+        reply = QtmReply(command, event=event)
+
+        if callback is not None:
+            reply.finished.connect(callback)
+
+        self._replies.append(reply)
+
+        return reply
+
+    def _socket_connected(self):
+        # QTM greets every new connection, handled like the reply to a command.
+        self._welcome_reply = self._queue_reply('')
+
+        if self._connecting:
+            self._welcome_reply.finished.connect(self._welcome_received)
+            self._welcome_reply.failed.connect(self._connect_failed)
+
+    def _welcome_received(self, response):
+        if response != 'QTM RT Interface connected':
+            self._connect_failed(response)
+            return
+
+        reply = self.set_version_async(self.requested_version)
+        reply.finished.connect(self._version_received)
+        reply.failed.connect(self._connect_failed)
+
+    def _version_received(self, response):
+        if response != 'Version set to {}'.format(self.requested_version):
+            self._connect_failed(response)
+            return
+
+        self._connecting = False
+        self._connect_timer.stop()
+        self.connected = True
+
+        if self._reconnecting:
+            self._reconnected()
+        else:
+            self.connectFinished.emit(True)
+
+    def _connect_failed(self, error=None):
+        if not self._connecting:
+            return
+
+        self._connecting = False
+        self._connect_timer.stop()
+        self._socket.abort()
+
+        if self._reconnecting:
+            self._schedule_reconnect()
+        else:
+            self.connectFinished.emit(False)
+
+    def _socket_state_changed(self, state):
+        if state == QtNetwork.QAbstractSocket.UnconnectedState:
+            self._connect_failed()
 
     def _disconnected(self):
+        reconnect = (
+            self._auto_reconnect and self._connected and not self._disconnecting
+        )
+        self._disconnecting = False
+
+        if reconnect:
+            stale_settings = self._finished_settings()
+        elif self._reconnecting:
+            stale_settings = self._stale_settings
+        else:
+            stale_settings = {}
+
+        self.clear_settings_cache()
+        self._stale_settings = stale_settings
+
+        self._stop_reply = None
+        self._rate_timer.stop()
+
+        while self._replies:
+            self._replies.popleft()._fail('Disconnected')
+
+        self._stop_stream_thread()
+        self._close_udp_socket()
         self.streaming = False
         self.connected = False
 
+        if reconnect:
+            self._start_reconnect(self._stream_request)
+
+    def _start_reconnect(self, stream_request):
+        self._resume_stream_request = stream_request
+        self._backoff.reset()
+        self._reconnect_stats.disconnected(time.perf_counter())
+        self.reconnecting = True
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        self._reconnect_timer.start(int(self._backoff.next_delay() * 1000))
+
+    def _reconnect(self):
+        self._reconnect_stats.attempted()
+        self._connect_async(self._host, self._connect_timeout)
+
+    def _reconnected(self):
+        self._reconnect_stats.reconnected(time.perf_counter())
+        stream_request, self._resume_stream_request = self._resume_stream_request, None
+        self.reconnecting = False
+
+        # Replies arrive in order, so by the time this one does the requests made
+        # when connectedChanged was emitted, such as settings, have been served.
+        self.get_latest_event_async(
+            callback=lambda _: self._resume_stream(stream_request)
+        )
+
+    def _resume_stream(self, stream_request):
+        self._stale_settings = {}
+
+        if stream_request is not None and self._connected and not self._streaming:
+            args, frames, adaptive = stream_request
+            self.stream(*args, frames=frames, adaptive=adaptive)
+
+    def _cancel_reconnect(self):
+        if not self._reconnecting:
+            return
+
+        self._reconnect_timer.stop()
+        self._resume_stream_request = None
+        self._stale_settings = {}
+        self._reconnect_stats.ended(time.perf_counter())
+        self.reconnecting = False
+
+        if self._connecting:
+            self._connecting = False
+            self._connect_timer.stop()
+            self._socket.abort()
+
     def _get_connected(self):
         return self._connected
 
@@ -71,6 +355,39 @@ class QQtmRt(QtCore.QObject):
         bool, _get_connected, _set_connected, notify=connectedChanged
     )
 
+    def _get_auto_reconnect(self):
+        return self._auto_reconnect
+
+    def _set_auto_reconnect(self, auto_reconnect):
+        self._auto_reconnect = auto_reconnect
+
+        if not auto_reconnect:
+            self._cancel_reconnect()
+
+    # Reconnect with capped exponential backoff when the connection is lost, and
+    # resume streaming the same components once reconnected.
+    auto_reconnect = QtCore.Property(bool, _get_auto_reconnect, _set_auto_reconnect)
+
+    def _get_reconnecting(self):
+        return self._reconnecting
+
+    def _set_reconnecting(self, reconnecting):
+        if self._reconnecting == reconnecting:
+            return
+
+        self._reconnecting = reconnecting
+        self.reconnectingChanged.emit(reconnecting)
+
+    reconnecting = QtCore.Property(
+        bool, _get_reconnecting, _set_reconnecting, notify=reconnectingChanged
+    )
+
+    def _get_reconnect_stats(self):
+        return self._reconnect_stats
+
+    # qtm.reconnect.ReconnectStats with reconnect counts and downtime.
+    reconnect_stats = QtCore.Property(object, _get_reconnect_stats)
+
     def _get_streaming(self):
         return self._streaming
 
@@ -79,116 +396,465 @@ class QQtmRt(QtCore.QObject):
             return
 
         self._streaming = streaming
+
+        if not streaming:
+            self._rate_timer.stop()
+            self._adaptive_rate = None
+
         self.streamingChanged.emit(streaming)
 
     streaming = QtCore.Property(
         bool, _get_streaming, _set_streaming, notify=streamingChanged
     )
 
+    def _get_coalesce(self):
+        return self._receiver.coalesce
+
+    def _set_coalesce(self, coalesce):
+        self._receiver.coalesce = coalesce
+
+    # Only emit the newest frame of the data read at once, so a stalled main
+    # thread does not fall behind the stream. Events and errors are still emitted.
+    coalesce = QtCore.Property(bool, _get_coalesce, _set_coalesce)
+
+    def _get_threaded(self):
+        return self._threaded
+
+    def _set_threaded(self, threaded):
+        self._threaded = threaded
+
+    # Stream frames over a second connection read on a background thread, the main
+    # thread is only woken to emit the newest frame. Takes effect on the next stream.
+    threaded = QtCore.Property(bool, _get_threaded, _set_threaded)
+
+    def _get_udp(self):
+        return self._udp
+
+    def _set_udp(self, udp):
+        self._udp = udp
+
+    # Stream frames over UDP while commands stay on the connection, so a delayed
+    # packet does not hold back the frames after it. Frames arriving out of order
+    # are discarded. Takes effect on the next stream, instead of threaded.
+    udp = QtCore.Property(bool, _get_udp, _set_udp)
+
+    def _get_udp_stats(self):
+        return self._udp_receiver.stats
+
+    # qtm.LossStats of the last stream over UDP.
+    udp_stats = QtCore.Property(object, _get_udp_stats)
+
+    def _get_dropped_frames(self):
+        if self._stream_thread is not None:
+            return self._stream_thread.dropped_frames
+
+        return self._receiver.dropped_frames
+
+    dropped_frames = QtCore.Property(int, _get_dropped_frames)
+
+    def _get_latency(self):
+        return self._latency
+
+    # qtm.latency.LatencyMonitor of the current stream. Stages applying frames
+    # report to it, see QtmSession.
+    latency = QtCore.Property(object, _get_latency)
+
+    def _get_frames(self):
+        return self._frames
+
+    # The frames option of the current stream, changes while streaming adaptively.
+    frames = QtCore.Property(str, _get_frames, notify=framesChanged)
+
+    def _get_recording(self):
+        return self._take_writer is not None
+
+    recording = QtCore.Property(bool, _get_recording)
+
+    def start_recording(self, path):
+        """Records the data packets received from now on to a take file.
+
+        Packets are written as received, on a thread of their own. With coalesce
+        or threaded set only the frames that are applied are recorded.
+        """
+        self.stop_recording()
+
+        self._take_writer = TakeWriter(path)
+        self.packetReceived.connect(self._take_writer.write)
+
+    def stop_recording(self):
+        """Stops recording and writes the index of the take.
+
+        Returns the qtm.take.TakeWriter, or None if nothing was recorded.
+        """
+        writer, self._take_writer = self._take_writer, None
+
+        if writer is not None:
+            self.packetReceived.disconnect(writer.write)
+            writer.close()
+
+        return writer
+
     def _handshake(self):
-        response = self._wait_for_reply()
+        response = self._wait_for_reply(self._welcome_reply)
 
         if response is not None and response != 'QTM RT Interface connected':
             return False
 
-        self.requested_version = '1.24'
         version = self.set_version(version=self.requested_version)
 
         return version == 'Version set to {}'.format(self.requested_version)
 
-    def _wait_for_reply(self, event=False):
-        response = None
-        data = bytes()
-
-        if self._socket.waitForReadyRead():
-            while True:
-                data += self._socket.readAll().data()
-                size, type_ = QtmParser.parse_header(data)
-
-                while len(data) < size:
-                    self._socket.waitForReadyRead()
-                    data += self._socket.readAll().data()
+    def _wait_for_reply(self, reply, timeout=30000):
+        """ Blocks until the reply has arrived, returns the response or error """
+        while not reply.is_finished:
+            if not self._socket.waitForReadyRead(timeout):
+                break
 
-                response = QtmParser.parse_response(type_, data[RTheader.size : size])
-                data = data[size:]
+            self._data_received()
 
-                if type_ == QRTPacketType.PacketEvent:
-                    if event:
-                        return response
-                    else:
-                        self.eventReceived.emit(response)
-                else:
-                    return response
-
-        return response
+        return reply.response if reply.error is None else reply.error
 
     def _send_command(self, command, command_type=QRTPacketType.PacketCommand):
         command = QtmParser.create_command(command, command_type)
         self._socket.write(command)
 
-    def _streaming_changed(self, streaming):
-        if streaming:
-            self._socket.readyRead.connect(self._data_received)
-        else:
-            self._socket.readyRead.disconnect(self._data_received)
+    def send_command_async(self, command, callback=None, event=False):
+        """Sends a command without waiting for the reply.
 
-    def _delayed_stream_stop(self):
-        self.streaming = False
+        Replies are matched to commands in the order they were sent. Returns a
+        QtmReply, callback is connected to its finished signal. Set event if QTM
+        responds to the command with an event.
+        """
+        self._send_command(command)
 
-    def get_settings(self, *args):
-        if args is ():
-            args = ['all']
+        return self._queue_reply(command, event=event, callback=callback)
+
+    def _take_from_stream_thread(self):
+        thread = self._stream_thread
+
+        if thread is None:
+            return
+
+        packet, received, errors = thread.take()
+
+        for error in errors:
+            self.packetReceived.emit(error)
+
+        if packet is not None:
+            # Read on the stream thread, latency includes the wait for Maya.
+            self._receipt_time = received
+            self._on_data(packet)
+
+        if thread.no_more_data:
+            thread.no_more_data = False
+            self._on_no_data(b'')
+
+        if thread.closed:
+            self._stop_stream_thread()
+            self.streaming = False
+
+    def _stop_stream_thread(self):
+        if self._stream_thread is not None:
+            self._stream_thread.stop()
+            # Keep the count of the finished stream, the receiver is idle meanwhile.
+            self._receiver.dropped_frames = self._stream_thread.dropped_frames
+            self._stream_thread = None
+
+    def _open_udp_socket(self, frames):
+        udp_socket = QtNetwork.QUdpSocket(parent=self)
+
+        if not udp_socket.bind(self._socket.localAddress(), 0):
+            self.packetReceived.emit(
+                'Could not open UDP socket: {}'.format(udp_socket.errorString())
+            )
+            udp_socket.deleteLater()
+            return False
+
+        udp_socket.readyRead.connect(self._udp_data_received)
+        self._udp_socket = udp_socket
+        self._udp_receiver.reset()
+        self._udp_receiver.frame_step = frame_step(frames)
+
+        return True
+
+    def _close_udp_socket(self):
+        if self._udp_socket is not None:
+            self._udp_socket.close()
+            self._udp_socket.deleteLater()
+            self._udp_socket = None
+            del self._udp_packets[:]
+
+    def _udp_data_received(self):
+        self._receipt_time = time.perf_counter()
+        udp_socket = self._udp_socket
+
+        while udp_socket.hasPendingDatagrams():
+            self._udp_receiver.datagram_received(
+                udp_socket.receiveDatagram().data().data()
+            )
+
+        packets = list(self._udp_packets)
+        del self._udp_packets[:]
 
-        self._send_command('getparameters {}'.format(' '.join(args)))
+        if self.coalesce and packets:
+            # Counted with the receiver, which is idle for data meanwhile.
+            self._receiver.dropped_frames += len(packets) - 1
+            packets = packets[-1:]
 
-        xml_text = self._wait_for_reply()
-        options = lambda: None
-        options.pretty = False
-        json_text = xml2json.xml2json(xml_text, options)
-        settings = json.loads(json_text)
-        settings = settings.pop('QTM_Parameters_Ver_' + self.requested_version)
+        for packet in packets:
+            self._on_data(packet)
+
+    def _stream_command(self, frames):
+        if self._udp_socket is not None:
+            return 'streamframes {} UDP:{} {}'.format(
+                frames, self._udp_socket.localPort(), self._stream_components
+            )
+
+        return 'streamframes {} {}'.format(frames, self._stream_components)
+
+    def _stream_stopped(self, reply):
+        if self._stop_reply is not reply:
+            return
+
+        self._stop_reply = None
+
+        # Unless streaming was started again meanwhile.
+        if self._stream_request is None:
+            self.streaming = False
+
+    def clear_settings_cache(self):
+        self._settings_cache = {}
+        self._settings_xml = {}
+        self._stale_settings = {}
+
+    def _finished_settings(self):
+        return dict(
+            (components, (self._settings_xml[components], reply.response))
+            for components, reply in self._settings_cache.items()
+            if components in self._settings_xml
+        )
+
+    def _parse_settings(self, components, xml_text, stale):
+        self._settings_xml[components] = xml_text
+
+        # Unchanged across a reconnect, keep the objects the streamers already use.
+        if stale is not None and stale[0] == xml_text:
+            return stale[1]
+
+        return parse_settings(xml_text)
+
+    def _cached_settings_reply(self, components):
+        for cached_components, reply in self._settings_cache.items():
+            if components <= cached_components or 'all' in cached_components:
+                return reply
+
+        return None
+
+    def get_settings(self, *args):
+        return self._wait_for_reply(self.get_settings_async(*args))
+
+    def get_settings_async(self, *args, callback=None):
+        """Like get_settings, but returns a QtmReply finished with the settings.
+
+        The settings are a qtmsettings.Settings with the labels, bodies and
+        skeletons of the components that were fetched.
+
+        Settings are cached until QTM reports changed settings or the connection
+        is lost. Requests are served from any cached or pending request that
+        includes the requested components. After reconnecting, settings are
+        fetched again but the same objects are returned if they did not change.
+        """
+        components = frozenset(args) if args else frozenset(['all'])
+        reply = self._cached_settings_reply(components)
+
+        if reply is None:
+            if 'all' not in components:
+                components = components | frozenset(self.settings_components)
+            reply = QtmReply('getparameters')
+            stale = self._stale_settings.pop(components, None)
+
+            parameters_reply = self.get_parameters_async(*sorted(components))
+            parameters_reply.finished.connect(
+                lambda xml_text: reply._finish(
+                    self._parse_settings(components, xml_text, stale)
+                )
+            )
+            parameters_reply.failed.connect(reply._fail)
+            parameters_reply.failed.connect(
+                lambda _: self._settings_cache.pop(components, None)
+            )
+
+            self._settings_cache[components] = reply
+
+        if callback is not None:
+            if reply.is_finished:
+                if reply.error is None:
+                    callback(reply.response)
+            else:
+                reply.finished.connect(callback)
+
+        return reply
 
-        return settings
-            
     def get_parameters(self, *args):
+        return self._wait_for_reply(self.get_parameters_async(*args))
+
+    def get_parameters_async(self, *args, callback=None):
         if args is ():
             args = ['all']
 
-        self._send_command('getparameters {}'.format(' '.join(args)))
-
-        xml_text = self._wait_for_reply()
-        return xml_text
+        return self.send_command_async(
+            'getparameters {}'.format(' '.join(args)), callback=callback
+        )
 
     def get_latest_event(self):
-        self._send_command('getstate')
+        return self._wait_for_reply(self.get_latest_event_async())
 
-        return self._wait_for_reply(event=True)
+    def get_latest_event_async(self, callback=None):
+        return self.send_command_async('getstate', callback=callback, event=True)
 
     def set_version(self, version='1.21'):
-        self._send_command('version {}'.format(version))
+        return self._wait_for_reply(self.set_version_async(version))
 
-        return self._wait_for_reply()
+    def set_version_async(self, version='1.21', callback=None):
+        return self.send_command_async(
+            'version {}'.format(version), callback=callback
+        )
 
     def _data_received(self):
+        self._receipt_time = time.perf_counter()
         self._receiver.data_received(self._socket.readAll().data())
 
-    def stream(self, *args):
+    def stream(self, *args, frames=ALL_FRAMES, adaptive=False):
+        """Starts streaming the components in args, all components by default.
+
+        frames is 'allframes', 'frequency:n' or 'frequencydivisor:n', see
+        qtm.streamrate.frames_option. With adaptive, frames must be
+        'frequency:n' and the frequency is lowered while frames are not applied
+        fast enough, and raised back towards n when they are. Frames must then be
+        reported with frame_applied and frame_skipped.
+        """
         if args is ():
             args = ['all']
 
-        self._send_command('streamframes allframes {}'.format(' '.join(args)))
+        self._stream_request = (args, frames, adaptive)
+
+        adaptive_rate = None
+        if adaptive:
+            if not frames.startswith('frequency:'):
+                raise ValueError('Adaptive streaming needs frames="frequency:n"')
+            adaptive_rate = AdaptiveRate(target_frequency=int(frames.split(':')[1]))
+
+        self._stream_components = ' '.join(args)
+        self._frames = frames
+
+        self._stop_stream_thread()
+        self._close_udp_socket()
+
+        if self._udp and self._open_udp_socket(frames):
+            self._send_command(self._stream_command(frames))
+        elif self._threaded:
+            self._stream_thread = StreamThread(
+                self._host,
+                22223,
+                self.requested_version,
+                self._stream_components,
+                self._streamThreadWoken.emit,
+                frames=frames,
+            )
+            self._stream_thread.start()
+        else:
+            self._send_command(self._stream_command(frames))
 
+        self._receiver.dropped_frames = 0
+        self._skipped_frames = 0
+        self._latency.reset()
+        self._latency.frame_step = frame_step(frames)
         self.streaming = True
 
+        self._adaptive_rate = adaptive_rate
+        if adaptive_rate is not None:
+            adaptive_rate.reset(time.perf_counter(), self.dropped_frames)
+            self._rate_timer.start(1000)
+        else:
+            self._rate_timer.stop()
+
+    def _update_rate(self):
+        # A tick due while stopping must not send a new streamframes command.
+        if self._stream_request is None or self._stop_reply is not None:
+            return
+
+        frames = self._adaptive_rate.update(
+            time.perf_counter(), self.dropped_frames + self._skipped_frames
+        )
+
+        if frames is None:
+            return
+
+        self._frames = frames
+        self._latency.frame_step = frame_step(frames)
+
+        if self._stream_thread is not None:
+            self._stream_thread.set_frames(frames)
+        else:
+            self._udp_receiver.frame_step = frame_step(frames)
+            self._send_command('streamframes stop')
+            self._send_command(self._stream_command(frames))
+
+        self.framesChanged.emit(frames)
+
     def stop_stream(self):
+        self._stream_request = None
+        self._rate_timer.stop()
+
+        if self._stream_thread is not None:
+            # Closing the streaming connection stops it, no packets can follow.
+            self._stop_stream_thread()
+            self.streaming = False
+            return
+
+        if self._udp_socket is not None:
+            self._send_command('streamframes stop')
+            # Datagrams still on the way are not read once the socket is closed.
+            self._close_udp_socket()
+            self.streaming = False
+            return
+
+        # QTM does not reply to streamframes stop. Frames sent before it was handled
+        # arrive ahead of the reply to the next command, so they are dropped until
+        # that reply is in and the stream has stopped within one round-trip.
         self._send_command('streamframes stop')
-        # Hackish so that any packets already on the way will be delivered and parsed correctly.
-        QtCore.QTimer.singleShot(500, self._delayed_stream_stop)
+        reply = self.send_command_async('qtmversion')
+        reply.finished.connect(lambda _: self._stream_stopped(reply))
+        reply.failed.connect(lambda _: self._stream_stopped(reply))
+        self._stop_reply = reply
+
+    def connect_to_qtm_async(self, host='127.0.0.1', timeout=3000):
+        """Connects without blocking, connectFinished is emitted with the result.
+
+        Returns False if already connected or connecting.
+        """
+        if self._connected or self._connecting:
+            return False
+
+        self._cancel_reconnect()
+        self._connect_async(host, timeout)
+
+        return True
+
+    def _connect_async(self, host, timeout):
+        self._host = host
+        self._connect_timeout = timeout
+        self._connecting = True
+        self._connect_timer.start(timeout)
+        self._socket.connectToHost(host, 22223)
 
     def connect_to_qtm(self, host='127.0.0.1', timeout=3000):
-        if self._connected:
+        if self._connected or self._connecting:
             return False
 
+        self._cancel_reconnect()
+        self._host = host
+        self._connect_timeout = timeout
         self._socket.connectToHost(host, 22223)
 
         if self._socket.waitForConnected(timeout):
@@ -197,7 +863,10 @@ class QQtmRt(QtCore.QObject):
         return self.connected
 
     def disconnect(self):
+        self._cancel_reconnect()
+
         if not self._connected:
             return
 
+        self._disconnecting = True
         self._socket.disconnectFromHost()
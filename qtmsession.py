@@ -0,0 +1,76 @@
+import time
+
+from qtm.packet import QRTComponentType
+from qqtmrt import QQtmRt
+from markerstreamer import MarkerStreamer
+from skeletonstreamer import SkeletonStreamer
+from rigidbodystreamer import RigidBodyStreamer
+
+
+class QtmSession(object):
+    """A connection to one QTM server and the streamers driving its part of the scene.
+
+    The streamers create their nodes in namespace, so that several servers can
+    drive one scene side by side. The primary server uses no namespace. The
+    streamers list the markers, bodies and skeletons in the widgets given, the
+    additional servers have none.
+    """
+
+    def __init__(
+        self,
+        namespace,
+        markerList=None,
+        groupNameField=None,
+        skeletonList=None,
+        rigidBodyList=None,
+        host=None,
+    ):
+        self.namespace = namespace
+        self.host = host
+
+        self.qtm = QQtmRt()
+        self.qtm.settings_components = ['3d', '6d', 'skeleton']
+        self.skeleton_streamer = SkeletonStreamer(self.qtm, skeletonList, namespace)
+        self.marker_streamer = MarkerStreamer(
+            self.qtm, markerList, groupNameField, namespace
+        )
+        self.rigid_body_streamer = RigidBodyStreamer(self.qtm, rigidBodyList, namespace)
+
+        self._applied_packet = None
+
+    def create(self, skeletons=True, markers=True, rigid_bodies=True):
+        if skeletons:
+            self.skeleton_streamer.create()
+
+        if markers:
+            self.marker_streamer.create()
+
+        if rigid_bodies:
+            self.rigid_body_streamer.create()
+
+    def apply(self, packet):
+        # The same frame is picked again while this server has sent no newer one.
+        if packet is self._applied_packet:
+            return
+
+        self._applied_packet = packet
+        latency = self.qtm.latency
+
+        if QRTComponentType.Component3d in packet.components:
+            self.marker_streamer._packet_received(packet)
+            latency.applied(packet, 'markers', time.perf_counter())
+
+        if QRTComponentType.ComponentSkeleton in packet.components:
+            self.skeleton_streamer._packet_received(packet)
+            latency.applied(packet, 'skeletons', time.perf_counter())
+
+        if QRTComponentType.Component6d in packet.components:
+            self.rigid_body_streamer._packet_received(packet)
+            latency.applied(packet, 'rigid_bodies', time.perf_counter())
+
+        self.qtm.frame_applied(packet)
+
+    def skip(self, packet):
+        # Passed over for a newer frame, unless it was applied already.
+        if packet is not self._applied_packet:
+            self.qtm.frame_skipped(packet)
@@ -0,0 +1,298 @@
+""" Typed QTM settings, parsed straight from the XML returned by getparameters """
+
+import xml.etree.ElementTree as ET
+
+
+def _float_attributes(element, names):
+    if element is None:
+        return None
+    return tuple(float(element.get(name, 0.0)) for name in names)
+
+
+def _child_text(element, tag, default=None):
+    child = element.find(tag)
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+class Label(object):
+    """ A labeled trajectory in The_3D, index is its position in 3D data packets """
+
+    __slots__ = ("index", "name", "rgb_color")
+
+    def __init__(self, index, name, rgb_color):
+        self.index = index
+        self.name = name
+        self.rgb_color = rgb_color
+
+    @property
+    def rgb(self):
+        return (
+            (self.rgb_color >> 16) & 0xFF,
+            (self.rgb_color >> 8) & 0xFF,
+            self.rgb_color & 0xFF,
+        )
+
+
+class Point(object):
+    """ A point of a 6DOF body definition, in mm relative to the body """
+
+    __slots__ = ("name", "x", "y", "z", "virtual")
+
+    def __init__(self, name, x, y, z, virtual=False):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.z = z
+        self.virtual = virtual
+
+
+class Body(object):
+    """ A 6DOF body in The_6D, index is its position in 6D data packets """
+
+    __slots__ = ("index", "name", "points")
+
+    def __init__(self, index, name, points):
+        self.index = index
+        self.name = name
+        self.points = points
+
+
+class Segment(object):
+    """A skeleton segment.
+
+    position (x, y, z) in mm and rotation (x, y, z, w) are the default transform,
+    relative to the parent segment. Either is None if QTM did not send it.
+    """
+
+    __slots__ = ("id", "name", "parent_id", "position", "rotation", "children")
+
+    def __init__(self, id, name, parent_id, position, rotation, children):
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.position = position
+        self.rotation = rotation
+        self.children = children
+
+
+class Skeleton(object):
+    """ A skeleton, index is its position in skeleton data packets """
+
+    __slots__ = ("index", "name", "segments")
+
+    def __init__(self, index, name, segments):
+        self.index = index
+        self.name = name
+        self.segments = segments
+
+    def iter_segments(self):
+        """ All segments, depth first so that parents come before their children """
+        stack = list(reversed(self.segments))
+        while stack:
+            segment = stack.pop()
+            yield segment
+            stack.extend(reversed(segment.children))
+
+
+class Settings(object):
+    """Settings for the components the streamers use.
+
+    labels, bodies and skeletons are None when the corresponding section was not
+    requested or not sent by QTM.
+    """
+
+    __slots__ = ("labels", "bodies", "skeletons")
+
+    def __init__(self, labels=None, bodies=None, skeletons=None):
+        self.labels = labels
+        self.bodies = bodies
+        self.skeletons = skeletons
+
+
+def parse_labels(element):
+    labels = []
+    for index, label in enumerate(element.iter("Label")):
+        labels.append(
+            Label(
+                index,
+                _child_text(label, "Name", ""),
+                int(_child_text(label, "RGBColor", 0)),
+            )
+        )
+    return labels
+
+
+def parse_bodies(element):
+    bodies = []
+    for index, body in enumerate(element.iter("Body")):
+        points = []
+        for point in body.iter("Point"):
+            x, y, z = _float_attributes(point, ("X", "Y", "Z"))
+            points.append(
+                Point(point.get("Name", ""), x, y, z, point.get("Virtual") == "1")
+            )
+        bodies.append(Body(index, _child_text(body, "Name", ""), points))
+    return bodies
+
+
+def _parse_segment(element, parent_id):
+    segment_id = int(element.get("ID"))
+    transform = element.find("DefaultTransform")
+    if transform is None:
+        position = rotation = None
+    else:
+        position = _float_attributes(transform.find("Position"), ("X", "Y", "Z"))
+        rotation = _float_attributes(transform.find("Rotation"), ("X", "Y", "Z", "W"))
+
+    return Segment(
+        segment_id,
+        element.get("Name", ""),
+        parent_id,
+        position,
+        rotation,
+        [_parse_segment(child, segment_id) for child in element.findall("Segment")],
+    )
+
+
+def parse_skeletons(element):
+    skeletons = []
+    for index, skeleton in enumerate(element.iter("Skeleton")):
+        segments = skeleton.find("Segments")
+        skeletons.append(
+            Skeleton(
+                index,
+                skeleton.get("Name", ""),
+                []
+                if segments is None
+                else [_parse_segment(s, None) for s in segments.findall("Segment")],
+            )
+        )
+    return skeletons
+
+
+_SECTIONS = {
+    "The_3D": ("labels", parse_labels),
+    "The_6D": ("bodies", parse_bodies),
+    "Skeletons": ("skeletons", parse_skeletons),
+}
+
+
+SECTIONS = tuple(_SECTIONS)
+
+
+def parse_settings(xml_text, sections=None):
+    """Parse the XML of a getparameters reply into a :class:`Settings`.
+
+    Only the requested sections are built into objects, the rest of the reply,
+    such as camera settings, is skipped.
+
+    :param sections: Tags of the sections to read, by default all of
+        :data:`SECTIONS`.
+    """
+    sections = SECTIONS if sections is None else sections
+    unknown = set(sections) - set(_SECTIONS)
+    if unknown:
+        raise ValueError("Unknown settings sections: %s" % ", ".join(sorted(unknown)))
+
+    settings = Settings()
+
+    for element in ET.fromstring(xml_text):
+        if element.tag in sections:
+            name, parse = _SECTIONS[element.tag]
+            setattr(settings, name, parse(element))
+
+    return settings
+
+
+class SectionDiff(object):
+    """Differences between two versions of the labels, bodies or skeletons.
+
+    Items are matched by name, which is also the name of their Maya node. An
+    item that kept its index but got a new name is reported as renamed rather
+    than as removed and added. added and removed are lists of items, renamed and
+    changed lists of (old item, new item).
+
+    The streamers keep the items of their last create() and the nodes made for
+    them, across reconnects too, and diff the current settings against those
+    items so that create() only touches nodes whose item changed.
+    """
+
+    __slots__ = ("added", "removed", "renamed", "changed")
+
+    def __init__(self, added, removed, renamed, changed):
+        self.added = added
+        self.removed = removed
+        self.renamed = renamed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed or self.changed)
+
+    def is_changed(self, item):
+        """ True if item is in changed, compared by name """
+        return any(new.name == item.name for _, new in self.changed)
+
+
+def _label_values(label):
+    return label.rgb_color
+
+
+def _body_values(body):
+    return [(p.name, p.x, p.y, p.z, p.virtual) for p in body.points]
+
+
+def _skeleton_values(skeleton):
+    return [
+        (s.id, s.name, s.parent_id, s.position, s.rotation)
+        for s in skeleton.iter_segments()
+    ]
+
+
+def diff_items(old, new, values):
+    """Compare two lists of labels, bodies or skeletons, see :class:`SectionDiff`.
+
+    :param values: Function returning what to compare, besides the name, to
+        decide whether an item changed.
+    """
+    old = old or []
+    new = new or []
+    old_by_name = dict((item.name, item) for item in old)
+    new_names = set(item.name for item in new)
+
+    added, renamed, changed = [], [], []
+    kept = set()
+
+    for item in new:
+        previous = old_by_name.get(item.name)
+
+        if previous is None and item.index < len(old):
+            candidate = old[item.index]
+            if candidate.name not in new_names and candidate.name not in kept:
+                previous = candidate
+                renamed.append((previous, item))
+
+        if previous is None:
+            added.append(item)
+            continue
+
+        kept.add(previous.name)
+        if values(previous) != values(item):
+            changed.append((previous, item))
+
+    removed = [item for item in old if item.name not in kept]
+
+    return SectionDiff(added, removed, renamed, changed)
+
+
+def diff_labels(old, new):
+    return diff_items(old, new, _label_values)
+
+
+def diff_bodies(old, new):
+    return diff_items(old, new, _body_values)
+
+
+def diff_skeletons(old, new):
+    return diff_items(old, new, _skeleton_values)
@@ -9,15 +9,22 @@ from maya.api.OpenMaya import MMatrix, MTransformationMatrix
 
 from mayaui import load_icon
 from mayautil import MayaUtil
+from qtmsettings import diff_bodies
 
 
 class RigidBodyStreamer:
-    def __init__(self, qtmrt, listWidget):
+    def __init__(self, qtmrt, listWidget=None, namespace=""):
         self._qtm = qtmrt
+        # Maya namespace of the created nodes, to tell servers apart.
+        self._namespace = namespace
         self._listWidget = listWidget
         self._bodies = None
+        self._transformFns = None
+        self._qtm_settings = None
         self._unit_conversion = 0.1
         self._rigidBodiesGroupNode = None
+        self._created_bodies = None
+        self._body_nodes = {}
 
         self._qtm.connectedChanged.connect(self._connected_changed)
         self._connected_changed(self._qtm.connected)
@@ -26,11 +33,12 @@ class RigidBodyStreamer:
         self._up_axis = cmds.upAxis(q=True, axis=True)
 
         if connected:
-            self._init()
-            self._update_ui()
+            self._qtm.get_settings_async("6d", callback=self._settings_received)
         else:
             self._bodies = None
-            self._listWidget.clear()
+            self._transformFns = None
+            if self._listWidget is not None:
+                self._listWidget.clear()
 
     def _packet_received(self, packet):
         _, bodies = packet.get_6d()
@@ -38,11 +46,7 @@ class RigidBodyStreamer:
         for i, body in enumerate(bodies):
             (body_position, body_rotation) = body
             rot = body_rotation.matrix
-            transformFn = self._bodies[i]["transformFn"]
-
-            if self._up_axis == "y":
-                cmds.setAttr("RigidBodies.rotateX", 90)
-                cmds.setAttr("RigidBodies.rotateZ", 180)
+            transformFn = self._transformFns[i]
 
             translation = om.MVector(
                 body_position.x * self._unit_conversion,
@@ -73,25 +77,28 @@ class RigidBodyStreamer:
             transformFn.setTransformation(MTransformationMatrix(matrix))
             transformFn.setTranslation(translation, om.MSpace.kTransform)
 
-    def _init(self):
-        self._qtm_settings = self._qtm.get_settings("6d")
+    def _settings_received(self, settings):
+        self._qtm_settings = settings
+        self._init()
+        self._update_ui()
 
+    def _init(self):
         if self._qtm_settings == None:
             return
 
         self._bodies = []
-        if self._qtm_settings["The_6D"] == None:
+        self._transformFns = []
+        if self._qtm_settings.bodies is None:
             cmds.warning("RigidBodyStreamer._init() - No <The_6D> settings.")
             return
-        bodies = self._qtm_settings["The_6D"].get("Body", [])
-        if type(bodies) != type([]):
-            bodies = [bodies]
 
-        for i, body in enumerate(bodies):
-            body["Index"] = i
-            self._bodies.append(body)
+        self._bodies = self._qtm_settings.bodies
+        self._transformFns = [None] * len(self._bodies)
 
     def _update_ui(self):
+        if self._listWidget is None:
+            return
+
         self._listWidget.clear()
 
         for body in self._bodies:
@@ -99,61 +106,98 @@ class RigidBodyStreamer:
                 os.path.dirname(os.path.abspath(__file__)) + "/assets/rigidbody.svg",
                 QtGui.QColor(0x0, 0x0, 0x0),
             )
-            item = QtWidgets.QListWidgetItem(icon, body["Name"])
+            item = QtWidgets.QListWidgetItem(icon, body.name)
 
             self._listWidget.addItem(item)
 
 
 
     def create(self):
+        """Create transforms and point locators for the bodies.
+
+        Transforms from earlier calls are reused and renamed when their body was
+        renamed. Points are only recreated for new or changed bodies.
+        """
         if self._bodies == None:
             return
 
+        MayaUtil.ensure_namespace(self._namespace)
         modifier = om.MDagModifier()
-        self._rigidBodiesGroupNode = MayaUtil.get_node_by_name("RigidBodies")
+        diff = diff_bodies(self._created_bodies, self._bodies)
 
-        if self._rigidBodiesGroupNode is None:
-            self._rigidBodiesGroupNode = cmds.createNode("transform", name="RigidBodies")
-            #print(f"    Creating new RIgidBodies group node")
+        for old, new in diff.renamed:
+            transform = self._body_nodes.pop(old.name, None)
+
+            if transform is not None and transform.isValid():
+                modifier.renameNode(
+                    transform.object(), MayaUtil.namespaced(self._namespace, new.name)
+                )
+                self._body_nodes[new.name] = transform
 
+        for old in diff.removed:
+            self._body_nodes.pop(old.name, None)
+
+        modifier.doIt()
 
         for body in self._bodies:
-            parent = MayaUtil.get_node_by_name(body["Name"])
+            transform = self._body_nodes.get(body.name)
 
-            if parent is None:
-                parent = modifier.createNode("transform")
+            if transform is None or not transform.isValid():
+                transform = om.MObjectHandle(self._create_body(body, modifier))
+                self._body_nodes[body.name] = transform
+                self._create_points(body, transform.object(), modifier)
+            elif diff.is_changed(body):
+                self._create_points(body, transform.object(), modifier)
 
-                modifier.renameNode(parent, body["Name"])
-                modifier.doIt()
-                cmds.parent(body["Name"],self._rigidBodiesGroupNode) #parent is the child
+            self._transformFns[body.index] = om.MFnTransform(transform.object())
 
-            transformFn = om.MFnTransform(parent)
+        group = MayaUtil.get_node_by_name(
+            MayaUtil.namespaced(self._namespace, "RigidBodies")
+        )
+        if group is not None:
+            MayaUtil.orient_to_up_axis(group, self._up_axis)
 
-            Points = body["Points"]
-            for i, point in enumerate(Points["Point"]):
-                #point_name = point["Name"] + "_" + str(i)
-                point_name = point["@Name"]
-                locator = MayaUtil.get_node_by_name(point_name)
+        self._created_bodies = list(self._bodies)
 
-                if locator is None:
-                    locator = modifier.createNode("locator")
+    def _create_body(self, body, modifier):
+        body_name = MayaUtil.namespaced(self._namespace, body.name)
+        parent = MayaUtil.get_node_by_name(body_name)
 
-                    modifier.renameNode(locator, point_name)
+        if parent is None:
+            group_name = MayaUtil.namespaced(self._namespace, "RigidBodies")
+            self._rigidBodiesGroupNode = MayaUtil.get_node_by_name(group_name)
 
-                modifier.reparentNode(locator, parent)
-                modifier.doIt()
+            if self._rigidBodiesGroupNode is None:
+                self._rigidBodiesGroupNode = cmds.createNode("transform", name=group_name)
+                #print(f"    Creating new RIgidBodies group node")
 
-                pointTransformFn = om.MFnTransform(locator)
-                translation = None
+            parent = modifier.createNode("transform")
 
+            modifier.renameNode(parent, body_name)
+            modifier.doIt()
+            cmds.parent(body_name,self._rigidBodiesGroupNode) #parent is the child
 
-                translation = om.MVector(
-                    float(point["@X"]) * self._unit_conversion,
-                    float(point["@Y"]) * self._unit_conversion,
-                    float(point["@Z"]) * self._unit_conversion,
-                )
+        return parent
+
+    def _create_points(self, body, parent, modifier):
+        for i, point in enumerate(body.points):
+            #point_name = point.name + "_" + str(i)
+            point_name = MayaUtil.namespaced(self._namespace, point.name)
+            locator = MayaUtil.get_node_by_name(point_name)
+
+            if locator is None:
+                locator = modifier.createNode("locator")
 
-                pointTransformFn.setTranslation(translation, om.MSpace.kTransform)
-            self._bodies[body["Index"]].update(
-                {"transform": parent, "transformFn": transformFn}
+                modifier.renameNode(locator, point_name)
+
+            modifier.reparentNode(locator, parent)
+            modifier.doIt()
+
+            pointTransformFn = om.MFnTransform(locator)
+            translation = om.MVector(
+                point.x * self._unit_conversion,
+                point.y * self._unit_conversion,
+                point.z * self._unit_conversion,
             )
+
+            pointTransformFn.setTranslation(translation, om.MSpace.kTransform)
@@ -1,4 +1,5 @@
 import os
+import struct
 
 from PySide2 import QtWidgets
 from PySide2 import QtGui
@@ -8,11 +9,18 @@ import maya.api.OpenMaya as om
 
 from mayaui import load_icon
 from mayautil import MayaUtil
+from qtmsettings import diff_skeletons
+from qtm.packet import QRTComponentType, RTComponentData
+from qtm.packet import RTSkeletonComponent, RTSegmentCount, RTSegmentId
+
+_SEGMENT_SIZE = struct.calcsize("<i7f")
 
 
 class SkeletonStreamer:
-    def __init__(self, qtmrt, listWidget):
+    def __init__(self, qtmrt, listWidget=None, namespace=""):
         self._qtm = qtmrt
+        # Maya namespace the skeleton namespaces are nested in, to tell servers apart.
+        self._namespace = namespace
         self._qtm_settings = None
         self._listWidget = listWidget
         self._unit_conversion = 0.1
@@ -21,6 +29,13 @@ class SkeletonStreamer:
         self._skeletons = []
         self._modifier = None
         self._skeletonsGroupNode = None
+        self._created_skeletons = None
+        self._skeleton_segments = {}
+        # (component size, struct, [(transformFn, index)]) for unpacking the
+        # skeleton component in one go, see _packet_layout.
+        self._layout = None
+        self._translation = om.MVector()
+        self._rotation = om.MQuaternion()
 
         self._qtm.connectedChanged.connect(self._connected_changed)
         self._connected_changed(self._qtm.connected)
@@ -29,59 +44,90 @@ class SkeletonStreamer:
         self._up_axis = cmds.upAxis(q=True, axis=True)
 
         if connected:
-            self._update_ui()
+            self._qtm.get_settings_async("skeleton", callback=self._settings_received)
         else:
             self._skeletons = []
-            self._listWidget.clear()
+            if self._listWidget is not None:
+                self._listWidget.clear()
 
     def _packet_received(self, packet):
-        _, skeletons = packet.get_skeletons()
-
-        toYQ = om.MQuaternion(0.707107,0,0, -0.707107)
-        toYM = om.MTransformationMatrix()
-        toYM.rotateBy(toYQ,om.MSpace.kPreTransform)
-        if self._up_axis == "y" and self._skeletonsGroupNode:
-            cmds.setAttr("Skeletons.rotateX", 90)
-            cmds.setAttr("Skeletons.rotateZ", 180)
-
-        for skeleton_index, skeleton in enumerate(skeletons):
-    
-            for segment_id, segment_position, segment_rotation in skeleton:
-                
-                translation = om.MVector(
-                    segment_position.x * self._unit_conversion,
-                    segment_position.y * self._unit_conversion,
-                    segment_position.z * self._unit_conversion,
-                )
-
-                rotation = om.MQuaternion(
-                    segment_rotation.x,
-                    segment_rotation.y,
-                    segment_rotation.z,
-                    segment_rotation.w,
-                )
-
-                transformFn = self._segments[skeleton_index][segment_id]["transformFn"]
-                transformFn.setTranslation(translation, om.MSpace.kTransform)
-                transformFn.setRotation(
-                    rotation.asEulerRotation(), om.MSpace.kTransform
-                )
+        position = packet.components[QRTComponentType.ComponentSkeleton]
+        size = RTComponentData.unpack_from(packet.data, position - RTComponentData.size)[0]
+
+        layout = self._layout
+        if layout is None or layout[0] != size:
+            layout = self._layout = self._packet_layout(packet.data, position, size)
+
+        _, layout_struct, writes = layout
+        values = layout_struct.unpack_from(packet.data, position)
+        translation = self._translation
+        rotation = self._rotation
+        scale = self._unit_conversion
+        space = om.MSpace.kTransform
+
+        for transformFn, i in writes:
+            translation.x = values[i] * scale
+            translation.y = values[i + 1] * scale
+            translation.z = values[i + 2] * scale
+            rotation.x = values[i + 3]
+            rotation.y = values[i + 4]
+            rotation.z = values[i + 5]
+            rotation.w = values[i + 6]
+
+            transformFn.setTranslation(translation, space)
+            transformFn.setRotation(rotation, space)
+
+    def _packet_layout(self, data, position, size):
+        """Struct unpacking a skeleton component of size bytes at once.
+
+        Also returns where the position of each created segment is among the
+        unpacked values, followed by its rotation. The layout only changes with
+        the settings, which create() is called again for.
+        """
+        skeleton_count = RTSkeletonComponent.format.unpack_from(data, position)[0]
+        offset = RTSkeletonComponent.format.size
+        layout = ["<i"]
+        writes = []
+        index = 1
+
+        for skeleton_index in range(skeleton_count):
+            segment_count = RTSegmentCount.format.unpack_from(data, position + offset)[0]
+            segments = (
+                self._segments[skeleton_index]
+                if skeleton_index < len(self._segments)
+                else {}
+            )
+            # Count, then id, position and rotation of each segment.
+            layout.append("i" + "i7f" * segment_count)
+            offset += RTSegmentCount.format.size
+            index += 1
+
+            for _ in range(segment_count):
+                segment_id = RTSegmentId.format.unpack_from(data, position + offset)[0]
+                segment = segments.get(segment_id)
+
+                if segment is not None:
+                    writes.append((segment["transformFn"], index + 1))
+
+                offset += _SEGMENT_SIZE
+                index += 8
+
+        return size, struct.Struct("".join(layout)), writes
+
+    def _settings_received(self, settings):
+        self._qtm_settings = settings
+        self._update_ui()
 
     def _update_ui(self):
-        self._listWidget.clear()
+        if self._listWidget is None:
+            return
 
-        if self._qtm.connected:
-            self._qtm_settings = self._qtm.get_settings("skeleton")
+        self._listWidget.clear()
 
-        if (
-            self._qtm_settings is None
-            or self._qtm_settings.get("Skeletons", None) is None
-        ):
+        if self._qtm_settings is None or self._qtm_settings.skeletons is None:
             return
 
-        self._skeletons = self._qtm_settings["Skeletons"].get("Skeleton", [])
-        if type(self._skeletons) != type([]):
-            self._skeletons = [self._skeletons]
+        self._skeletons = self._qtm_settings.skeletons
 
         for skeleton in self._skeletons:
             color = QtGui.QColor(255, 0, 0)
@@ -90,32 +136,29 @@ class SkeletonStreamer:
                 + "/assets/skeleton_64x64.png",
                 color,
             )
-            item = QtWidgets.QListWidgetItem(icon, skeleton["@Name"])
+            item = QtWidgets.QListWidgetItem(icon, skeleton.name)
 
             self._listWidget.addItem(item)
 
     def _assume_t_pose(self, skeleton_index, segment):
-        transformFn = self._segments[skeleton_index][int(segment["@ID"])]["transformFn"]
+        transformFn = self._segments[skeleton_index][segment.id]["transformFn"]
 
+        if segment.position is None or segment.rotation is None:
+            return
 
         translation = om.MVector(
-            float(segment["DefaultTransform"]["Position"]["@X"]) * self._unit_conversion,
-            float(segment["DefaultTransform"]["Position"]["@Y"]) * self._unit_conversion,
-            float(segment["DefaultTransform"]["Position"]["@Z"]) * self._unit_conversion,
-        )
-        rotation = om.MQuaternion(
-            float(segment["DefaultTransform"]["Rotation"]["@X"]),
-            float(segment["DefaultTransform"]["Rotation"]["@Y"]),
-            float(segment["DefaultTransform"]["Rotation"]["@Z"]),
-            float(segment["DefaultTransform"]["Rotation"]["@W"]),
+            segment.position[0] * self._unit_conversion,
+            segment.position[1] * self._unit_conversion,
+            segment.position[2] * self._unit_conversion,
         )
+        rotation = om.MQuaternion(*segment.rotation)
 
         transformFn.setTranslation(translation, om.MSpace.kTransform)
         transformFn.setRotation(rotation.asEulerRotation(), om.MSpace.kTransform)
 
     def _save_pose(self, skeleton_index, segment):
-        transformFn = self._segments[skeleton_index][int(segment["@ID"])]["transformFn"]
-        segment_id = int(segment["@ID"])
+        transformFn = self._segments[skeleton_index][segment.id]["transformFn"]
+        segment_id = segment.id
 
         if skeleton_index not in self._saved_poses:
             self._saved_poses[skeleton_index] = {}
@@ -126,42 +169,98 @@ class SkeletonStreamer:
         }
 
     def create(self):
+        """Create joints for the skeletons, rebuilding only what changed.
+
+        Skeletons whose definition is unchanged keep the joints from earlier
+        calls, renamed skeletons get their namespace renamed.
+        """
         self._segments = []
+        self._layout = None
 
         if self._modifier is None:
             self._modifier = om.MDagModifier()
 
-        if self._qtm_settings is None and self._qtm.connected:
-            self._qtm_settings = self._qtm.get_settings("skeleton")
-
         if (
             self._qtm_settings is not None
-            and self._qtm_settings.get("Skeletons", None) is not None
+            and self._qtm_settings.skeletons is not None
         ):
-            self._skeletons = self._qtm_settings["Skeletons"].get("Skeleton", [])
+            MayaUtil.ensure_namespace(self._namespace)
+            diff = diff_skeletons(self._created_skeletons, self._qtm_settings.skeletons)
+            self._skeletons = self._qtm_settings.skeletons
 
-            if type(self._skeletons) != type([]):
-                self._skeletons = [self._skeletons]
+            for old, new in diff.renamed:
+                segments = self._skeleton_segments.pop(old.name, None)
 
-        
-            self._skeletonsGroupNode = MayaUtil.get_node_by_name("Skeletons")
+                if (
+                    segments is not None
+                    and cmds.namespace(exists=self._skeleton_namespace(old.name))
+                    and not cmds.namespace(exists=self._skeleton_namespace(new.name))
+                ):
+                    cmds.namespace(
+                        rename=(self._skeleton_namespace(old.name), new.name),
+                        parent=":" + self._namespace,
+                    )
+                    self._skeleton_segments[new.name] = segments
 
-            if self._skeletonsGroupNode is None:
-                self._skeletonsGroupNode = cmds.createNode("transform", name="Skeletons")
-                #print(f"    Creating new Skeltons group node")
+            for old in diff.removed:
+                self._skeleton_segments.pop(old.name, None)
 
+            rebuilt = []
 
             for skeleton_index, skeleton in enumerate(self._skeletons):
-                if not cmds.namespace( exists=skeleton["@Name"] ):
-                    cmds.namespace( add=skeleton["@Name"] )
+                segments = self._skeleton_segments.get(skeleton.name)
+
+                if (
+                    segments is not None
+                    and not diff.is_changed(skeleton)
+                    and all(s["handle"].isValid() for s in segments.values())
+                ):
+                    self._segments.append(segments)
+                    continue
+
+                if not rebuilt:
+                    group_name = MayaUtil.namespaced(self._namespace, "Skeletons")
+                    self._skeletonsGroupNode = MayaUtil.get_node_by_name(group_name)
+
+                    if self._skeletonsGroupNode is None:
+                        self._skeletonsGroupNode = cmds.createNode("transform", name=group_name)
+                        #print(f"    Creating new Skeltons group node")
+
+                if not cmds.namespace( exists=self._skeleton_namespace(skeleton.name) ):
+                    cmds.namespace( add=skeleton.name, parent=":" + self._namespace )
                 self._segments.append({})
 
-                self.add_segment(skeleton_index, skeleton["Segments"]["Segment"], None)
+                for segment in skeleton.segments:
+                    self.add_segment(skeleton_index, segment, None)
+
+                rebuilt.append(skeleton_index)
 
             self._modifier.doIt()
 
+            for skeleton_index in rebuilt:
+                segments = self._segments[skeleton_index]
+                for segment in segments.values():
+                    segment["handle"] = om.MObjectHandle(segment["MObject"])
+
+                self._skeleton_segments[self._skeletons[skeleton_index].name] = segments
+
+            group = MayaUtil.get_node_by_name(
+                MayaUtil.namespaced(self._namespace, "Skeletons")
+            )
+            if group is not None:
+                MayaUtil.orient_to_up_axis(group, self._up_axis)
+
+            self._created_skeletons = list(self._skeletons)
+
+    def _skeleton_namespace(self, skeleton_name):
+        return ":" + MayaUtil.namespaced(self._namespace, skeleton_name)
+
     def add_segment(self, skeleton_index, segment, parent_id):
-        segment_name = self._skeletons[skeleton_index]["@Name"] + ":" + segment["@Name"]
+        segment_name = (
+            MayaUtil.namespaced(self._namespace, self._skeletons[skeleton_index].name)
+            + ":"
+            + segment.name
+        )
         create = True
         j = MayaUtil.get_node_by_name(segment_name)
 
@@ -174,13 +273,15 @@ class SkeletonStreamer:
 
         transformFn = om.MFnTransform(j)
 
-        self._segments[skeleton_index][int(segment["@ID"])] = segment
-        self._segments[skeleton_index][int(segment["@ID"])]["MObject"] = j
-        self._segments[skeleton_index][int(segment["@ID"])]["transformFn"] = transformFn
+        self._segments[skeleton_index][segment.id] = {
+            "segment": segment,
+            "MObject": j,
+            "transformFn": transformFn,
+        }
 
         if parent_id is not None:
             self._modifier.reparentNode(
-                j, self._segments[skeleton_index][int(parent_id)]["MObject"]
+                j, self._segments[skeleton_index][parent_id]["MObject"]
             )
         elif create:
             self._modifier.doIt()
@@ -190,25 +291,21 @@ class SkeletonStreamer:
             self._assume_t_pose(skeleton_index, segment)
 
         # Add child segments.
-        if "Segment" in segment:
-            if type(segment["Segment"]) is list:
-                for s in segment["Segment"]:
-                    self.add_segment(skeleton_index, s, segment["@ID"])
-            else:
-                self.add_segment(skeleton_index, segment["Segment"], segment["@ID"])
+        for child in segment.children:
+            self.add_segment(skeleton_index, child, segment.id)
 
     def t_pose(self, skeleton_name):
         for skeleton_index, skeleton_definition in enumerate(self._skeletons):
-            if skeleton_definition["@Name"] == skeleton_name:
+            if skeleton_definition.name == skeleton_name:
                 for segment_id, segment in self._segments[skeleton_index].items():
-                    self._save_pose(skeleton_index, segment)
-                    self._assume_t_pose(skeleton_index, segment)
+                    self._save_pose(skeleton_index, segment["segment"])
+                    self._assume_t_pose(skeleton_index, segment["segment"])
 
                 self._in_t_pose.append(skeleton_name)
 
     def resume_pose(self, skeleton_name):
         for skeleton_index, skeleton_definition in enumerate(self._skeletons):
-            if skeleton_definition["@Name"] == skeleton_name:
+            if skeleton_definition.name == skeleton_name:
                 for segment_id, segment in self._segments[skeleton_index].items():
                     if skeleton_index in self._saved_poses and int(segment_id) in self._saved_poses[skeleton_index]:
                         transformFn = self._segments[skeleton_index][int(segment_id)]["transformFn"]
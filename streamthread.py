@@ -0,0 +1,181 @@
+import collections
+import socket
+import threading
+import time
+
+import qtm
+from qtm.packet import QRTPacketType
+from qtmparser import QtmParser
+
+
+class StreamThread(threading.Thread):
+    """Streams frames from QTM over a separate connection on a background thread.
+
+    Socket reads and packet parsing happen on this thread. Only the newest frame is
+    kept, older ones are counted in dropped_frames. on_wake is called from this
+    thread when something is waiting to be taken and should only wake the
+    consumer, which then calls take() from its own thread.
+
+    Events are not forwarded, they still arrive on the command connection.
+    """
+
+    def __init__(
+        self, host, port, version, components, on_wake, timeout=3.0, frames='allframes'
+    ):
+        super(StreamThread, self).__init__(name='QtmStreamThread')
+        self.daemon = True
+
+        self._host = host
+        self._port = port
+        self._version = version
+        self._components = components
+        self._on_wake = on_wake
+        self._timeout = timeout
+        self._frames_option = frames
+        self._send_lock = threading.RLock()
+        self._stream_requested = False
+
+        self._socket = None
+        self._stopping = threading.Event()
+        self._frames = collections.deque(maxlen=1)
+        self._errors = collections.deque()
+        self._wake_pending = False
+        self._replaced_frames = 0
+        # When the data being parsed was read from the socket.
+        self._receipt_time = 0.0
+
+        self.no_more_data = False
+        self.closed = False
+
+        self._receiver = qtm.Receiver(
+            {
+                QRTPacketType.PacketData: self._on_data,
+                QRTPacketType.PacketError: self._on_error,
+                QRTPacketType.PacketCommand: self._on_command,
+                QRTPacketType.PacketNoMoreData: self._on_no_data,
+                QRTPacketType.PacketEvent: self._on_event,
+            },
+            coalesce=True,
+        )
+
+    def run(self):
+        try:
+            self._socket = socket.create_connection(
+                (self._host, self._port), self._timeout
+            )
+            self._socket.settimeout(None)
+
+            if self._stopping.is_set():
+                return
+
+            with self._send_lock:
+                self._send_command('version {}'.format(self._version))
+                self._send_stream_command()
+                self._stream_requested = True
+
+            while not self._stopping.is_set():
+                data = self._socket.recv(65536)
+
+                if not data:
+                    break
+
+                self._receipt_time = time.perf_counter()
+                self._receiver.data_received(data)
+        except (OSError, ValueError) as e:
+            if not self._stopping.is_set():
+                self._errors.append(str(e))
+        finally:
+            if self._socket is not None:
+                self._socket.close()
+
+            self.closed = True
+            self._wake()
+
+    @property
+    def dropped_frames(self):
+        """ Frames skipped by the receiver or replaced before they were taken """
+        return self._replaced_frames + self._receiver.dropped_frames
+
+    def stop(self, timeout=1.0):
+        """Stops streaming and closes the connection, callable from any thread.
+
+        Waits up to timeout seconds for the thread to finish, so that it is not
+        still handing over frames when the next stream starts.
+        """
+        self._stopping.set()
+
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def set_frames(self, frames):
+        """ Requests another frames option, callable from any thread """
+        with self._send_lock:
+            self._frames_option = frames
+
+            if self._stream_requested and not self._stopping.is_set():
+                try:
+                    self._send_command('streamframes stop')
+                    self._send_stream_command()
+                except OSError:
+                    pass  # The connection failed, run() reports it.
+
+    def take(self):
+        """Takes the newest frame and all errors received since the last call.
+
+        Returns a tuple (packet or None, time.perf_counter() when its data was
+        read from the socket, list of error strings).
+        """
+        # Cleared before taking so that anything queued after this wakes again.
+        self._wake_pending = False
+
+        try:
+            packet, received = self._frames.popleft()
+        except IndexError:
+            packet, received = None, None
+
+        errors = []
+        while self._errors:
+            errors.append(self._errors.popleft())
+
+        return packet, received, errors
+
+    def _send_stream_command(self):
+        self._send_command('streamframes {} {}'.format(self._frames_option, self._components))
+
+    def _send_command(self, command):
+        with self._send_lock:
+            self._socket.sendall(
+                QtmParser.create_command(command, QRTPacketType.PacketCommand)
+            )
+
+    def _wake(self):
+        if not self._wake_pending:
+            self._wake_pending = True
+            self._on_wake()
+
+    def _on_data(self, packet):
+        if self._frames:
+            self._replaced_frames += 1
+
+        self._frames.append((packet, self._receipt_time))
+        self._wake()
+
+    def _on_error(self, response):
+        self._errors.append(response.decode('utf-8'))
+        self._wake()
+
+    def _on_no_data(self, _):
+        self.no_more_data = True
+        self._wake()
+
+    def _on_command(self, response):
+        pass
+
+    def _on_event(self, event):
+        pass
@@ -0,0 +1,21 @@
+"""
+    Fixtures for the tests of the Maya plugin modules
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(ROOT + "/modules")
+sys.path.append(ROOT + "/modules/qualisys_python_sdk")
+
+# pylint: disable=W0621, C0111
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    QtCore = pytest.importorskip("Qt.QtCore")
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
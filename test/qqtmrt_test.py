@@ -0,0 +1,105 @@
+"""
+    Tests for QQtmRt
+"""
+
+import pytest
+
+pytest.importorskip("Qt")
+
+import qqtmrt
+from qqtmrt import QQtmRt
+from applyscheduler import ApplyScheduler
+from qtm.packet import QRTPacket, RTDataQRTPacket
+
+# pylint: disable=W0621, C0111, C0413
+
+
+@pytest.fixture
+def qtm(qt_app):
+    qtm = QQtmRt()
+    qtm.commands = []
+    qtm._send_command = qtm.commands.append
+    return qtm
+
+
+def test_rate_timer_stopped_with_stream(qtm):
+    qtm.stream("3d", frames="frequency:60", adaptive=True)
+    assert qtm._rate_timer.isActive()
+
+    qtm.stop_stream()
+
+    assert not qtm._rate_timer.isActive()
+
+
+def test_rate_update_after_stop_does_not_restart_stream(qtm):
+    qtm.stream("3d", frames="frequency:60", adaptive=True)
+    qtm._adaptive_rate.update = lambda now, dropped_frames: "frequency:30"
+    qtm.stop_stream()
+    del qtm.commands[:]
+
+    # A tick that was already due when stopping.
+    qtm._update_rate()
+
+    assert qtm.commands == []
+    assert qtm.frames == "frequency:60"
+
+
+def test_adaptive_rate_backs_off_when_applies_fall_behind(qtm, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(qqtmrt.time, "perf_counter", lambda: clock[0])
+
+    scheduler = ApplyScheduler(
+        qtm.frame_applied, skip=lambda packet, _: qtm.frame_skipped(packet)
+    )
+    qtm.packetReceived.connect(scheduler.frame_received)
+    qtm.stream("3d", frames="frequency:60", adaptive=True)
+
+    for framenumber in range(1, 61):
+        clock[0] += 1 / 60.0
+        qtm._on_data(
+            QRTPacket(RTDataQRTPacket.pack(int(clock[0] * 1e6), framenumber, 0))
+        )
+        # The scene only gets to every third frame.
+        if framenumber % 3 == 0:
+            scheduler.flush()
+
+    qtm._update_rate()
+
+    assert scheduler.skipped_frames == 40
+    assert int(qtm.frames.split(":")[1]) < 20
+    assert qtm.commands[-1] == "streamframes {} 3d".format(qtm.frames)
+
+
+def test_threaded_latency_measured_from_socket_read(qtm, monkeypatch):
+    class StreamThread(object):
+        no_more_data = False
+        closed = False
+
+        def take(self):
+            packet = QRTPacket(RTDataQRTPacket.pack(1000, 1, 0))
+            return packet, 5.0, []
+
+    monkeypatch.setattr(qqtmrt.time, "perf_counter", lambda: 5.02)
+    qtm._stream_thread = StreamThread()
+
+    qtm._take_from_stream_thread()
+
+    assert qtm.latency.stats()["parse"].max == pytest.approx(0.02)
+
+
+def test_settings_for_all_components_fetched_alone(qtm):
+    qtm.settings_components = ["3d", "6d", "skeleton"]
+
+    qtm.get_settings_async()
+    qtm.get_settings_async("3d")
+
+    assert qtm.commands == ["getparameters all"]
+    assert list(qtm._settings_cache) == [frozenset(["all"])]
+
+
+def test_settings_components_fetched_together(qtm):
+    qtm.settings_components = ["3d", "6d"]
+
+    qtm.get_settings_async("skeleton")
+
+    assert qtm.commands == ["getparameters 3d 6d skeleton"]
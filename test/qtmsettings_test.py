@@ -0,0 +1,356 @@
+"""
+    Tests for qtmsettings
+"""
+
+import pytest
+
+from qtmsettings import parse_settings, SECTIONS
+from qtmsettings import Label, Point, Body, Segment, Skeleton
+from qtmsettings import diff_labels, diff_bodies, diff_skeletons
+
+# pylint: disable=W0621, C0111, C0330
+
+
+LABELS = (
+    "<The_3D><AxisUpwards>+Z</AxisUpwards><Labels>2</Labels>"
+    "<Label><Name>LeftHand</Name><RGBColor>16711680</RGBColor></Label>"
+    "<Label><Name>RightHand</Name><RGBColor>255</RGBColor></Label>"
+    "</The_3D>"
+)
+
+BODIES = (
+    "<The_6D><Bodies>1</Bodies>"
+    "<Body><Name>Wand</Name><Points>"
+    '<Point X="1.5" Y="-2" Z="0" Virtual="0" PhysicalId="1" Name="tip"/>'
+    '<Point X="0" Y="100" Z="3.25" Virtual="1" PhysicalId="0" Name="grip"/>'
+    "</Points></Body>"
+    "</The_6D>"
+)
+
+SKELETONS = (
+    "<Skeletons>"
+    '<Skeleton Name="Actor"><Segments>'
+    '<Segment Name="Hips" ID="1">'
+    '<DefaultTransform><Position X="0" Y="0" Z="1000"/>'
+    '<Rotation X="0" Y="0" Z="0" W="1"/></DefaultTransform>'
+    '<Segment Name="Spine" ID="2">'
+    '<DefaultTransform><Position X="0" Y="0" Z="100"/>'
+    '<Rotation X="0" Y="0" Z="0.7071" W="0.7071"/></DefaultTransform>'
+    "</Segment>"
+    "</Segment>"
+    "</Segments></Skeleton>"
+    "</Skeletons>"
+)
+
+CAMERAS = (
+    "<General><Frequency>100</Frequency>"
+    "<Camera><ID>1</ID><Model>Miqus M3</Model></Camera>"
+    "</General>"
+)
+
+
+def parameters(*sections):
+    return "<QTM_Parameters_Ver_1.24>%s</QTM_Parameters_Ver_1.24>" % "".join(sections)
+
+
+ALL = parameters(CAMERAS, LABELS, BODIES, SKELETONS)
+
+
+def test_all_sections_by_default():
+    settings = parse_settings(ALL)
+
+    assert SECTIONS == ("The_3D", "The_6D", "Skeletons")
+    assert [label.name for label in settings.labels] == ["LeftHand", "RightHand"]
+    assert [body.name for body in settings.bodies] == ["Wand"]
+    assert [skeleton.name for skeleton in settings.skeletons] == ["Actor"]
+
+
+def test_only_requested_sections():
+    settings = parse_settings(ALL, sections=("The_6D",))
+
+    assert settings.labels is None
+    assert [body.name for body in settings.bodies] == ["Wand"]
+    assert settings.skeletons is None
+
+
+def test_section_not_sent():
+    settings = parse_settings(parameters(CAMERAS, LABELS))
+
+    assert len(settings.labels) == 2
+    assert settings.bodies is None
+    assert settings.skeletons is None
+
+
+def test_unknown_section():
+    with pytest.raises(ValueError):
+        parse_settings(ALL, sections=("The_3D", "General"))
+
+
+def test_labels():
+    labels = parse_settings(ALL).labels
+
+    assert [(label.index, label.name, label.rgb) for label in labels] == [
+        (0, "LeftHand", (255, 0, 0)),
+        (1, "RightHand", (0, 0, 255)),
+    ]
+
+
+def test_single_label():
+    labels = parse_settings(
+        parameters(
+            "<The_3D><Label><Name>Head</Name><RGBColor>0</RGBColor></Label></The_3D>"
+        )
+    ).labels
+
+    assert [(label.index, label.name) for label in labels] == [(0, "Head")]
+
+
+def test_no_labels():
+    assert (
+        parse_settings(parameters("<The_3D><Labels>0</Labels></The_3D>")).labels == []
+    )
+
+
+def test_bodies():
+    body = parse_settings(ALL).bodies[0]
+
+    assert (body.index, body.name) == (0, "Wand")
+    assert [(p.name, p.x, p.y, p.z, p.virtual) for p in body.points] == [
+        ("tip", 1.5, -2.0, 0.0, False),
+        ("grip", 0.0, 100.0, 3.25, True),
+    ]
+
+
+def test_several_bodies_without_points():
+    bodies = parse_settings(
+        parameters(
+            "<The_6D><Body><Name>A</Name></Body>"
+            '<Body><Name>B</Name><Points><Point X="1" Y="2" Z="3"/></Points></Body>'
+            "</The_6D>"
+        )
+    ).bodies
+
+    assert [(body.index, body.name) for body in bodies] == [(0, "A"), (1, "B")]
+    assert bodies[0].points == []
+    assert [(p.name, p.x, p.y, p.z) for p in bodies[1].points] == [("", 1.0, 2.0, 3.0)]
+
+
+def test_nested_segments():
+    skeleton = parse_settings(ALL).skeletons[0]
+    hips = skeleton.segments[0]
+    spine = hips.children[0]
+
+    assert (skeleton.index, skeleton.name) == (0, "Actor")
+    assert len(skeleton.segments) == 1
+    assert (hips.id, hips.name, hips.parent_id) == (1, "Hips", None)
+    assert hips.position == (0.0, 0.0, 1000.0)
+    assert hips.rotation == (0.0, 0.0, 0.0, 1.0)
+    assert (spine.id, spine.name, spine.parent_id) == (2, "Spine", 1)
+    assert spine.rotation == (0.0, 0.0, 0.7071, 0.7071)
+    assert spine.children == []
+
+
+def test_segment_without_default_transform():
+    skeleton = parse_settings(
+        parameters(
+            '<Skeletons><Skeleton Name="A"><Segments>'
+            '<Segment Name="Root" ID="1"/>'
+            "</Segments></Skeleton></Skeletons>"
+        )
+    ).skeletons[0]
+
+    assert skeleton.segments[0].position is None
+    assert skeleton.segments[0].rotation is None
+
+
+def test_several_skeletons_one_without_segments():
+    skeletons = parse_settings(
+        parameters(
+            '<Skeletons><Skeleton Name="A"/>'
+            '<Skeleton Name="B"><Segments>'
+            '<Segment Name="Root" ID="1"/><Segment Name="Prop" ID="7"/>'
+            "</Segments></Skeleton></Skeletons>"
+        )
+    ).skeletons
+
+    assert [(s.index, s.name) for s in skeletons] == [(0, "A"), (1, "B")]
+    assert skeletons[0].segments == []
+    assert [s.id for s in skeletons[1].segments] == [1, 7]
+
+
+def test_iter_segments_parents_first():
+    skeleton = parse_settings(
+        parameters(
+            '<Skeletons><Skeleton Name="A"><Segments>'
+            '<Segment Name="Hips" ID="1">'
+            '<Segment Name="Spine" ID="2"><Segment Name="Head" ID="3"/></Segment>'
+            '<Segment Name="LeftLeg" ID="4"/>'
+            "</Segment>"
+            '<Segment Name="Prop" ID="5"/>'
+            "</Segments></Skeleton></Skeletons>"
+        )
+    ).skeletons[0]
+
+    assert [(s.id, s.parent_id) for s in skeleton.iter_segments()] == [
+        (1, None),
+        (2, 1),
+        (3, 2),
+        (4, 1),
+        (5, None),
+    ]
+
+
+def labels(*names, **colors):
+    return [Label(i, name, colors.get(name, 0)) for i, name in enumerate(names)]
+
+
+def names(items):
+    return [item.name for item in items]
+
+
+def pairs(items):
+    return [(old.name, new.name) for old, new in items]
+
+
+def test_diff_unchanged():
+    diff = diff_labels(labels("A", "B"), labels("A", "B"))
+
+    assert not diff
+    assert (diff.added, diff.removed, diff.renamed, diff.changed) == ([], [], [], [])
+
+
+def test_diff_from_nothing():
+    diff = diff_labels(None, labels("A"))
+
+    assert names(diff.added) == ["A"]
+    assert diff.removed == []
+
+
+def test_diff_added_and_removed():
+    diff = diff_labels(labels("A", "B"), labels("A", "B", "C"))
+    assert (names(diff.added), diff.removed, diff.renamed) == (["C"], [], [])
+
+    diff = diff_labels(labels("A", "B", "C"), labels("A", "C"))
+    assert (diff.added, names(diff.removed), diff.renamed) == ([], ["B"], [])
+
+
+def test_diff_renamed_at_same_index():
+    diff = diff_labels(labels("A", "B", "C"), labels("A", "X", "C"))
+
+    assert pairs(diff.renamed) == [("B", "X")]
+    assert (diff.added, diff.removed, diff.changed) == ([], [], [])
+
+
+def test_diff_renamed_and_changed():
+    diff = diff_labels(labels("A", "B"), labels("A", "X", X=255))
+
+    assert pairs(diff.renamed) == [("B", "X")]
+    assert pairs(diff.changed) == [("B", "X")]
+    assert diff.is_changed(Label(1, "X", 0))
+    assert not diff.is_changed(Label(0, "A", 0))
+
+
+def test_diff_reordered():
+    diff = diff_labels(labels("A", "B", "C"), labels("C", "A", "B"))
+
+    assert not diff
+
+
+def test_diff_swapped_names():
+    diff = diff_labels(labels("A", "B", A=1, B=2), labels("B", "A", A=1, B=2))
+
+    assert not diff
+
+
+def test_diff_no_rename_to_a_name_still_in_use():
+    # B moved to index 0, so the new name at index 1 is not a rename of B.
+    diff = diff_labels(labels("A", "B"), labels("B", "X"))
+
+    assert diff.renamed == []
+    assert names(diff.added) == ["X"]
+    assert names(diff.removed) == ["A"]
+
+
+def test_diff_label_color_changed():
+    diff = diff_labels(labels("A", "B"), labels("A", "B", B=255))
+
+    assert pairs(diff.changed) == [("B", "B")]
+    assert diff.renamed == []
+
+
+def body(index, name, *points):
+    return Body(index, name, [Point(*point) for point in points])
+
+
+def test_diff_body_points_changed():
+    old = [body(0, "Wand", ("tip", 0, 0, 0)), body(1, "Cup", ("rim", 0, 0, 50))]
+
+    moved = [body(0, "Wand", ("tip", 0, 0, 1)), old[1]]
+    assert pairs(diff_bodies(old, moved).changed) == [("Wand", "Wand")]
+
+    renamed_point = [body(0, "Wand", ("end", 0, 0, 0)), old[1]]
+    assert pairs(diff_bodies(old, renamed_point).changed) == [("Wand", "Wand")]
+
+    virtual = [body(0, "Wand", ("tip", 0, 0, 0, True)), old[1]]
+    assert pairs(diff_bodies(old, virtual).changed) == [("Wand", "Wand")]
+
+    added_point = [body(0, "Wand", ("tip", 0, 0, 0), ("end", 1, 0, 0)), old[1]]
+    assert pairs(diff_bodies(old, added_point).changed) == [("Wand", "Wand")]
+
+    renamed_body = [old[0], body(1, "Mug", ("rim", 0, 0, 50))]
+    diff = diff_bodies(old, renamed_body)
+    assert pairs(diff.renamed) == [("Cup", "Mug")]
+    assert diff.changed == []
+
+
+def skeleton(name, *segments, **options):
+    position = options.get("position", (0.0, 0.0, 100.0))
+    rotation = options.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    root = Segment(1, "Hips", None, (0.0, 0.0, 1000.0), (0.0, 0.0, 0.0, 1.0), [])
+    for segment_id, segment_name in segments:
+        root.children.append(
+            Segment(segment_id, segment_name, 1, position, rotation, [])
+        )
+    return Skeleton(options.get("index", 0), name, [root])
+
+
+def test_diff_skeleton_unchanged():
+    old = [skeleton("Actor", (2, "Spine"))]
+
+    assert not diff_skeletons(old, [skeleton("Actor", (2, "Spine"))])
+
+
+@pytest.mark.parametrize(
+    "new",
+    [
+        skeleton("Actor", (2, "Spine"), position=(0.0, 0.0, 120.0)),
+        skeleton("Actor", (2, "Spine"), rotation=(0.0, 0.0, 0.7071, 0.7071)),
+        skeleton("Actor", (2, "Chest")),
+        skeleton("Actor", (3, "Spine")),
+        skeleton("Actor", (2, "Spine"), (3, "Head")),
+        skeleton("Actor"),
+    ],
+    ids=["position", "rotation", "name", "id", "added", "removed"],
+)
+def test_diff_skeleton_segments_changed(new):
+    diff = diff_skeletons([skeleton("Actor", (2, "Spine"))], [new])
+
+    assert pairs(diff.changed) == [("Actor", "Actor")]
+    assert (diff.added, diff.removed, diff.renamed) == ([], [], [])
+
+
+def test_diff_skeletons_renamed_added_removed():
+    old = [skeleton("Actor"), skeleton("Stunt", index=1)]
+    new = [skeleton("Hero"), skeleton("Stunt", index=1), skeleton("Extra", index=2)]
+
+    diff = diff_skeletons(old, new)
+
+    assert pairs(diff.renamed) == [("Actor", "Hero")]
+    assert names(diff.added) == ["Extra"]
+    assert diff.removed == []
+    assert diff.changed == []
+
+    diff = diff_skeletons(new, [skeleton("Stunt")])
+
+    assert names(diff.removed) == ["Hero", "Extra"]
+    assert diff.added == [] and diff.renamed == []
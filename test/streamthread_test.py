@@ -0,0 +1,186 @@
+"""
+    Tests for StreamThread against the QTM simulator
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from qtm.simulator import Simulator, SyntheticSource
+from streamthread import StreamThread
+
+# pylint: disable=W0621, C0111
+
+
+class EndedSource(SyntheticSource):
+    """A take that has no more frames"""
+
+    def frame(self, index, components):
+        return None
+
+
+async def wait_until(condition, timeout=2.0):
+    loop = asyncio.get_event_loop()
+    end = loop.time() + timeout
+    while not condition():
+        assert loop.time() < end, "timed out"
+        await asyncio.sleep(0.005)
+
+
+async def run(session, source=None, frames="allframes", port=None):
+    """Runs session(simulator, thread, woken) with a thread streaming from source"""
+    simulator = Simulator(source or SyntheticSource(frequency=200), port=0)
+    await simulator.start()
+
+    woken = threading.Event()
+    thread = StreamThread(
+        "127.0.0.1",
+        simulator.port if port is None else port,
+        "1.19",
+        "3d",
+        woken.set,
+        timeout=1.0,
+        frames=frames,
+    )
+    thread.start()
+    try:
+        return await asyncio.wait_for(session(simulator, thread, woken), 5)
+    finally:
+        thread.stop()
+        simulator.close()
+
+
+@pytest.mark.asyncio
+async def test_keeps_newest_frame():
+    async def session(simulator, thread, woken):
+        await wait_until(lambda: thread.dropped_frames > 0)
+        assert woken.is_set()
+
+        woken.clear()
+        packet, received, errors = thread.take()
+
+        assert errors == []
+        assert received <= time.perf_counter()
+        assert packet.framenumber >= thread.dropped_frames
+        assert simulator.commands[:2] == ["version 1.19", "streamframes allframes 3d"]
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_take_without_frame():
+    async def session(simulator, thread, woken):
+        await wait_until(woken.is_set)
+        packet, _, _ = thread.take()
+
+        assert packet is not None
+        assert thread.take() == (None, None, [])
+
+    await run(session, frames="frequency:1")
+
+
+@pytest.mark.asyncio
+async def test_wakes_again_after_take():
+    async def session(simulator, thread, woken):
+        await wait_until(woken.is_set)
+        woken.clear()
+        thread.take()
+
+        await wait_until(woken.is_set)
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_set_frames_restarts_stream():
+    async def session(simulator, thread, woken):
+        await wait_until(lambda: len(simulator.commands) == 2)
+        thread.set_frames("frequency:10")
+        await wait_until(lambda: len(simulator.commands) == 4)
+
+        assert simulator.commands[2:] == [
+            "streamframes stop",
+            "streamframes frequency:10 3d",
+        ]
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_stop_joins_thread():
+    async def session(simulator, thread, woken):
+        await wait_until(woken.is_set)
+        thread.stop()
+
+        assert not thread.is_alive()
+        assert thread.closed
+        assert thread.take()[2] == []
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_closed_when_server_disconnects():
+    async def session(simulator, thread, woken):
+        await wait_until(lambda: simulator.clients == 1)
+        woken.clear()
+        thread.take()
+        simulator.close()
+
+        await wait_until(lambda: thread.closed)
+
+        assert woken.is_set()
+        assert thread.take()[2] == []
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_no_more_data():
+    async def session(simulator, thread, woken):
+        await wait_until(lambda: thread.no_more_data)
+
+        assert woken.is_set()
+        assert not thread.closed
+
+    await run(session, source=EndedSource())
+
+
+@pytest.mark.asyncio
+async def test_error_reply():
+    async def session(simulator, thread, woken):
+        errors = []
+
+        def take_errors():
+            errors.extend(thread.take()[2])
+            return errors
+
+        await wait_until(lambda: len(simulator.commands) == 2)
+        thread.set_frames("sometimes")
+
+        await wait_until(take_errors)
+
+        assert errors == ["Parse error"]
+        assert not thread.closed
+
+    await run(session)
+
+
+@pytest.mark.asyncio
+async def test_connection_error():
+    async def session(simulator, thread, woken):
+        await wait_until(lambda: thread.closed)
+        _, _, errors = thread.take()
+
+        assert woken.is_set()
+        assert len(errors) == 1
+        assert simulator.clients == 0
+
+    # Nothing listens on the port the simulator had before it was closed.
+    closed = Simulator(SyntheticSource(), port=0)
+    await closed.start()
+    closed.close()
+
+    await run(session, port=closed.port)